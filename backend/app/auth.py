@@ -5,6 +5,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from .database import get_db
 from .models import TokenData, UserDB
+from .timing import timed
 import asyncpg, os
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -12,11 +13,13 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed("auth"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    with timed("auth"):
+        return pwd_context.hash(password)
 
 
 async def authenticate_user(email: str, password: str, db: asyncpg.Connection):
@@ -48,9 +51,10 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ALGORITHM")]
-        )
+        with timed("auth"):
+            payload = jwt.decode(
+                token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ALGORITHM")]
+            )
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
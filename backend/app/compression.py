@@ -0,0 +1,99 @@
+import asyncio
+import gzip
+import os
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies smaller than this are sent as-is; the headers cost more than the saving
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+# Fast settings suited to dynamic responses compressed on every request
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 5))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+# Compress bodies above this size in a worker thread to keep the loop free
+COMPRESSION_THREAD_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def supported_encodings() -> list:
+    """Encodings we can produce, in order of preference"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick the preferred supported coding from an Accept-Encoding header,
+    honouring q-values, "*" and explicit q=0 refusals"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip()] = q
+
+    best, best_q = None, 0.0
+    for coding in supported_encodings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compressible(response: Response) -> bool:
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if "content-encoding" in response.headers:
+        return False
+    return response.headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+
+async def compress_responses(request: Request, call_next):
+    """HTTP middleware compressing JSON and text bodies with br or gzip,
+    whichever the client prefers, once they pass COMPRESSION_MIN_SIZE"""
+    response = await call_next(request)
+    compressible = _compressible(response)
+    # The representation depends on Accept-Encoding even when sent as-is,
+    # and a 304 must carry the Vary its 200 would have
+    if compressible or response.status_code == 304:
+        vary = response.headers.get("vary")
+        response.headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+    if not compressible:
+        return response
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is None or request.method == "HEAD":
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    compressed = len(body) >= COMPRESSION_MIN_SIZE
+    if compressed:
+        if len(body) >= COMPRESSION_THREAD_SIZE:
+            body = await asyncio.to_thread(compress, body, encoding)
+        else:
+            body = compress(body, encoding)
+    replaced = Response(body, status_code=response.status_code)
+    # Raw headers keep repeated ones such as Set-Cookie; the new
+    # Content-Length is the one the new Response set
+    replaced.raw_headers = [
+        (name, value) for name, value in response.raw_headers if name != b"content-length"
+    ] + replaced.raw_headers
+    if compressed:
+        replaced.headers["Content-Encoding"] = encoding
+    return replaced
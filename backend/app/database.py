@@ -1,30 +1,76 @@
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 import asyncpg
 from dotenv import load_dotenv
 from typing import AsyncGenerator
+from .metrics import DB_CONNECT_DURATION, DB_CONNECTIONS_OPEN
+from .tracing import db_span, span
+from .timing import timed
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 
+class TracedConnection(asyncpg.Connection):
+    """asyncpg connection opening a span around every query"""
+
+    async def execute(self, query, *args, **kwargs):
+        with db_span("execute", query), timed("db"):
+            return await super().execute(query, *args, **kwargs)
+
+    async def executemany(self, command, args, **kwargs):
+        with db_span("executemany", command), timed("db"):
+            return await super().executemany(command, args, **kwargs)
+
+    async def fetch(self, query, *args, **kwargs):
+        with db_span("fetch", query), timed("db"):
+            return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        with db_span("fetchrow", query), timed("db"):
+            return await super().fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        with db_span("fetchval", query), timed("db"):
+            return await super().fetchval(query, *args, **kwargs)
+
+
 async def get_db() -> AsyncGenerator[asyncpg.Connection, None]:
     conn = None
     try:
-        conn = await asyncpg.connect(
-            os.getenv("DB"),
-            statement_cache_size=0,  # Disable statement caching
-            server_settings={"jit": "off"},  # Disable JIT compilation
-            timeout=30.0,  # Add connection timeout
-        )
+        started = time.perf_counter()
+        try:
+            with span("db.connect"), timed("db"):
+                conn = await asyncpg.connect(
+                    os.getenv("DB"),
+                    statement_cache_size=0,  # Disable statement caching
+                    server_settings={"jit": "off"},  # Disable JIT compilation
+                    timeout=30.0,  # Add connection timeout
+                    connection_class=TracedConnection,
+                )
+        except Exception:
+            DB_CONNECT_DURATION.labels("error").observe(time.perf_counter() - started)
+            raise
+        DB_CONNECT_DURATION.labels("ok").observe(time.perf_counter() - started)
+        DB_CONNECTIONS_OPEN.inc()
         yield conn
     except asyncpg.PostgresError as e:
-        print(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         raise
     except Exception as e:
-        print(f"Unexpected database error: {str(e)}")
+        logger.error("Unexpected database error: %s", e)
         raise
     finally:
         if conn:
+            DB_CONNECTIONS_OPEN.dec()
             try:
                 await conn.close()
             except Exception as e:
-                print(f"Error closing connection: {str(e)}")
+                logger.error("Error closing connection: %s", e)
+
+
+# get_db as "async with connection() as db:", for work outside a request
+connection = asynccontextmanager(get_db)
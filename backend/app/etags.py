@@ -0,0 +1,103 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+import asyncpg
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from .metrics import record_cache
+
+# How long a dashboard may reuse an activity payload without asking again.
+# Revalidating afterwards gets a 304 as long as the ETag still matches: the
+# version stamp where ingestion covers the source, else a payload hash.
+ACTIVITY_MAX_AGE = int(os.getenv("ACTIVITY_CACHE_MAX_AGE", 300))
+
+# Bump when the shape of an activity payload changes, so browsers holding
+# a body from the previous deploy do not get 304s for it
+PAYLOAD_VERSION = 1
+
+
+async def bump_activity_version(db: asyncpg.Connection, user_id: int, source: str):
+    """Invalidate cached activity payloads of one user for one source"""
+    await db.execute(
+        """
+        INSERT INTO activity_versions (user_id, source)
+        VALUES ($1, $2)
+        ON CONFLICT (user_id, source) DO UPDATE
+        SET version = activity_versions.version + 1, updated_at = NOW()
+        """,
+        user_id,
+        source,
+    )
+
+
+def _weak(key: bytes) -> str:
+    """Weak because the compression middleware may re-encode the body; the
+    payload stays semantically the same"""
+    return f'W/"{hashlib.sha256(key).hexdigest()[:32]}"'
+
+
+def window_start(days: int, schedule: dict) -> str:
+    """Start of the last N days, truncated to the local hour: the smallest
+    bucket activity payloads count by. Items leave the window as it moves,
+    so the ETag rolls over with it, at the user's own hour and day bounds."""
+    start = datetime.now(schedule["timezone"]) - timedelta(days=days)
+    return start.replace(minute=0, second=0, microsecond=0).isoformat()
+
+
+async def activity_etag(
+    db: asyncpg.Connection, user_id: int, source: str, days: int, schedule: dict, **params
+) -> str:
+    """ETag of a user's activity payload over the last N days from its
+    version stamp, for when ingestion covers the source so every change
+    bumps the version"""
+    version = await db.fetchval(
+        "SELECT version FROM activity_versions WHERE user_id = $1 AND source = $2",
+        user_id,
+        source,
+    )
+    key = ":".join(
+        [
+            str(PAYLOAD_VERSION),
+            source,
+            str(user_id),
+            str(version or 0),
+            window_start(days, schedule),
+        ]
+        + [f"{name}={params[name]}" for name in sorted(params)]
+    )
+    return _weak(key.encode())
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def conditional_response(
+    request: Request, response: Response, etag: str, cache: str
+) -> Response | None:
+    """Set the caching headers, and return a 304 if the client's copy is current"""
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={ACTIVITY_MAX_AGE}"}
+    response.headers.update(headers)
+    if_none_match = request.headers.get("if-none-match")
+    hit = bool(if_none_match) and _matches(if_none_match, etag)
+    record_cache(cache, hit)
+    if hit:
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def payload_response(request: Request, payload, cache: str) -> Response:
+    """The rendered payload tagged with a hash of it, for activity read from
+    upstream where no version stamp tracks changes; a 304 if the client's
+    copy is current"""
+    rendered = ORJSONResponse(payload)
+    return conditional_response(
+        request, rendered, _weak(rendered.body), cache
+    ) or rendered
@@ -0,0 +1,308 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from collections import deque
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+from .prompts import Prompt, estimate_tokens, report_usage
+from .upstreams import ANTHROPIC_BASE_URL, OPENAI_BASE_URL
+from opentelemetry.trace import SpanKind
+from .metrics import LLM_HEDGES, LLM_REQUEST_DURATION, LLM_REQUESTS, LLM_TOKENS
+from .tracing import span
+from .timing import timed
+
+logger = logging.getLogger(__name__)
+
+# Ordered candidates per tier; the first is the primary, the rest are used for
+# hedging and fallback. Override with LLM_MODELS_<TIER>="provider:model,..."
+MODEL_TIERS = {
+    "fast": ["anthropic:claude-3-5-haiku-20241022", "openai:gpt-4o-mini"],
+    "balanced": ["anthropic:claude-3-5-sonnet-20241022", "openai:gpt-4o"],
+    "reasoning": ["openai:gpt-4o", "anthropic:claude-3-5-sonnet-20241022"],
+}
+
+# Tier per task. Override with LLM_TIER_<TASK>=<tier>
+TASK_TIERS = {
+    "sentiment": "balanced",
+    "calendar-burnout": "balanced",
+    "github-activity": "balanced",
+    "schedule-optimization": "reasoning",
+    "code-quality": "reasoning",
+    "nudge": "reasoning",
+}
+
+# Overall deadline per task in seconds. Override with LLM_DEADLINE_<TASK>
+TASK_DEADLINES = {
+    "sentiment": 20.0,
+    "calendar-burnout": 45.0,
+    "github-activity": 45.0,
+    "schedule-optimization": 60.0,
+    "code-quality": 60.0,
+    "nudge": 60.0,
+}
+
+# Hedge after this many seconds until a model has enough samples for a p95
+DEFAULT_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 10))
+MIN_HEDGE_SAMPLES = 20
+
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 4, 8, 16, 32, 64]
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMResult:
+    def __init__(self, text, provider, model, input_tokens, output_tokens, latency):
+        self.text = text
+        self.provider = provider
+        self.model = model
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.latency = latency
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus a window of recent samples for percentiles"""
+
+    def __init__(self, window: int = 200):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.errors = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, q: float):
+        if len(self.recent) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def to_dict(self):
+        buckets = [str(b) for b in LATENCY_BUCKETS] + ["+Inf"]
+        return {
+            "buckets": dict(zip(buckets, self.counts)),
+            "count": sum(self.counts),
+            "sum": round(self.total, 3),
+            "errors": self.errors,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+        }
+
+
+latency_histograms: dict[str, LatencyHistogram] = {}
+_clients = {}
+
+
+def _histogram(model: str) -> LatencyHistogram:
+    if model not in latency_histograms:
+        latency_histograms[model] = LatencyHistogram()
+    return latency_histograms[model]
+
+
+def get_latency_histograms() -> dict:
+    return {model: hist.to_dict() for model, hist in latency_histograms.items()}
+
+
+def _env_key(name: str) -> str:
+    return name.upper().replace("-", "_")
+
+
+def get_candidates(task: str) -> list[tuple[str, str]]:
+    """Resolve a task to its ordered (provider, model) candidates"""
+    tier = os.getenv(f"LLM_TIER_{_env_key(task)}", TASK_TIERS.get(task, "balanced"))
+    configured = os.getenv(f"LLM_MODELS_{_env_key(tier)}")
+    entries = configured.split(",") if configured else MODEL_TIERS[tier]
+    return [tuple(entry.strip().split(":", 1)) for entry in entries if entry.strip()]
+
+
+def get_deadline(task: str) -> float:
+    return float(
+        os.getenv(f"LLM_DEADLINE_{_env_key(task)}", TASK_DEADLINES.get(task, 60.0))
+    )
+
+
+def _client(provider: str):
+    if provider not in _clients:
+        if provider == "anthropic":
+            _clients[provider] = AsyncAnthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                base_url=ANTHROPIC_BASE_URL,
+                max_retries=0,
+            )
+        elif provider == "openai":
+            _clients[provider] = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=OPENAI_BASE_URL,
+                max_retries=0,
+            )
+        else:
+            raise LLMError(f"Unknown LLM provider: {provider}")
+    return _clients[provider]
+
+
+async def _call(provider, model, prompt_text, system, max_tokens, temperature, json_mode):
+    with span(
+        f"llm {provider}:{model}",
+        SpanKind.CLIENT,
+        **{"llm.provider": provider, "llm.model": model, "llm.max_tokens": max_tokens},
+    ) as current, timed("llm"):
+        started = time.perf_counter()
+        try:
+            if provider == "anthropic":
+                kwargs = {}
+                if system or json_mode:
+                    kwargs["system"] = (system or "") + (
+                        "\nRespond with a single JSON object only." if json_mode else ""
+                    )
+                if temperature is not None:
+                    kwargs["temperature"] = temperature
+                response = await _client(provider).messages.create(
+                    model=model,
+                    max_tokens=max_tokens,
+                    messages=[{"role": "user", "content": prompt_text}],
+                    **kwargs,
+                )
+                # No content blocks when the model stopped before answering
+                text = response.content[0].text if response.content else None
+                input_tokens = response.usage.input_tokens
+                output_tokens = response.usage.output_tokens
+            else:
+                messages = [{"role": "user", "content": prompt_text}]
+                if system:
+                    messages.insert(0, {"role": "system", "content": system})
+                kwargs = {"max_tokens": max_tokens}
+                if temperature is not None:
+                    kwargs["temperature"] = temperature
+                if json_mode:
+                    kwargs["response_format"] = {"type": "json_object"}
+                response = await _client(provider).chat.completions.create(
+                    model=model, messages=messages, **kwargs
+                )
+                text = response.choices[0].message.content
+                input_tokens = response.usage.prompt_tokens
+                output_tokens = response.usage.completion_tokens
+        except asyncio.CancelledError:
+            LLM_REQUESTS.labels(provider, model, "cancelled").inc()
+            raise
+        except Exception:
+            _histogram(model).errors += 1
+            LLM_REQUESTS.labels(provider, model, "error").inc()
+            raise
+
+        latency = time.perf_counter() - started
+        _histogram(model).observe(latency)
+        LLM_REQUEST_DURATION.labels(provider, model).observe(latency)
+        LLM_REQUESTS.labels(provider, model, "ok").inc()
+        LLM_TOKENS.labels(provider, model, "input").inc(input_tokens)
+        LLM_TOKENS.labels(provider, model, "output").inc(output_tokens)
+        current.set_attribute("llm.input_tokens", input_tokens)
+        current.set_attribute("llm.output_tokens", output_tokens)
+        return LLMResult(text, provider, model, input_tokens, output_tokens, latency)
+
+
+async def complete(
+    task: str,
+    prompt,
+    system: str | None = None,
+    max_tokens: int = 1024,
+    temperature: float | None = None,
+    json_mode: bool = False,
+    deadline: float | None = None,
+) -> LLMResult:
+    """Run an LLM task through its tier's candidates.
+
+    The primary candidate is started first. If it has not answered by its own
+    p95 latency, a hedged request goes to the next candidate and whichever
+    finishes first wins. Failures fall through to the next candidate, and the
+    whole call is bounded by the task deadline."""
+    prompt_text = prompt.text if isinstance(prompt, Prompt) else prompt
+    estimated = (
+        prompt.estimated_tokens
+        if isinstance(prompt, Prompt)
+        else estimate_tokens(prompt_text)
+    ) + estimate_tokens(system)
+
+    with span(f"llm.task {task}", **{"llm.task": task, "llm.estimated_tokens": estimated}):
+        candidates = get_candidates(task)
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + (deadline or get_deadline(task))
+        pending = {}  # asyncio.Task -> (provider, model)
+        next_index = 0
+        errors = []
+
+        def launch():
+            nonlocal next_index
+            provider, model = candidates[next_index]
+            next_index += 1
+            call = _call(
+                provider, model, prompt_text, system, max_tokens, temperature, json_mode
+            )
+            pending[asyncio.ensure_future(call)] = (provider, model)
+
+        launch()
+        try:
+            while pending:
+                remaining = expires_at - loop.time()
+                if remaining <= 0:
+                    break
+
+                # Hedge only while exactly one request is in flight
+                wait_for = remaining
+                if len(pending) == 1 and next_index < len(candidates):
+                    _, model = next(iter(pending.values()))
+                    hedge_after = _histogram(model).percentile(0.95) or DEFAULT_HEDGE_AFTER
+                    wait_for = min(remaining, hedge_after)
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if next_index < len(candidates) and len(pending) == 1:
+                        logger.info("LLM task %s: hedging after %.1fs", task, wait_for)
+                        LLM_HEDGES.labels(task).inc()
+                        launch()
+                    continue
+
+                for finished in done:
+                    provider, model = pending.pop(finished)
+                    try:
+                        result = finished.result()
+                    except Exception as e:
+                        logger.warning("LLM task %s: %s:%s failed: %s", task, provider, model, e)
+                        errors.append(f"{provider}:{model}: {str(e)}")
+                        continue
+                    report_usage(task, model, estimated, result.input_tokens)
+                    return result
+
+                # Everything in flight failed, fall back to the next candidate
+                if not pending and next_index < len(candidates):
+                    launch()
+        finally:
+            for leftover in pending:
+                leftover.cancel()
+
+        if errors and not pending and next_index >= len(candidates):
+            raise LLMError(f"All models failed for {task}: {'; '.join(errors)}")
+        raise LLMError(f"LLM task {task} exceeded its deadline")
+
+
+def parse_json(text: str | None) -> dict:
+    """Parse a JSON object from model output, tolerating code fences or prose.
+    A missing or empty output raises ValueError, as malformed JSON does."""
+    if not text:
+        raise ValueError("LLM response has no text")
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start : end + 1])
@@ -0,0 +1,184 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from fastapi import Request
+from opentelemetry import trace
+
+# Root level for the app's loggers, and per-module overrides such as
+# LOG_LEVELS="app.main=DEBUG,app.services.slack=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# json for production, text for reading locally
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Repeated warnings/errors from the same call site: let LOG_SAMPLE_BURST
+# through per LOG_SAMPLE_WINDOW seconds, count the rest
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", 5))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", 60))
+
+REDACTED = "[REDACTED]"
+# Credentials that must never reach the logs
+SECRET_PATTERNS = [
+    re.compile(r"xox[abposr]-[A-Za-z0-9-]+"),  # Slack tokens
+    re.compile(r"gh[pousr]_[A-Za-z0-9]+"),  # GitHub tokens
+    re.compile(r"ya29\.[A-Za-z0-9._-]+"),  # Google access tokens
+    re.compile(r"1//[A-Za-z0-9._-]{20,}"),  # Google refresh tokens
+    re.compile(r"sk-[A-Za-z0-9_-]{16,}"),  # OpenAI / Anthropic keys
+    re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._~+/=-]+"),
+    re.compile(
+        r"(?i)((?:access|refresh|bot|id)_token['\"]?\s*[:=]\s*['\"]?)[^'\"\s,}]+"
+    ),
+]
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+_listener = None
+
+
+def redact(text: str) -> str:
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(
+            lambda m: (m.group(1) if m.re.groups else "") + REDACTED, text
+        )
+    return text
+
+
+class ContextFilter(logging.Filter):
+    """Stamp request and trace ids while still on the logging thread"""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        context = trace.get_current_span().get_span_context()
+        record.trace_id = format(context.trace_id, "032x") if context.is_valid else None
+        return True
+
+
+class RedactFilter(logging.Filter):
+    """Render the message early and scrub credentials from it and the extras"""
+
+    def filter(self, record):
+        record.msg = redact(record.getMessage())
+        record.args = None
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and isinstance(value, str):
+                setattr(record, key, redact(value))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limit WARNING and above per (logger, message template)"""
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.lock = threading.Lock()
+        self.seen = {}  # key -> [window start, emitted, suppressed]
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.lineno, str(record.msg))
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                self.seen[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if entry[1] < self.burst:
+                entry[1] += 1
+                return True
+            entry[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+
+class RedactingQueueHandler(QueueHandler):
+    """QueueHandler that keeps structured extras and redacts tracebacks"""
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Format the traceback here, the listener thread cannot see frames
+            record.exc_text = redact(logging.Formatter().formatException(record.exc_info))
+            record.exc_info = None
+        record.message = record.getMessage()
+        return record
+
+
+def configure_logging():
+    """Route the app's loggers through a queue to a background writer thread,
+    so emitting a log line never blocks the event loop on stdout"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = RedactingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_BURST, LOG_SAMPLE_WINDOW))
+    handler.addFilter(RedactFilter())
+
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(handler)
+    logger.propagate = False
+    for part in filter(None, LOG_LEVELS.split(",")):
+        name, level = part.split("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+async def log_context(request: Request, call_next):
+    """HTTP middleware assigning a request id, honouring X-Request-ID"""
+    rid = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id.set(rid)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id.reset(token)
+    response.headers["X-Request-ID"] = rid
+    return response
@@ -1,9 +1,19 @@
-from fastapi import FastAPI, Depends, APIRouter, HTTPException, status, Query
+import logging
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta, datetime, timezone
+from datetime import date, timedelta, datetime, timezone
 from app.database import get_db
-from .services.github import analyze_github_activity
+from .services.github import aggregate_github_events, analyze_github_activity, fetch_org_name
 from .auth import (
     authenticate_user,
     create_access_token,
@@ -11,27 +21,98 @@ from .auth import (
     get_password_hash,
 )
 from .security import encrypt_token, decrypt_token
-from .models import UserCreate, UserDB, Token
-from .services.slack import generate_slack_nudge
+from .upstreams import (
+    GITHUB_API_URL,
+    GOOGLE_USERINFO_URL,
+    github_headers,
+    http_client,
+    slack_client as make_slack_client,
+)
+from .models import (
+    CalendarAnalysis,
+    GithubAnalysis,
+    SlackAnalysis,
+    Token,
+    UserCreate,
+    UserDB,
+)
+from .prompts import (
+    PromptBuilder,
+    compact_json,
+    estimate_tokens,
+    get_token_budget,
+    truncate_text,
+)
+from .services.slack import build_slack_activity_chart, generate_slack_nudge
+from .services.channel_history import fetch_history
+from .services.slack_events import (
+    all_covered,
+    ingest_event,
+    ingested_histories,
+    verify_signature,
+)
+from .services import calendar_sync, github_events
+from .services.slack_directory import stored_conversations, user_conversations
+from .services.burnout import describe_burnout_score, latest_burnout_score
+from .services.teams import COHORTS, cohort_quantiles, cohort_stats
+from .services.trends import (
+    MAX_TREND_POINTS,
+    RESOLUTIONS,
+    SKETCH_METRICS,
+    TREND_METRICS,
+    default_trend_range,
+    fetch_quantiles,
+    fetch_trend,
+    summarize_digest,
+)
+from .services.timebuckets import (
+    DEFAULT_WORK_END_HOUR,
+    DEFAULT_WORK_START_HOUR,
+    valid_timezone,
+    work_schedule,
+)
 from .services.calendar import (
     create_oauth_flow,
     analyze_calendar_activity,
+    mirror_live,
     GOOGLE_REDIRECT_URI,
 )
 import asyncpg, os, secrets
-from slack_sdk import WebClient
 from slack_sdk.oauth import AuthorizeUrlGenerator
-from fastapi.responses import RedirectResponse, HTMLResponse
-import httpx
-from anthropic import Anthropic
+from fastapi.responses import (
+    HTMLResponse,
+    ORJSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+)
 from pydantic import BaseModel, EmailStr
 from typing import Optional, Dict, Any, List
-from openai import OpenAI
-from collections import defaultdict
+from .llm import complete, get_latency_histograms, parse_json
+from .metrics import metrics_response, monitor_event_loop_lag, track_requests
+from .logs import configure_logging, log_context
+from .tracing import configure_tracing, trace_requests
+from .timing import server_timing
+from .compression import compress_responses
+from .etags import activity_etag, bump_activity_version, conditional_response, payload_response
+from .records import EventRecords, MessageRecords
+from .profiling import (
+    PERIODIC_EVERY,
+    install_task_factory,
+    list_profiles,
+    profile_requests,
+    read_profile,
+    require_profiler_token,
+    run_periodic_profiler,
+)
 import pytz
 import json
+import asyncio
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+configure_logging()
+configure_tracing()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Update CORS middleware
 app.add_middleware(
@@ -42,6 +123,48 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+app.middleware("http")(track_requests)
+app.middleware("http")(server_timing)
+app.middleware("http")(compress_responses)
+app.middleware("http")(trace_requests)
+app.middleware("http")(profile_requests)
+app.middleware("http")(log_context)
+
+
+@app.on_event("startup")
+async def start_event_loop_lag_monitor():
+    app.state.loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+
+
+@app.on_event("startup")
+async def start_calendar_channel_renewal():
+    if calendar_sync.CALENDAR_WEBHOOK_URL:
+        app.state.calendar_renewal = asyncio.create_task(calendar_sync.run_channel_renewal())
+
+
+@app.on_event("startup")
+async def start_profiler():
+    install_task_factory()
+    if PERIODIC_EVERY:
+        app.state.periodic_profiler = asyncio.create_task(run_periodic_profiler())
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus metrics for this worker"""
+    return metrics_response(request)
+
+
+@app.get("/debug/profiles", include_in_schema=False)
+async def get_profiles(_: None = Depends(require_profiler_token)):
+    """Stored sampling profiles, newest first"""
+    return {"profiles": list_profiles()}
+
+
+@app.get("/debug/profiles/{name}", include_in_schema=False)
+async def get_profile(name: str, _: None = Depends(require_profiler_token)):
+    """One profile in folded stack format (flamegraph.pl, speedscope)"""
+    return PlainTextResponse(read_profile(name))
 
 
 @app.get("/test-db")
@@ -70,7 +193,7 @@ async def signup(user: UserCreate, db: asyncpg.Connection = Depends(get_db)):
         try:
             hashed_password = get_password_hash(user.password)
         except Exception as e:
-            print(f"Password hashing error: {str(e)}")
+            logger.error("Password hashing error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error processing password",
@@ -91,7 +214,7 @@ async def signup(user: UserCreate, db: asyncpg.Connection = Depends(get_db)):
                 hashed_password,
             )
         except Exception as e:
-            print(f"Database insertion error: {str(e)}")
+            logger.error("Database insertion error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error creating user in database",
@@ -108,7 +231,7 @@ async def signup(user: UserCreate, db: asyncpg.Connection = Depends(get_db)):
             user_dict = dict(new_user)
             return UserDB(**user_dict)
         except Exception as e:
-            print(f"Model conversion error: {str(e)}")
+            logger.error("Model conversion error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error processing user data",
@@ -117,7 +240,7 @@ async def signup(user: UserCreate, db: asyncpg.Connection = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error during signup: {str(e)}")
+        logger.error("Unexpected error during signup: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred, {str(e)}",
@@ -178,7 +301,7 @@ async def read_users_me(current_user: UserDB = Depends(get_current_user)):
 
 
 # Initialize Slack client
-slack_client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"))
+slack_client = make_slack_client(os.getenv("SLACK_BOT_TOKEN"))
 
 
 # Slack OAuth endpoints
@@ -238,11 +361,11 @@ async def slack_callback(
     db: asyncpg.Connection = Depends(get_db),
 ):
     if error:
-        print(f"Error from Slack: {error}")
+        logger.error("Error from Slack: %s", error)
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error={error}")
 
     if not code:
-        print("No code received from Slack")
+        logger.warning("No code received from Slack")
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=no_code")
 
     try:
@@ -257,10 +380,16 @@ async def slack_callback(
         # Get Slack user info
         user_info = slack_client.users_info(user=oauth_response["authed_user"]["id"])
         slack_email = user_info["user"]["profile"]["email"]
-        print(f"oauth_response: {oauth_response}")
+        logger.info(
+            "Slack OAuth completed",
+            extra={
+                "slack_team_id": oauth_response["team"]["id"],
+                "slack_user_id": oauth_response["authed_user"]["id"],
+            },
+        )
 
         # Store both bot token and user token
-        await db.execute(
+        user_id = await db.fetchval(
             """
             UPDATE users 
             SET 
@@ -269,6 +398,7 @@ async def slack_callback(
                 slack_bot_token = $3,
                 slack_team_id = $4
             WHERE email = $5
+            RETURNING id
             """,
             oauth_response["authed_user"]["id"],
             encrypt_token(oauth_response["authed_user"]["access_token"]),
@@ -276,10 +406,12 @@ async def slack_callback(
             oauth_response["team"]["id"],
             slack_email,
         )
+        if user_id:
+            await bump_activity_version(db, user_id, "slack")
 
         return RedirectResponse(FRONTEND_SUCCESS_URI)
     except Exception as e:
-        print(f"Error during OAuth: {str(e)}")
+        logger.error("Error during OAuth: %s", e)
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error={str(e)}")
 
 
@@ -287,7 +419,11 @@ class AnalysisRequest(BaseModel):
     days: Optional[int] = 7
 
 
-@router.post("/slack/analyze")
+@router.post(
+    "/slack/analyze",
+    response_model=SlackAnalysis,
+    response_model_exclude_unset=True,
+)
 async def analyze_slack(
     request: AnalysisRequest,
     current_user: UserDB = Depends(get_current_user),
@@ -300,7 +436,7 @@ async def analyze_slack(
         analysis = await analyze_slack_activity(current_user.id, db, request.days)
         return analysis
     except Exception as e:
-        print(f"Error analyzing Slack activity: {str(e)}")
+        logger.error("Error analyzing Slack activity: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -316,7 +452,7 @@ async def connect_google():
         )
         return RedirectResponse(authorization_url)
     except Exception as e:
-        print(f"Error initiating Google OAuth: {str(e)}")
+        logger.error("Error initiating Google OAuth: %s", e)
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=oauth_init_failed")
 
 
@@ -329,11 +465,11 @@ async def google_callback(
     db: asyncpg.Connection = Depends(get_db),
 ):
     if error:
-        print(f"Error from Google: {error}")
+        logger.error("Error from Google: %s", error)
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error={error}")
 
     if not code:
-        print("No code received from Google")
+        logger.warning("No code received from Google")
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=no_code")
 
     try:
@@ -351,35 +487,33 @@ async def google_callback(
         credentials = flow.credentials
 
         # Get user's email from Google
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(
-                    "https://www.googleapis.com/oauth2/v2/userinfo",
+                    GOOGLE_USERINFO_URL,
                     headers={"Authorization": f"Bearer {credentials.token}"},
                 )
                 response.raise_for_status()
                 user_info = response.json()
-                print("User info response:", user_info)
-
                 if "email" not in user_info:
-                    print("Email not found in user info:", user_info)
+                    logger.warning(
+                        "Email not found in Google user info, keys: %s",
+                        sorted(user_info),
+                    )
                     return RedirectResponse(
                         f"{FRONTEND_SUCCESS_URI}?error=email_not_found"
                     )
 
                 google_email = user_info["email"]
             except Exception as e:
-                print(f"Error getting user info: {str(e)}")
-                print(
-                    "Response content:", response.content if response else "No response"
-                )
+                logger.error("Error getting user info: %s", e)
                 return RedirectResponse(
                     f"{FRONTEND_SUCCESS_URI}?error=user_info_failed"
                 )
 
         # Store the refresh token
         if not credentials.refresh_token:
-            print("No refresh token received")
+            logger.warning("No refresh token received")
             return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=no_refresh_token")
 
         # Check if user exists with this email
@@ -393,32 +527,39 @@ async def google_callback(
         )
 
         if not user:
-            print(f"No user found with email: {google_email}")
+            logger.warning("No user found with email: %s", google_email)
             return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=user_not_found")
 
-        print(f"Updating Google Calendar credentials for user: {google_email}")
+        logger.info("Updating Google Calendar credentials for user: %s", google_email)
 
         # Update the user's Google Calendar credentials
-        await db.execute(
+        user_id = await db.fetchval(
             """
             UPDATE users 
             SET 
                 google_refresh_token = $1,
                 google_calendar_connected = true
             WHERE email = $2
+            RETURNING id
             """,
             encrypt_token(credentials.refresh_token),
             google_email,
         )
+        if user_id:
+            await bump_activity_version(db, user_id, "calendar")
+            calendar_sync.request_watch(user_id)
 
         return RedirectResponse(FRONTEND_SUCCESS_URI)
     except Exception as e:
-        print(f"Error during Google OAuth: {str(e)}")
-        print(f"Full error details: {repr(e)}")
+        logger.exception("Error during Google OAuth: %s", e)
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=oauth_failed")
 
 
-@router.post("/calendar/analyze")
+@router.post(
+    "/calendar/analyze",
+    response_model=CalendarAnalysis,
+    response_model_exclude_unset=True,
+)
 async def analyze_calendar(
     request: AnalysisRequest,
     current_user: UserDB = Depends(get_current_user),
@@ -429,7 +570,7 @@ async def analyze_calendar(
         analysis = await analyze_calendar_activity(current_user.id, db, request.days)
         return analysis
     except Exception as e:
-        print(f"Error analyzing Calendar activity: {str(e)}")
+        logger.error("Error analyzing Calendar activity: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -492,15 +633,7 @@ async def send_combined_nudge(
             "github": github_data,
         }
 
-        # Use OpenAI to generate a structured combined analysis
-        openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        combined_analysis = openai.chat.completions.create(
-            model="gpt-4o",
-            response_format={"type": "json_object"},
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a work-life balance analyst. Your responses should:
+        nudge_system = """You are a work-life balance analyst. Your responses should:
                     1. Include specific numbers and percentages from the data
                     2. Provide actionable, measurable suggestions
                     3. Be encouraging and supportive
@@ -515,14 +648,11 @@ async def send_combined_nudge(
                     - Include sentiment analysis of communication
                     - Include GitHub activity analysis if available
                     - If Calendar/GitHub is missing, provide more detailed Slack insights instead
-                    - Each pattern should be data-rich with specific numbers and percentages""",
-                },
-                {
-                    "role": "user",
-                    "content": f"""
+                    - Each pattern should be data-rich with specific numbers and percentages"""
+        nudge_instructions = """
                     Based on the following analyses, generate a structured work-life balance analysis in JSON format.
                     The format should follow this exact structure, with emphasis on data-driven insights:
-                    {{
+                    {
                         "greeting": "Hi [Name]! 👋",
                         "key_patterns": [
                             // Provide 3-6 of the most relevant patterns from below based on available data:
@@ -560,23 +690,22 @@ async def send_combined_nudge(
                             "specific suggestion 2 with target numbers and timeframes",
                             "specific suggestion 3 with target numbers and timeframes"
                         ],
-                        "weekly_goal": {{
+                        "weekly_goal": {
                             "title": "Your data-driven goals for next week:",
                             "steps": [
                                 "Measurable goal 1 with specific target numbers and timeline",
                                 "Measurable goal 2 with specific target numbers and timeline",
                                 "Measurable goal 3 with specific target numbers and timeline"
                             ]
-                        }},
+                        },
                         "sign_off": "Choose one of these styles with a relevant emoji:
                             1. 'Remember: Your [X%] response rate during [specific time] shows you're on the right track! Keep it up! ⭐'
                             2. 'Small adjustments to your [specific pattern with numbers] can make a big difference. You've got this! 🌟'
                             3. 'You're already showing great progress with [specific metric] increasing by [X%]. Let's build on that! 💪'"
-                    }}
-
-                    Analyses to consider:
-                    {formatted_analyses}
+                    }
 
+                    Analyses to consider:"""
+        nudge_notes = """
                     Important Notes:
                     1. ALWAYS include specific numbers, percentages, and times in every point
                     2. If GitHub data is available (commit_count > 0), ALWAYS include at least one GitHub pattern
@@ -588,15 +717,37 @@ async def send_combined_nudge(
                     8. Include specific time ranges and peak activity periods
                     9. Highlight team collaboration metrics from available data
                     10. Focus on actionable patterns that can influence work-life balance
-                    """,
-                },
-            ],
+                    """
+
+        # The deterministic burnout score, for the LLM to build on
+        burnout = describe_burnout_score(await latest_burnout_score(db, current_user.id))
+
+        # Fit the analyses into whatever budget the instructions leave over
+        nudge_budget = get_token_budget("nudge")
+        analyses_budget = nudge_budget - sum(
+            estimate_tokens(text)
+            for text in (nudge_system, nudge_instructions, burnout, nudge_notes)
+        )
+        nudge_prompt = (
+            PromptBuilder("nudge", nudge_budget)
+            .add(nudge_instructions)
+            .add(burnout)
+            .add(compact_json(formatted_analyses, max(analyses_budget, 200)))
+            .add(nudge_notes)
+            .build()
         )
 
-        structured_analysis = combined_analysis.choices[0].message.content
+        # Generate a structured combined analysis through the LLM router
+        combined_analysis = await complete(
+            "nudge",
+            nudge_prompt,
+            system=nudge_system,
+            max_tokens=2048,
+            json_mode=True,
+        )
 
         # Format a user-friendly Slack message from the structured analysis
-        analysis_dict = eval(structured_analysis)  # Convert JSON string to dict
+        analysis_dict = parse_json(combined_analysis.text)
         slack_message = f"""
 {analysis_dict['greeting']}
 
@@ -630,7 +781,7 @@ async def send_combined_nudge(
             },
         }
     except Exception as e:
-        print(f"Error sending combined nudge: {str(e)}")
+        logger.error("Error sending combined nudge: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -675,24 +826,24 @@ async def github_callback(
     db: asyncpg.Connection = Depends(get_db),
 ):
     if error:
-        print(f"Error from GitHub: {error}")
+        logger.error("Error from GitHub: %s", error)
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error={error}")
 
     if not code or not state:
-        print("No code or state received from GitHub")
+        logger.warning("No code or state received from GitHub")
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=no_code_or_state")
 
     try:
         # Extract email from state
         state_parts = state.split(":")
         if len(state_parts) != 2:
-            print("Invalid state format")
+            logger.error("Invalid state format")
             return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error=invalid_state")
 
         _, user_email = state_parts
-        print(f"User email: {user_email}")
+        logger.info("User email: %s", user_email)
         # Exchange code for token
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             token_response = await client.post(
                 "https://github.com/login/oauth/access_token",
                 headers={"Accept": "application/json"},
@@ -708,42 +859,51 @@ async def github_callback(
 
             # Get GitHub user info
             user_response = await client.get(
-                "https://api.github.com/user",
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Accept": "application/vnd.github.v3+json",
-                },
+                f"{GITHUB_API_URL}/user",
+                headers=github_headers(access_token),
             )
             github_user = user_response.json()
-            print(
-                str(github_user["id"]),
-                github_user["login"],
-                encrypt_token(access_token),
-                user_email,
+            # Defines the user's GitHub team cohort; linking works without it
+            try:
+                org_name = await fetch_org_name(client, access_token)
+            except Exception as e:
+                logger.warning("Error fetching GitHub orgs: %s", e)
+                org_name = None
+            logger.info(
+                "Linking GitHub user %s to %s", github_user["login"], user_email
             )
             # Store GitHub info in database using the email from state
-            await db.execute(
+            user_id = await db.fetchval(
                 """
                 UPDATE users 
                 SET 
                     github_user_id = $1,
                     github_username = $2,
-                    github_access_token = $3
+                    github_access_token = $3,
+                    github_org_name = $5
                 WHERE email = $4
+                RETURNING id
                 """,
                 str(github_user["id"]),
                 github_user["login"],
                 encrypt_token(access_token),
                 user_email,  # Use the email from state instead of GitHub email
+                org_name,
             )
+            if user_id:
+                await bump_activity_version(db, user_id, "github")
 
         return RedirectResponse(FRONTEND_SUCCESS_URI)
     except Exception as e:
-        print(f"Error during GitHub OAuth: {str(e)}")
+        logger.error("Error during GitHub OAuth: %s", e)
         return RedirectResponse(f"{FRONTEND_SUCCESS_URI}?error={str(e)}")
 
 
-@router.post("/github/analyze")
+@router.post(
+    "/github/analyze",
+    response_model=GithubAnalysis,
+    response_model_exclude_unset=True,
+)
 async def analyze_github(
     request: AnalysisRequest,
     current_user: UserDB = Depends(get_current_user),
@@ -754,13 +914,16 @@ async def analyze_github(
         analysis = await analyze_github_activity(current_user.id, db, request.days)
         return analysis
     except Exception as e:
-        print(f"Error analyzing GitHub activity: {str(e)}")
+        logger.error("Error analyzing GitHub activity: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 class UserUpdate(BaseModel):
     name: str | None = None
     password: str | None = None
+    timezone: str | None = None  # IANA name, e.g. "Europe/Berlin"
+    work_start_hour: int | None = None
+    work_end_hour: int | None = None
 
 
 @router.put("/users/me", response_model=UserDB)
@@ -769,6 +932,26 @@ async def update_user(
     current_user: UserDB = Depends(get_current_user),
     db: asyncpg.Connection = Depends(get_db),
 ):
+    if user_update.timezone is not None and not valid_timezone(user_update.timezone):
+        raise HTTPException(status_code=400, detail="Unknown timezone")
+    # Validate the resulting pair, falling back to the stored or default hours
+    work_start, work_end = (
+        next(hour for hour in candidates if hour is not None)
+        for candidates in (
+            (
+                user_update.work_start_hour,
+                current_user.work_start_hour,
+                DEFAULT_WORK_START_HOUR,
+            ),
+            (user_update.work_end_hour, current_user.work_end_hour, DEFAULT_WORK_END_HOUR),
+        )
+    )
+    if not 0 <= work_start < work_end <= 24:
+        raise HTTPException(
+            status_code=400,
+            detail="Work hours must satisfy 0 <= work_start_hour < work_end_hour <= 24",
+        )
+
     try:
         # Prepare update fields
         update_fields = []
@@ -785,6 +968,16 @@ async def update_user(
             params.append(get_password_hash(user_update.password))
             param_count += 1
 
+        # Timezone and work hours change how activity is bucketed
+        schedule_changed = False
+        for field in ("timezone", "work_start_hour", "work_end_hour"):
+            value = getattr(user_update, field)
+            if value is not None:
+                update_fields.append(f"{field} = ${param_count}")
+                params.append(value)
+                param_count += 1
+                schedule_changed = True
+
         if not update_fields:
             return current_user
 
@@ -799,14 +992,19 @@ async def update_user(
             WHERE id = ${param_count}
             RETURNING id, email, name, disabled, created_at, 
                     slack_user_id, slack_team_id, google_calendar_connected,
-                    github_user_id, github_username
+                    github_user_id, github_username,
+                    timezone, work_start_hour, work_end_hour
             """,
             *params,
         )
 
+        if schedule_changed:
+            for source in ("slack", "github", "calendar"):
+                await bump_activity_version(db, current_user.id, source)
+
         return UserDB(**dict(updated_user))
     except Exception as e:
-        print(f"Error updating user: {str(e)}")
+        logger.error("Error updating user: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update user",
@@ -820,6 +1018,9 @@ async def disconnect_slack(
 ):
     """Disconnect Slack integration"""
     try:
+        await db.execute(
+            "DELETE FROM slack_directory WHERE slack_user_id = $1", current_user.slack_user_id
+        )
         await db.execute(
             """
             UPDATE users 
@@ -832,9 +1033,10 @@ async def disconnect_slack(
             """,
             current_user.id,
         )
+        await bump_activity_version(db, current_user.id, "slack")
         return {"status": "success", "message": "Slack disconnected successfully"}
     except Exception as e:
-        print(f"Error disconnecting Slack: {str(e)}")
+        logger.error("Error disconnecting Slack: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to disconnect Slack",
@@ -848,6 +1050,7 @@ async def disconnect_google(
 ):
     """Disconnect Google Calendar integration"""
     try:
+        await calendar_sync.unwatch_calendar(db, current_user.id)
         await db.execute(
             """
             UPDATE users 
@@ -858,12 +1061,13 @@ async def disconnect_google(
             """,
             current_user.id,
         )
+        await bump_activity_version(db, current_user.id, "calendar")
         return {
             "status": "success",
             "message": "Google Calendar disconnected successfully",
         }
     except Exception as e:
-        print(f"Error disconnecting Google Calendar: {str(e)}")
+        logger.error("Error disconnecting Google Calendar: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to disconnect Google Calendar",
@@ -883,22 +1087,46 @@ async def disconnect_github(
             SET 
                 github_user_id = NULL,
                 github_username = NULL,
-                github_access_token = NULL
+                github_access_token = NULL,
+                github_org_name = NULL
             WHERE id = $1
             """,
             current_user.id,
         )
+        await bump_activity_version(db, current_user.id, "github")
         return {"status": "success", "message": "GitHub disconnected successfully"}
     except Exception as e:
-        print(f"Error disconnecting GitHub: {str(e)}")
+        logger.error("Error disconnecting GitHub: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to disconnect GitHub",
         )
 
 
+@app.post("/slack/events", include_in_schema=False)
+async def slack_events(request: Request, db: asyncpg.Connection = Depends(get_db)):
+    """Slack Events API webhook. Events are stored and acknowledged inline,
+    well within Slack's 3 second limit; a non-2xx makes Slack retry."""
+    body = await request.body()
+    if not verify_signature(
+        body,
+        request.headers.get("x-slack-request-timestamp"),
+        request.headers.get("x-slack-signature"),
+    ):
+        raise HTTPException(status_code=401, detail="Invalid Slack signature")
+
+    payload = json.loads(body)
+    if payload.get("type") == "url_verification":
+        return {"challenge": payload.get("challenge")}
+    if payload.get("type") == "event_callback":
+        await ingest_event(db, payload)
+    return Response(status_code=200)
+
+
 @app.get("/slack/activity")
 async def get_slack_activity(
+    request: Request,
+    response: Response,
     days: int = Query(default=7, ge=1, le=90),
     current_user: UserDB = Depends(get_current_user),
     db: asyncpg.Connection = Depends(get_db),
@@ -907,6 +1135,29 @@ async def get_slack_activity(
         raise HTTPException(status_code=400, detail="Slack account not connected")
 
     try:
+        # Calculate the date range
+        end_date = datetime.now(pytz.UTC)
+        start_date = end_date - timedelta(days=days)
+
+        # With every conversation ingested, each change bumps the version, so
+        # a revalidation is answered from it before any Slack call
+        stored = await stored_conversations(db, current_user.slack_user_id)
+        etag = None
+        if stored is not None and await all_covered(
+            db, current_user.slack_team_id, stored, start_date.timestamp()
+        ):
+            etag = await activity_etag(
+                db,
+                current_user.id,
+                "slack",
+                days,
+                work_schedule(current_user.timezone),
+                slack_user_id=current_user.slack_user_id,
+            )
+            not_modified = conditional_response(request, response, etag, "slack_activity")
+            if not_modified:
+                return not_modified
+
         # Get encrypted tokens from database
         tokens = await db.fetchrow(
             "SELECT slack_access_token FROM users WHERE id = $1", current_user.id
@@ -917,182 +1168,89 @@ async def get_slack_activity(
 
         # Initialize Slack client with user token instead of bot token
         user_token = decrypt_token(tokens["slack_access_token"])
-        client = WebClient(token=user_token)
-
-        # Calculate the date range
-        end_date = datetime.now(pytz.UTC)
-        start_date = end_date - timedelta(days=days)
-
-        # Initialize data structures
-        messages_by_day = defaultdict(int)
-        work_hours_count = 0
-        after_hours_count = 0
-        channel_distribution = defaultdict(int)
-        weekday_count = 0
-        weekend_count = 0
-        daily_active_hours = defaultdict(set)
-        response_times_by_hour = defaultdict(list)  # New structure for response times
-        last_received_message = {}  # Track last received message per channel
-
-        # Get list of all channels the user is part of
-        conversations_response = client.users_conversations(
-            user=current_user.slack_user_id,
-            types="public_channel,private_channel,mpim,im",
-            exclude_archived=True,
-            limit=1000,
+        client = make_slack_client(user_token)
+
+        # Every channel the user is part of, cached per Slack user
+        conversations = await user_conversations(db, client, current_user.slack_user_id)
+        # A refreshed listing may bring a conversation that is not covered
+        covered = etag is not None and (
+            conversations == stored
+            or await all_covered(
+                db, current_user.slack_team_id, conversations, start_date.timestamp()
+            )
         )
 
-        for conv in conversations_response["channels"]:
+        # Messages of each channel from ingested events for the channels they
+        # cover, else fetched, shared channels from the workspace cache
+        ingested = await ingested_histories(
+            db,
+            current_user.slack_team_id,
+            [conv["id"] for conv in conversations],
+            start_date.timestamp(),
+            end_date.timestamp(),
+        )
+        records = MessageRecords(current_user.slack_user_id)
+        for conv in conversations:
             try:
-                # Get messages from each channel
-                messages_response = client.conversations_history(
-                    channel=conv["id"],
-                    oldest=start_date.timestamp(),
-                    latest=end_date.timestamp(),
-                    limit=1000,  # Increased limit to get more messages
-                )
-
-                # Get channel name for context
-                channel_name = conv.get(
-                    "name", "DM" if conv.get("is_im") else "private-channel"
-                )
-
-                # Sort messages by timestamp
-                all_messages = messages_response.get("messages", [])
-                all_messages.sort(key=lambda x: float(x["ts"]))
-
-                for i, msg in enumerate(all_messages):
-                    msg_time = datetime.fromtimestamp(float(msg["ts"]), pytz.UTC)
-
-                    # Skip messages outside our date range
-                    if msg_time < start_date or msg_time > end_date:
-                        continue
-
-                    # If this is a message TO the user
-                    if msg.get("user") != current_user.slack_user_id:
-                        last_received_message[conv["id"]] = msg
-                        continue
-
-                    # If this is a message FROM the user
-                    if msg.get("user") == current_user.slack_user_id:
-                        # Daily message count and other metrics
-                        day = msg_time.date().isoformat()
-                        messages_by_day[day] += 1
-
-                        hour = msg_time.hour
-                        if 9 <= hour <= 17:
-                            work_hours_count += 1
-                        else:
-                            after_hours_count += 1
-
-                        channel_distribution[channel_name] += 1
-
-                        if msg_time.weekday() < 5:
-                            weekday_count += 1
-                        else:
-                            weekend_count += 1
-
-                        daily_active_hours[day].add(hour)
-
-                        # Calculate response time if there was a previous message to respond to
-                        last_msg = last_received_message.get(conv["id"])
-                        if last_msg:
-                            last_msg_time = datetime.fromtimestamp(
-                                float(last_msg["ts"]), pytz.UTC
-                            )
-
-                            # Only calculate response time if messages are within 24 hours
-                            time_diff = (msg_time - last_msg_time).total_seconds()
-                            if time_diff <= 86400:  # 24 hours in seconds
-                                response_time = time_diff / 60  # Convert to minutes
-                                response_times_by_hour[last_msg_time.hour].append(
-                                    response_time
-                                )
-
-                            # Clear the last received message since we've responded
-                            last_received_message[conv["id"]] = None
-
-            except Exception as e:
-                print(f"Error fetching messages from channel {channel_name}: {str(e)}")
-                continue
-
-        # Calculate average response times by hour with better handling
-        avg_response_times = []
-        for hour in range(24):
-            times = response_times_by_hour[hour]
-            if times:
-                # Remove outliers (responses > 4 hours)
-                filtered_times = [t for t in times if t <= 240]
-                if filtered_times:
-                    avg_time = sum(filtered_times) / len(filtered_times)
+                if conv["id"] in ingested:
+                    messages, replies = ingested[conv["id"]]
                 else:
-                    avg_time = 0  # Default to 0 minutes if all responses were outliers
-            else:
-                # If no data for this hour, interpolate from adjacent hours
-                prev_hour = (hour - 1) % 24
-                next_hour = (hour + 1) % 24
-                prev_times = response_times_by_hour[prev_hour]
-                next_times = response_times_by_hour[next_hour]
-
-                if prev_times or next_times:
-                    all_adjacent_times = prev_times + next_times
-                    filtered_times = [t for t in all_adjacent_times if t <= 240]
-                    avg_time = (
-                        sum(filtered_times) / len(filtered_times)
-                        if filtered_times
-                        else 0
+                    messages, replies = fetch_history(
+                        client,
+                        current_user.slack_team_id,
+                        conv,
+                        start_date.timestamp(),
+                        end_date.timestamp(),
+                        with_replies=True,
                     )
-                else:
-                    avg_time = 0  # Default when no data available
-
-            avg_response_times.append(
-                {
-                    "hour": hour,
-                    "avgResponseTime": round(avg_time, 2),
-                    "messageCount": len(times),
-                }
-            )
-
-        # Format the response data
-        response = {
-            "messagesByDay": [
-                {"date": date, "count": count}
-                for date, count in sorted(messages_by_day.items())
-            ],
-            "workHoursVsAfterHours": [
-                {"name": "Work Hours (9-5)", "messages": work_hours_count},
-                {"name": "After Hours", "messages": after_hours_count},
-            ],
-            "channelDistribution": [
-                {"name": channel, "value": count}
-                for channel, count in sorted(
-                    channel_distribution.items(), key=lambda x: x[1], reverse=True
-                )[
-                    :5
-                ]  # Top 5 channels
-            ],
-            "responseTimesByHour": avg_response_times,
-            "weekdayVsWeekend": [
-                {"name": "Weekdays", "messages": weekday_count},
-                {"name": "Weekends", "messages": weekend_count},
-            ],
-            "dailyActiveHours": [
-                {"date": date, "hours": len(hours)}
-                for date, hours in sorted(daily_active_hours.items())
-            ],
-        }
+                records.add_conversation(conv, messages, replies)
+            except Exception as e:
+                logger.warning(
+                    "Error fetching messages from channel %s: %s", conv["id"], e
+                )
+                continue
 
-        return response
+        chart = build_slack_activity_chart(
+            records,
+            start_date,
+            end_date,
+            work_schedule(
+                current_user.timezone,
+                current_user.work_start_hour,
+                current_user.work_end_hour,
+            ),
+        )
+        return chart if covered else payload_response(request, chart, "slack_activity")
 
     except Exception as e:
-        print(f"Error fetching Slack activity: {str(e)}")
+        logger.error("Error fetching Slack activity: %s", e)
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch Slack activity: {str(e)}"
         )
 
 
+@app.post("/github/webhook", include_in_schema=False)
+async def github_webhook(request: Request, db: asyncpg.Connection = Depends(get_db)):
+    """GitHub repository and organization webhook for push, pull_request,
+    pull_request_review and issues events (and the ping sent on creation).
+    Deliveries are stored inline, well within GitHub's 10 second limit."""
+    body = await request.body()
+    if not github_events.verify_signature(body, request.headers.get("x-hub-signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid GitHub signature")
+
+    result = await github_events.ingest_webhook(
+        db,
+        request.headers.get("x-github-event", ""),
+        request.headers.get("x-github-delivery", ""),
+        json.loads(body),
+    )
+    return {"result": result}
+
+
 @app.get("/github/activity")
 async def get_github_activity(
+    request: Request,
+    response: Response,
     days: int = Query(default=7, ge=1, le=90),
     current_user: UserDB = Depends(get_current_user),
     db: asyncpg.Connection = Depends(get_db),
@@ -1102,6 +1260,26 @@ async def get_github_activity(
         raise HTTPException(status_code=400, detail="GitHub account not connected")
 
     try:
+        # Calculate date range
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=days)
+
+        # With hooks covering every repository the user works in, each event
+        # bumps the version, so a revalidation is answered before polling
+        etag = None
+        if await github_events.owners_covered(db, current_user.id, start_date):
+            etag = await activity_etag(
+                db,
+                current_user.id,
+                "github",
+                days,
+                work_schedule(current_user.timezone),
+                github_user_id=current_user.github_user_id,
+            )
+            not_modified = conditional_response(request, response, etag, "github_activity")
+            if not_modified:
+                return not_modified
+
         # Get user's GitHub token
         github_data = await db.fetchrow(
             """
@@ -1118,97 +1296,52 @@ async def get_github_activity(
         access_token = decrypt_token(github_data["github_access_token"])
         username = github_data["github_username"]
 
-        # Calculate date range
-        end_date = datetime.now(timezone.utc)
-        start_date = end_date - timedelta(days=days)
-
-        async with httpx.AsyncClient() as client:
-            # Get user's events
+        async with http_client() as client:
+            # Get user's events, from webhook deliveries for the repository
+            # owners they cover
             events_response = await client.get(
-                f"https://api.github.com/users/{username}/events",
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Accept": "application/vnd.github.v3+json",
-                },
+                f"{GITHUB_API_URL}/users/{username}/events",
+                headers=github_headers(access_token),
             )
-            events = events_response.json()
-
-            # Collect activity stats
-            activity_stats = {
-                "commit_count": 0,
-                "pr_count": 0,
-                "review_count": 0,
-                "issue_count": 0,
-                "comment_count": 0,
-                "active_repos": set(),
-                "events_by_day": {},
-                "language_distribution": {},  # New field for language stats
-            }
-
-            # Set timezone to IST
-            ist = timezone(timedelta(hours=5, minutes=30))
+            polled = events_response.json()
+            await github_events.record_owners(db, current_user.id, polled)
+            # The poll may bring an owner without a hook
+            covered = etag is not None and await github_events.owners_covered(
+                db, current_user.id, start_date
+            )
+            events = await github_events.merge_ingested(db, username, polled, start_date)
+            records = EventRecords(details=False)
+            records.add_events(events)
+
+            activity_stats = aggregate_github_events(
+                records,
+                start_date,
+                end_date,
+                include_details=False,
+                schedule=work_schedule(
+                    current_user.timezone,
+                    current_user.work_start_hour,
+                    current_user.work_end_hour,
+                ),
+            )
+            activity_stats["language_distribution"] = {}  # Language stats
 
             # Track unique repositories to fetch their languages
-            unique_repos = set()
-
-            for event in events:
-                # Convert event time to IST
-                event_utc = datetime.strptime(
-                    event["created_at"], "%Y-%m-%dT%H:%M:%SZ"
-                ).replace(tzinfo=timezone.utc)
-                event_date = event_utc.astimezone(ist)
-
-                if start_date <= event_date <= end_date:
-                    event_type = event["type"]
-                    day = event_date.strftime("%Y-%m-%d")
-
-                    if day not in activity_stats["events_by_day"]:
-                        activity_stats["events_by_day"][day] = {}
-
-                    if event_type not in activity_stats["events_by_day"][day]:
-                        activity_stats["events_by_day"][day][event_type] = 0
-
-                    activity_stats["events_by_day"][day][event_type] += 1
-
-                    if "repo" in event:
-                        repo_name = event["repo"]["name"]
-                        activity_stats["active_repos"].add(repo_name)
-                        unique_repos.add(repo_name)
-
-                    # Track specific event types
-                    if event_type == "PushEvent":
-                        activity_stats["commit_count"] += len(
-                            event["payload"].get("commits", [])
-                        )
-                    elif event_type == "PullRequestEvent":
-                        activity_stats["pr_count"] += 1
-                    elif event_type == "PullRequestReviewEvent":
-                        activity_stats["review_count"] += 1
-                    elif event_type == "IssuesEvent":
-                        activity_stats["issue_count"] += 1
-                    elif event_type in [
-                        "IssueCommentEvent",
-                        "CommitCommentEvent",
-                        "PullRequestReviewCommentEvent",
-                    ]:
-                        activity_stats["comment_count"] += 1
+            unique_repos = set(activity_stats["active_repos"])
 
             # Fetch languages for each active repository
             for repo in unique_repos:
                 try:
                     # First get the repository details to handle redirects
                     repo_response = await client.get(
-                        f"https://api.github.com/repos/{repo}",
-                        headers={
-                            "Authorization": f"Bearer {access_token}",
-                            "Accept": "application/vnd.github.v3+json",
-                        },
+                        f"{GITHUB_API_URL}/repos/{repo}",
+                        headers=github_headers(access_token),
                         follow_redirects=True,
                     )
 
                     if repo_response.status_code != 200:
-                        print(
-                            f"Error accessing repo {repo}: {repo_response.status_code}"
+                        logger.warning(
+                            "Error accessing repo %s: %s", repo, repo_response.status_code
                         )
                         continue
 
@@ -1218,23 +1351,22 @@ async def get_github_activity(
                         continue
 
                     languages_response = await client.get(
-                        f"https://api.github.com/repos/{repo}/languages",
-                        headers={
-                            "Authorization": f"Bearer {access_token}",
-                            "Accept": "application/vnd.github.v3+json",
-                        },
+                        f"{GITHUB_API_URL}/repos/{repo}/languages",
+                        headers=github_headers(access_token),
                         follow_redirects=True,
                     )
 
                     if languages_response.status_code != 200:
-                        print(
-                            f"Error fetching languages for repo {repo}: {languages_response.status_code}"
+                        logger.warning(
+                            "Error fetching languages for repo %s: %s",
+                            repo,
+                            languages_response.status_code,
                         )
                         continue
 
                     languages = languages_response.json()
                     if not isinstance(languages, dict):
-                        print(f"Invalid language data for repo {repo}: {languages}")
+                        logger.warning("Invalid language data for repo %s: %s", repo, languages)
                         continue
 
                     # Add language bytes to distribution with proper type conversion
@@ -1248,20 +1380,25 @@ async def get_github_activity(
                             elif isinstance(bytes_count, (int, float)):
                                 bytes_count = int(bytes_count)
                             else:
-                                print(
-                                    f"Invalid bytes count format for {language}: {bytes_count}"
+                                logger.warning(
+                                    "Invalid bytes count format for %s: %s",
+                                    language,
+                                    bytes_count,
                                 )
                                 continue
                             activity_stats["language_distribution"][
                                 language
                             ] += bytes_count
                         except (ValueError, TypeError) as e:
-                            print(
-                                f"Error processing language {language} in repo {repo}: {str(e)}"
+                            logger.warning(
+                                "Error processing language %s in repo %s: %s",
+                                language,
+                                repo,
+                                e,
                             )
                             continue
                 except Exception as e:
-                    print(f"Error processing repo {repo}: {str(e)}")
+                    logger.warning("Error processing repo %s: %s", repo, e)
                     continue
 
             # Convert language distribution to percentage
@@ -1285,13 +1422,17 @@ async def get_github_activity(
             else:
                 activity_stats["language_distribution"] = []
 
-            # Convert active_repos to list for JSON serialization
-            activity_stats["active_repos"] = list(activity_stats["active_repos"])
+            # Convert active_repos to list for JSON serialization, in a
+            # stable order for the payload ETag
+            activity_stats["active_repos"] = sorted(activity_stats["active_repos"])
 
-            return activity_stats
+            # Without hooks for every owner no version stamp covers them
+            if covered:
+                return activity_stats
+            return payload_response(request, activity_stats, "github_activity")
 
     except Exception as e:
-        print(f"Error fetching GitHub activity: {str(e)}")
+        logger.error("Error fetching GitHub activity: %s", e)
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch GitHub activity: {str(e)}"
         )
@@ -1324,14 +1465,11 @@ async def get_code_quality_insights(
         access_token = decrypt_token(github_data["github_access_token"])
         username = github_data["github_username"]
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             # Get user's recent commits
             commits_response = await client.get(
-                f"https://api.github.com/users/{username}/events",
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Accept": "application/vnd.github.v3+json",
-                },
+                f"{GITHUB_API_URL}/users/{username}/events",
+                headers=github_headers(access_token),
             )
             events = commits_response.json()
 
@@ -1349,10 +1487,7 @@ async def get_code_quality_insights(
                             try:
                                 commit_detail = await client.get(
                                     commit["url"],
-                                    headers={
-                                        "Authorization": f"Bearer {access_token}",
-                                        "Accept": "application/vnd.github.v3+json",
-                                    },
+                                    headers=github_headers(access_token),
                                 )
                                 if commit_detail.status_code == 200:
                                     commit_data = commit_detail.json()
@@ -1366,63 +1501,101 @@ async def get_code_quality_insights(
                                                     }
                                                 )
                             except Exception as e:
-                                print(f"Error fetching commit details: {str(e)}")
+                                logger.warning("Error fetching commit details: %s", e)
                                 continue
 
-            # Use OpenAI to analyze code quality
-            openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-            analysis_prompt = f"""Analyze the following GitHub activity and provide code quality insights:
+            # Analyze code quality through the LLM router
 
+            code_changes_text = "\n".join(
+                f"File: {change['file']}\nChanges:\n{truncate_text(change['changes'], 1500)}"
+                for change in code_changes[:5]
+            )  # Limit to 5 files
+            analysis_prompt = (
+                PromptBuilder("code-quality")
+                .add(
+                    "Analyze the following GitHub activity and provide code quality insights:"
+                )
+                .add(
+                    f"""
 Commit Messages:
-{chr(10).join(commit_messages[:10])}  # Limit to last 10 commits
-
+{chr(10).join(truncate_text(m, 200) for m in commit_messages[:10])}
+""",  # Limit to last 10 commits
+                    shrinkable=True,
+                )
+                .add(
+                    f"""
 Code Changes Samples:
-{chr(10).join([f"File: {change['file']}\nChanges:\n{change['changes']}" for change in code_changes[:5]])}  # Limit to 5 files
-
+{code_changes_text}
+""",
+                    shrinkable=True,
+                )
+                .add(
+                    """
 Please provide analysis in the following JSON format:
-{{
-    "commit_quality": {{
+{
+    "commit_quality": {
         "score": "1-10 rating of commit message quality",
         "strengths": ["list of good practices observed"],
         "improvements": ["list of suggested improvements"]
-    }},
-    "code_quality": {{
+    },
+    "code_quality": {
         "score": "1-10 rating of code quality",
         "strengths": ["list of good practices observed"],
         "improvements": ["list of suggested improvements"]
-    }},
-    "best_practices": {{
+    },
+    "best_practices": {
         "followed": ["list of best practices being followed"],
         "suggested": ["list of best practices to adopt"]
-    }},
+    },
     "summary": "A brief summary of overall code quality and suggestions"
-}}
+}
 """
+                )
+                .build()
+            )
 
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                response_format={"type": "json_object"},
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a code quality analyst. Analyze GitHub activity and provide constructive feedback on code quality, commit messages, and development practices.",
-                    },
-                    {"role": "user", "content": analysis_prompt},
-                ],
+            response = await complete(
+                "code-quality",
+                analysis_prompt,
+                system="You are a code quality analyst. Analyze GitHub activity and provide constructive feedback on code quality, commit messages, and development practices.",
+                max_tokens=2048,
+                json_mode=True,
             )
 
-            return json.loads(response.choices[0].message.content)
+            return parse_json(response.text)
 
     except Exception as e:
-        print(f"Error analyzing code quality: {str(e)}")
+        logger.error("Error analyzing code quality: %s", e)
         raise HTTPException(
             status_code=500, detail=f"Failed to analyze code quality: {str(e)}"
         )
 
 
+@router.get("/llm/latency")
+async def get_llm_latency(current_user: UserDB = Depends(get_current_user)):
+    """Per-model LLM latency histograms for this worker"""
+    return get_latency_histograms()
+
+
+@app.post("/google/calendar/notifications", include_in_schema=False)
+async def calendar_notifications(request: Request, db: asyncpg.Connection = Depends(get_db)):
+    """Google Calendar push notifications for the watch channels. They carry
+    no event data; a change starts a syncToken delta sync in the background."""
+    result = await calendar_sync.handle_notification(
+        db,
+        request.headers.get("x-goog-channel-id"),
+        request.headers.get("x-goog-channel-token"),
+        request.headers.get("x-goog-resource-state"),
+    )
+    if result == "invalid":
+        raise HTTPException(status_code=401, detail="Invalid channel token")
+    return Response(status_code=200)
+
+
 @app.get("/calendar/activity")
 async def get_calendar_activity(
+    request: Request,
+    response: Response,
     days: int = Query(default=7, ge=1, le=90),
     current_user: UserDB = Depends(get_current_user),
     db: asyncpg.Connection = Depends(get_db),
@@ -1431,17 +1604,166 @@ async def get_calendar_activity(
     if not current_user.google_calendar_connected:
         raise HTTPException(status_code=400, detail="Google Calendar not connected")
 
+    # A live mirror gets every change, bumping the version
+    covered = await mirror_live(db, current_user.id)
+    if covered:
+        etag = await activity_etag(
+            db, current_user.id, "calendar", days, work_schedule(current_user.timezone)
+        )
+        not_modified = conditional_response(request, response, etag, "calendar_activity")
+        if not_modified:
+            return not_modified
+
     try:
         from .services.calendar import get_calendar_activity_stats
 
-        return await get_calendar_activity_stats(current_user.id, db, days)
+        stats = await get_calendar_activity_stats(current_user.id, db, days)
+        return stats if covered else payload_response(request, stats, "calendar_activity")
     except Exception as e:
-        print(f"Error fetching calendar activity: {str(e)}")
+        logger.error("Error fetching calendar activity: %s", e)
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch calendar activity: {str(e)}"
         )
 
 
+@app.get("/burnout/score")
+async def get_burnout_score(
+    days: int = Query(default=30, ge=1, le=365),
+    current_user: UserDB = Depends(get_current_user),
+    db: asyncpg.Connection = Depends(get_db),
+):
+    """Latest burnout risk score with its components, and the scores recorded
+    over the last N days"""
+    rows = await db.fetch(
+        """
+        SELECT risk_score, generated_at
+        FROM burnout_scores
+        WHERE user_id = $1 AND generated_at >= NOW() - make_interval(days => $2)
+        ORDER BY generated_at
+        """,
+        current_user.id,
+        days,
+    )
+    return {
+        "latest": await latest_burnout_score(db, current_user.id),
+        "history": [dict(row) for row in rows],
+    }
+
+
+@app.get("/trends/{metric}")
+async def get_trend(
+    metric: str,
+    resolution: str = "day",
+    start: date | None = None,
+    end: date | None = None,
+    points: int = Query(default=MAX_TREND_POINTS, ge=3, le=MAX_TREND_POINTS),
+    current_user: UserDB = Depends(get_current_user),
+    db: asyncpg.Connection = Depends(get_db),
+):
+    """Stored history of a metric (the burnout score or a daily rollup) at day,
+    week or month resolution, downsampled to at most `points` points"""
+    if metric not in TREND_METRICS:
+        raise HTTPException(
+            status_code=400, detail=f"metric must be one of {', '.join(TREND_METRICS)}"
+        )
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}"
+        )
+    default_start, default_end = default_trend_range()
+    start, end = start or default_start, end or default_end
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    return {
+        "metric": metric,
+        "resolution": resolution,
+        "start": start,
+        "end": end,
+        "points": await fetch_trend(
+            db, current_user.id, metric, start, end, resolution, points
+        ),
+    }
+
+
+def quantile_range(metric: str, start: date | None, end: date | None) -> tuple[date, date]:
+    """Validated metric and range of a quantiles request, the last 30 days by default"""
+    if metric not in SKETCH_METRICS:
+        raise HTTPException(
+            status_code=400, detail=f"metric must be one of {', '.join(SKETCH_METRICS)}"
+        )
+    default_start, default_end = default_trend_range(30)
+    start, end = start or default_start, end or default_end
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+@app.get("/quantiles/{metric}")
+async def get_quantiles(
+    metric: str,
+    start: date | None = None,
+    end: date | None = None,
+    current_user: UserDB = Depends(get_current_user),
+    db: asyncpg.Connection = Depends(get_db),
+):
+    """p50/p90/p99 of a distribution (response minutes, thread lengths,
+    meeting minutes) over any range, merged from stored daily sketches"""
+    start, end = quantile_range(metric, start, end)
+    digest, _ = await fetch_quantiles(db, [current_user.id], metric, start, end)
+    return {"metric": metric, "start": start, "end": end, **summarize_digest(digest)}
+
+
+@app.get("/teams/{kind}")
+async def get_team_stats(
+    kind: str,
+    current_user: UserDB = Depends(get_current_user),
+    db: asyncpg.Connection = Depends(get_db),
+):
+    """Anonymised distribution of workload metrics across the caller's own
+    Slack team (kind=slack) or GitHub org (kind=github)"""
+    if kind not in COHORTS:
+        raise HTTPException(
+            status_code=400, detail=f"kind must be one of {', '.join(COHORTS)}"
+        )
+    cohort_id = await db.fetchval(
+        f"SELECT {COHORTS[kind]} FROM users WHERE id = $1", current_user.id
+    )
+    if not cohort_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Slack team not connected" if kind == "slack" else "GitHub org not set",
+        )
+    return await cohort_stats(db, kind, cohort_id)
+
+
+@app.get("/teams/{kind}/quantiles/{metric}")
+async def get_team_quantiles(
+    kind: str,
+    metric: str,
+    start: date | None = None,
+    end: date | None = None,
+    current_user: UserDB = Depends(get_current_user),
+    db: asyncpg.Connection = Depends(get_db),
+):
+    """Anonymised p50/p90/p99 of a distribution across the caller's own Slack
+    team or GitHub org, merged from the members' daily sketches"""
+    if kind not in COHORTS:
+        raise HTTPException(
+            status_code=400, detail=f"kind must be one of {', '.join(COHORTS)}"
+        )
+    start, end = quantile_range(metric, start, end)
+    cohort_id = await db.fetchval(
+        f"SELECT {COHORTS[kind]} FROM users WHERE id = $1", current_user.id
+    )
+    if not cohort_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Slack team not connected" if kind == "slack" else "GitHub org not set",
+        )
+    return await cohort_quantiles(db, kind, cohort_id, metric, start, end)
+
+
 @app.put("/disable-account")
 async def disable_account(
     current_user: UserDB = Depends(get_current_user),
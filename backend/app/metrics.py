@@ -0,0 +1,147 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Latency buckets in seconds, wide enough for multi-minute analyze calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Seconds between event-loop lag probes
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", 0.25))
+
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+HTTP_REQUEST_DURATION = Histogram(
+    "workdiary_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "workdiary_http_requests_in_flight", "HTTP requests currently being served"
+)
+
+DB_CONNECTIONS_OPEN = Gauge(
+    "workdiary_db_connections_open", "Database connections currently held by requests"
+)
+DB_CONNECT_DURATION = Histogram(
+    "workdiary_db_connect_duration_seconds",
+    "Time to open a database connection",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "workdiary_upstream_request_duration_seconds",
+    "Slack, GitHub and Google API call latency",
+    ["provider", "endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUESTS = Counter(
+    "workdiary_upstream_requests_total",
+    "Slack, GitHub and Google API calls by outcome",
+    ["provider", "endpoint", "outcome"],
+)
+
+LLM_REQUEST_DURATION = Histogram(
+    "workdiary_llm_request_duration_seconds",
+    "LLM call latency by model",
+    ["provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "workdiary_llm_requests_total",
+    "LLM calls by model and outcome (ok, error or cancelled by a hedge)",
+    ["provider", "model", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "workdiary_llm_tokens_total",
+    "LLM tokens reported by the provider",
+    ["provider", "model", "direction"],
+)
+LLM_HEDGES = Counter(
+    "workdiary_llm_hedges_total", "Hedged LLM requests by task", ["task"]
+)
+
+CACHE_REQUESTS = Counter(
+    "workdiary_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+
+EVENT_LOOP_LAG = Gauge(
+    "workdiary_event_loop_lag_seconds", "Most recent event-loop scheduling delay"
+)
+EVENT_LOOP_LAG_DURATION = Histogram(
+    "workdiary_event_loop_lag_duration_seconds",
+    "Event-loop scheduling delay per probe",
+    buckets=LAG_BUCKETS,
+)
+
+
+@contextmanager
+def track_upstream(provider: str, endpoint: str):
+    """Time one upstream API call; exceptions count as errors and propagate"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_REQUEST_DURATION.labels(provider, endpoint).observe(
+            time.perf_counter() - started
+        )
+        UPSTREAM_REQUESTS.labels(provider, endpoint, outcome).inc()
+
+
+def record_upstream(provider: str, endpoint: str, outcome: str, seconds: float):
+    UPSTREAM_REQUEST_DURATION.labels(provider, endpoint).observe(seconds)
+    UPSTREAM_REQUESTS.labels(provider, endpoint, outcome).inc()
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+async def monitor_event_loop_lag():
+    """Sleep for a fixed interval and record how late the loop woke us up.
+    Blocking calls on the loop (sync SDK clients, bcrypt) show up here."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - expected)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_DURATION.observe(lag)
+
+
+async def track_requests(request: Request, call_next):
+    """HTTP middleware recording latency per route template and in-flight count"""
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Label by template, not raw path, to keep label cardinality bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            request.method, route.path if route else "unmatched", str(status)
+        ).observe(time.perf_counter() - started)
+
+
+def metrics_response(request: Request) -> Response:
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response(status_code=401)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
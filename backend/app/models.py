@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 
@@ -39,6 +39,139 @@ class UserDB(BaseModel):
     github_user_id: Optional[str] = None
     github_username: Optional[str] = None
     github_access_token: Optional[str] = None
+    timezone: Optional[str] = None
+    work_start_hour: Optional[int] = None
+    work_end_hour: Optional[int] = None
 
     class Config:
         orm_mode = True
+
+
+# Analysis payloads. Declaring them as response models lets pydantic-core
+# validate and serialize the (often several hundred KB) results instead of
+# FastAPI's recursive jsonable_encoder.
+
+
+class DeepDiscussion(BaseModel):
+    channel: str
+    length: int
+    user_participation: int
+    timestamp: str
+    topic: str
+
+
+class ChannelThreads(BaseModel):
+    initiated_threads: int
+    avg_thread_length: float
+    deep_discussions: int
+
+
+class ThreadAnalysis(BaseModel):
+    threads_initiated: int
+    thread_replies: int
+    avg_thread_length: float
+    long_threads: int
+    thread_depths: List[int]
+    threads_by_channel: Dict[str, ChannelThreads]
+    deep_discussions: List[DeepDiscussion]
+
+
+class TimeAnalysis(BaseModel):
+    daily_breakdown: Dict[str, int]
+    hourly_heatmap: Dict[str, int]
+    peak_hours: List[Tuple[str, int]]
+    busiest_days: List[Tuple[str, int]]
+    work_hours_ratio: float
+
+
+class SlackProfile(BaseModel):
+    real_name: str = ""
+    display_name: str = ""
+    first_name: str = ""
+    email: str = ""
+    title: str = ""
+    status_text: str = ""
+    status_emoji: str = ""
+
+
+class SlackAnalysis(BaseModel):
+    user_profile: SlackProfile
+    message_count: int
+    dm_message_count: int
+    channel_message_count: int
+    after_hours_messages: int
+    avg_response_time: float
+    # Local scorer or LLM output per day / channel; the LLM's JSON is not
+    # constrained beyond being an object
+    daily_sentiment: Dict[str, Dict[str, Any]]
+    channel_sentiment: Dict[str, Dict[str, Any]]
+    time_analysis: TimeAnalysis
+    thread_analysis: ThreadAnalysis
+
+
+class MeetingDetail(BaseModel):
+    title: str
+    start_time: str
+    end_time: str
+    day: str
+    duration_minutes: float
+    attendees: int
+    description: str
+    is_recurring: bool
+
+
+class FreeBlock(BaseModel):
+    start: str
+    end: str
+    duration_minutes: float
+
+
+class CalendarAIAnalysis(BaseModel):
+    burnout_risk: str
+    schedule_optimization: str
+
+
+class CalendarAnalysis(BaseModel):
+    total_meetings: int
+    total_duration_minutes: float
+    meetings_after_hours: int
+    early_meetings: int
+    longest_meeting_duration: float
+    back_to_back_meetings: int
+    meeting_free_blocks: List[FreeBlock]
+    meeting_details: List[MeetingDetail]
+    daily_meeting_counts: Dict[str, int]
+    recurring_meetings: int
+    weekly_patterns: Dict[str, int]
+    # Only present when there were meetings
+    average_meeting_duration: Optional[float] = None
+    meetings_per_day: Optional[float] = None
+    ai_analysis: CalendarAIAnalysis
+
+
+class GithubEventDetail(BaseModel):
+    type: str
+    # None for events without a repository
+    repo: Optional[str]
+    created_at: str
+    commit_count: Optional[int] = None
+    commit_message: Optional[str] = None
+    action: Optional[str] = None
+    title: Optional[str] = None
+
+
+class GithubStats(BaseModel):
+    commit_count: int
+    pr_count: int
+    review_count: int
+    issue_count: int
+    comment_count: int
+    active_repos: List[str]
+    events_by_day: Dict[str, Dict[str, int]]
+    event_details: List[GithubEventDetail]
+
+
+class GithubAnalysis(BaseModel):
+    stats: GithubStats
+    activity_analysis: str
+    code_analysis: str
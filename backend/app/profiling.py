@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from datetime import datetime, timezone
+from fastapi import Header, HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+# Profiling is off unless a token is configured. Requests opt in with an
+# "X-Profile-Token: <token>" header or a "?profile=<token>" query flag.
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Keep at most this many profiles on disk, oldest removed first
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))
+# Sampling interval for single requests
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+
+# Periodic whole-worker profiling: every PROFILER_PERIODIC_SECONDS, sample all
+# tasks for PROFILER_PERIODIC_WINDOW_SECONDS at a coarser interval. 0 disables.
+PERIODIC_EVERY = float(os.getenv("PROFILER_PERIODIC_SECONDS", 0))
+PERIODIC_WINDOW = float(os.getenv("PROFILER_PERIODIC_WINDOW_SECONDS", 10))
+PERIODIC_INTERVAL = float(os.getenv("PROFILER_PERIODIC_INTERVAL_MS", 20)) / 1000
+
+MAX_STACK_DEPTH = 128
+
+# Innermost functions meaning the loop is waiting for I/O, not running code
+IDLE_FUNCTIONS = {"select", "poll", "epoll", "kqueue", "_run_once"}
+
+# Task -> Sampler for tasks belonging to a profiled request
+_profiled_tasks = weakref.WeakKeyDictionary()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _fold(frame) -> list:
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _task_label(task) -> str:
+    name = task.get_name()
+    if not name.startswith("Task-"):
+        return name
+    return getattr(task.get_coro(), "__qualname__", name)
+
+
+class Sampler:
+    """Samples the event loop thread's stack from a background thread.
+
+    With scoped=True only samples taken while one of this sampler's tasks
+    (see _profiled_tasks) is running count, so concurrent requests on the
+    same worker do not pollute the profile. Otherwise every running task is
+    sampled and the task becomes the root frame."""
+
+    def __init__(self, loop, interval: float, scoped: bool):
+        self.loop = loop
+        self.thread_id = threading.get_ident()
+        self.interval = interval
+        self.scoped = scoped
+        self.counts = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        task = asyncio.current_task(self.loop)
+        if self.scoped:
+            if task is None or _profiled_tasks.get(task) is not self:
+                return
+            stack = _fold(frame)
+        else:
+            if task is None and frame.f_code.co_name in IDLE_FUNCTIONS:
+                return
+            root = _task_label(task) if task else "(event loop callbacks)"
+            stack = [root] + _fold(frame)
+        self.counts[";".join(stack)] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        """Brendan Gregg's folded stack format, readable by flamegraph.pl
+        and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def _task_factory(loop, coro, **kwargs):
+    """Default task creation, except that tasks started by a profiled task
+    are profiled as well"""
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    parent = asyncio.current_task(loop)
+    if parent is not None:
+        sampler = _profiled_tasks.get(parent)
+        if sampler is not None:
+            _profiled_tasks[task] = sampler
+    return task
+
+
+def install_task_factory():
+    """Enable per-request attribution; a no-op when profiling is disabled"""
+    if PROFILER_TOKEN:
+        asyncio.get_running_loop().set_task_factory(_task_factory)
+
+
+def save_profile(sampler: Sampler, label: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    name = f"{stamp}-{re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-')}.folded"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(sampler.folded())
+
+    # Prune the oldest profiles beyond PROFILE_KEEP
+    for old in list_profiles()[PROFILE_KEEP:]:
+        os.remove(os.path.join(PROFILE_DIR, old))
+    return name
+
+
+def list_profiles() -> list:
+    """Stored profile names, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted((f for f in os.listdir(PROFILE_DIR) if f.endswith(".folded")), reverse=True)
+
+
+def read_profile(name: str) -> str:
+    if name != os.path.basename(name) or name not in list_profiles():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(os.path.join(PROFILE_DIR, name)) as f:
+        return f.read()
+
+
+def require_profiler_token(x_profile_token: str | None = Header(default=None)):
+    """Dependency guarding the profile endpoints"""
+    if not PROFILER_TOKEN or x_profile_token != PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+def _wants_profile(request: Request) -> bool:
+    if not PROFILER_TOKEN or request.url.path.startswith("/debug/profiles"):
+        return False
+    token = request.headers.get("x-profile-token") or request.query_params.get("profile")
+    return token == PROFILER_TOKEN
+
+
+async def profile_requests(request: Request, call_next):
+    """HTTP middleware sampling one opted-in request and storing the profile"""
+    if not _wants_profile(request):
+        return await call_next(request)
+
+    task = asyncio.current_task()
+    sampler = Sampler(asyncio.get_running_loop(), PROFILE_INTERVAL, scoped=True)
+    _profiled_tasks[task] = sampler
+    sampler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+        _profiled_tasks.pop(task, None)
+
+    response.headers["X-Profile-Samples"] = str(sampler.samples)
+    if not sampler.samples:
+        # Nothing ran on the loop long enough to be sampled
+        return response
+    name = save_profile(sampler, f"{request.method} {request.url.path}")
+    logger.info(
+        "Profiled %s %s: %s samples in %.2fs -> %s",
+        request.method,
+        request.url.path,
+        sampler.samples,
+        sampler.duration,
+        name,
+    )
+    response.headers["X-Profile-Id"] = name
+    return response
+
+
+async def run_periodic_profiler():
+    """Background job sampling the whole worker in short windows"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(PERIODIC_EVERY)
+        sampler = Sampler(loop, PERIODIC_INTERVAL, scoped=False)
+        sampler.start()
+        try:
+            await asyncio.sleep(PERIODIC_WINDOW)
+        finally:
+            sampler.stop()
+        if sampler.samples:
+            save_profile(sampler, "periodic")
@@ -0,0 +1,269 @@
+import json
+import logging
+import math
+import os
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio shared by Claude and GPT tokenizers for English text
+CHARS_PER_TOKEN = 4
+
+# Default input token budget per prompt, keyed by analysis task
+DEFAULT_TOKEN_BUDGETS = {
+    "sentiment": 1200,
+    "calendar-burnout": 1500,
+    "schedule-optimization": 1500,
+    "github-activity": 1200,
+    "code-quality": 2000,
+    "nudge": 4000,
+}
+
+
+def get_token_budget(task: str) -> int:
+    """Token budget for a task, overridable with PROMPT_BUDGET_<TASK> env vars"""
+    env_key = f"PROMPT_BUDGET_{task.upper().replace('-', '_')}"
+    return int(os.getenv(env_key, DEFAULT_TOKEN_BUDGETS.get(task, 2000)))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, deterministic token estimate used for budgeting"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_text(text: str | None, max_chars: int) -> str:
+    """Collapse whitespace and cut text at a word boundary"""
+    if not text:
+        return ""
+    text = " ".join(str(text).split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[: max(max_chars - 1, 0)]
+    if " " in cut[max_chars // 2 :]:
+        cut = cut[: cut.rfind(" ")]
+    return cut.rstrip() + "…"
+
+
+def top_k(counts: dict, k: int) -> list:
+    """Top k (key, count) pairs, ties broken by key so output is stable"""
+    return sorted(counts.items(), key=lambda x: (-x[1], str(x[0])))[:k]
+
+
+def _duration_bucket(minutes: float) -> str:
+    if minutes <= 15:
+        return "<=15m"
+    if minutes <= 30:
+        return "16-30m"
+    if minutes <= 60:
+        return "31-60m"
+    return ">60m"
+
+
+def summarize_meetings(meetings: list, max_items: int = 12) -> str:
+    """Summarize meeting details into histograms, top titles and a few exemplars"""
+    if not meetings:
+        return "- No meetings"
+
+    title_counts = Counter(m.get("title") or "Untitled" for m in meetings)
+    hour_counts = Counter(m.get("start_time", "00:00")[:2] for m in meetings)
+    duration_counts = Counter(
+        _duration_bucket(m.get("duration_minutes", 0)) for m in meetings
+    )
+    attendee_counts = Counter(
+        "1:1" if m.get("attendees", 0) <= 2 else "group" for m in meetings
+    )
+
+    lines = [
+        f"- {len(meetings)} meetings, "
+        f"{sum(1 for m in meetings if m.get('is_recurring'))} recurring",
+        "- Start hour histogram: "
+        + ", ".join(f"{h}h={c}" for h, c in sorted(hour_counts.items())),
+        "- Duration histogram: "
+        + ", ".join(f"{b}={c}" for b, c in top_k(duration_counts, 4)),
+        "- Size: " + ", ".join(f"{b}={c}" for b, c in top_k(attendee_counts, 2)),
+        "- Most frequent titles: "
+        + ", ".join(
+            f"{truncate_text(t, 40)} (x{c})" for t, c in top_k(title_counts, 5)
+        ),
+    ]
+
+    # Exemplars: the longest and the largest meetings, then fill in chronological order
+    exemplars = []
+    seen = set()
+    ranked = (
+        sorted(range(len(meetings)), key=lambda i: -meetings[i].get("duration_minutes", 0))[:3]
+        + sorted(range(len(meetings)), key=lambda i: -meetings[i].get("attendees", 0))[:3]
+        + list(range(len(meetings)))
+    )
+    for i in ranked:
+        if i in seen:
+            continue
+        seen.add(i)
+        exemplars.append(meetings[i])
+        if len(exemplars) >= max_items:
+            break
+
+    lines.append("- Example meetings:")
+    for meeting in exemplars:
+        line = (
+            f"  - {truncate_text(meeting.get('title'), 60)}: {meeting.get('day')} "
+            f"{meeting.get('start_time')}-{meeting.get('end_time')} "
+            f"({meeting.get('duration_minutes', 0):.0f} min, "
+            f"{meeting.get('attendees', 0)} attendees)"
+            f"{' (Recurring)' if meeting.get('is_recurring') else ''}"
+        )
+        if meeting.get("description"):
+            line += f" - {truncate_text(meeting['description'], 80)}"
+        lines.append(line)
+
+    if len(meetings) > len(exemplars):
+        lines.append(f"  - ... {len(meetings) - len(exemplars)} more meetings")
+    return "\n".join(lines)
+
+
+def summarize_github_events(event_details: list, max_items: int = 15) -> str:
+    """Summarize GitHub event details into type/repo histograms and exemplars"""
+    if not event_details:
+        return "- No events"
+
+    type_counts = Counter(e.get("type") for e in event_details)
+    repo_counts = Counter(e.get("repo") for e in event_details)
+
+    lines = [
+        f"- {len(event_details)} events",
+        "- By type: " + ", ".join(f"{t}={c}" for t, c in top_k(type_counts, 8)),
+        "- By repository: "
+        + ", ".join(f"{r}={c}" for r, c in top_k(repo_counts, 8)),
+    ]
+    if len(repo_counts) > 8:
+        lines[-1] += f" (+{len(repo_counts) - 8} more)"
+
+    # Prefer events carrying text (commit messages, titles), newest first
+    with_text = [
+        e for e in event_details if e.get("commit_message") or e.get("title")
+    ]
+    with_text.sort(key=lambda e: e.get("created_at", ""), reverse=True)
+
+    lines.append("- Example events:")
+    for event in with_text[:max_items]:
+        text = event.get("commit_message") or event.get("title")
+        action = f" {event['action']}" if event.get("action") else ""
+        lines.append(
+            f"  - {event.get('created_at')} {event.get('type')}{action} "
+            f"in {event.get('repo')}: {truncate_text(text, 100)}"
+        )
+    if len(with_text) > max_items:
+        lines.append(f"  - ... {len(with_text) - max_items} more")
+    return "\n".join(lines)
+
+
+def compact_value(value, max_list: int = 10, max_str: int = 200, depth: int = 0):
+    """Recursively shrink a JSON-like value: long lists are cut to a few items
+    plus a count, long strings are truncated and deep nesting is flattened"""
+    if isinstance(value, dict):
+        if depth >= 4:
+            return f"<{len(value)} keys>"
+        return {
+            k: compact_value(v, max_list, max_str, depth + 1) for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple, set)):
+        items = list(value)
+        if depth >= 4:
+            return f"<{len(items)} items>"
+        compacted = [compact_value(v, max_list, max_str, depth + 1) for v in items[:max_list]]
+        if len(items) > max_list:
+            compacted.append(f"... {len(items) - max_list} more")
+        return compacted
+    if isinstance(value, str):
+        return truncate_text(value, max_str)
+    if isinstance(value, float):
+        return round(value, 3)
+    return value
+
+
+def compact_json(value, token_budget: int) -> str:
+    """Serialize a value, shrinking it until it fits in the token budget"""
+    max_list, max_str = 10, 200
+    text = json.dumps(compact_value(value, max_list, max_str), default=str, ensure_ascii=False)
+    while estimate_tokens(text) > token_budget and (max_list > 1 or max_str > 20):
+        max_list = max(max_list // 2, 1)
+        max_str = max(max_str // 2, 20)
+        text = json.dumps(compact_value(value, max_list, max_str), default=str, ensure_ascii=False)
+    if estimate_tokens(text) > token_budget:
+        text = truncate_text(text, token_budget * CHARS_PER_TOKEN)
+    return text
+
+
+def _truncate_lines(text: str, max_chars: int) -> str:
+    """Keep whole lines up to max_chars and note how many were dropped"""
+    if len(text) <= max_chars:
+        return text
+    lines = text.split("\n")
+    kept, used = [], 0
+    for line in lines:
+        if used + len(line) + 1 > max_chars:
+            break
+        kept.append(line)
+        used += len(line) + 1
+    if not kept:
+        return truncate_text(text, max_chars)
+    kept.append(f"... ({len(lines) - len(kept)} more lines omitted)")
+    return "\n".join(kept)
+
+
+class PromptBuilder:
+    """Assemble a prompt from fixed and shrinkable sections within a token budget.
+
+    Fixed sections (instructions, output format) are always kept verbatim.
+    Shrinkable sections (data) share whatever budget is left, proportionally to
+    their size, and are cut on line boundaries."""
+
+    def __init__(self, task: str, budget: int | None = None):
+        self.task = task
+        self.budget = budget or get_token_budget(task)
+        self.sections = []
+
+    def add(self, text: str, shrinkable: bool = False):
+        self.sections.append((text, shrinkable))
+        return self
+
+    def build(self) -> "Prompt":
+        fixed_tokens = sum(estimate_tokens(t) for t, s in self.sections if not s)
+        flexible_tokens = sum(estimate_tokens(t) for t, s in self.sections if s)
+        available = max(self.budget - fixed_tokens, 0)
+
+        parts = []
+        for text, shrinkable in self.sections:
+            if shrinkable and flexible_tokens > available:
+                share = estimate_tokens(text) / flexible_tokens
+                text = _truncate_lines(text, int(available * share * CHARS_PER_TOKEN))
+            parts.append(text)
+
+        prompt_text = "\n".join(parts)
+        return Prompt(self.task, prompt_text, estimate_tokens(prompt_text), self.budget)
+
+
+class Prompt:
+    def __init__(self, task: str, text: str, estimated_tokens: int, budget: int):
+        self.task = task
+        self.text = text
+        self.estimated_tokens = estimated_tokens
+        self.budget = budget
+
+    def __str__(self):
+        return self.text
+
+
+def report_usage(task: str, model: str, estimated_tokens: int, input_tokens=None):
+    """Report input token counts for one LLM call"""
+    logger.info(
+        "LLM usage",
+        extra={
+            "task": task,
+            "model": model,
+            "estimated_input_tokens": estimated_tokens,
+            "input_tokens": input_tokens,
+        },
+    )
@@ -0,0 +1,222 @@
+from array import array
+import numpy as np
+from .services.timebuckets import parse_timestamps
+
+# Thread role of a Slack history message
+PLAIN, THREAD_STARTER, BROADCAST_REPLY = 0, 1, 2
+
+# Threads longer than this are "long"; with more of the user's replies than
+# DEEP_MIN_OWN_REPLIES as well they are kept as deep discussions
+LONG_THREAD_LENGTH = 5
+DEEP_MIN_OWN_REPLIES = 2
+TOPIC_CHARS = 100
+
+# Conversation kinds
+CHANNEL, DIRECT = 0, 1
+
+
+class Interner:
+    """Maps repeated strings (channel, repo, event type names) to small ints"""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def __call__(self, value) -> int:
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.values)
+            self.values.append(value)
+        return position
+
+    def __len__(self):
+        return len(self.values)
+
+
+class MessageRecords:
+    """Columnar store of Slack conversation histories.
+
+    One row per history message with its timestamp, conversation, whether
+    the user wrote it or is mentioned in it and its thread role. Thread
+    starters additionally carry their reply count and how many replies were
+    the user's, and each thread reply (the parent excluded) gets a row in the
+    reply_* columns for the response-time engine. Only the user's own message
+    texts are kept, for sentiment; other people's messages and the raw API
+    dicts can be dropped as soon as a page is added.
+    """
+
+    def __init__(self, slack_user_id: str):
+        self.slack_user_id = slack_user_id
+        self.mention = f"<@{slack_user_id}>"
+        self.channels = Interner()  # conversation id
+        self.channel_names = []  # display name per conversation
+        self.channel_kinds = array("b")  # CHANNEL or DIRECT per conversation
+
+        self.ts = array("d")
+        self.channel = array("i")
+        self.own = array("b")
+        self.thread_role = array("b")
+        self.thread_length = array("i")  # replies incl. parent, starters only
+        self.thread_own_replies = array("i")
+        self.mentions = array("b")
+
+        # Thread replies: the row of their thread's starter, time, whether
+        # the user wrote it or is mentioned in it
+        self.reply_thread = array("i")
+        self.reply_ts = array("d")
+        self.reply_own = array("b")
+        self.reply_mentions = array("b")
+
+        self.own_texts = []  # aligned with the rows where own is set
+        # Deep discussions as found: (row, ts string, topic)
+        self.deep_threads = []
+
+    def __len__(self):
+        return len(self.ts)
+
+    def add_conversation(self, conv: dict, messages: list, replies: dict | None = None):
+        """Add one page of conversations.history, with the replies of its
+        threads as {thread_ts: conversations.replies messages}"""
+        channel = self._channel(conv)
+        replies = replies or {}
+        for msg in messages:
+            own = msg.get("user") == self.slack_user_id
+            thread_ts = msg.get("thread_ts")
+            length = own_replies = 0
+            if thread_ts and thread_ts == msg["ts"]:
+                role = THREAD_STARTER
+                thread = replies.get(thread_ts, [])
+                length = len(thread)
+                own_replies = sum(1 for r in thread if r.get("user") == self.slack_user_id)
+                self._add_replies(len(self.ts), thread_ts, thread)
+                if length > LONG_THREAD_LENGTH and own_replies > DEEP_MIN_OWN_REPLIES:
+                    self.deep_threads.append(
+                        (len(self.ts), msg["ts"], msg.get("text", "")[:TOPIC_CHARS])
+                    )
+            else:
+                role = BROADCAST_REPLY if thread_ts else PLAIN
+
+            self.ts.append(float(msg["ts"]))
+            self.channel.append(channel)
+            self.own.append(own)
+            self.thread_role.append(role)
+            self.thread_length.append(length)
+            self.thread_own_replies.append(own_replies)
+            self.mentions.append(self.mention in msg.get("text", ""))
+            if own:
+                self.own_texts.append(msg.get("text", ""))
+
+    def _add_replies(self, starter: int, thread_ts: str, thread: list):
+        for reply in thread:
+            if reply["ts"] == thread_ts:
+                continue
+            self.reply_thread.append(starter)
+            self.reply_ts.append(float(reply["ts"]))
+            self.reply_own.append(reply.get("user") == self.slack_user_id)
+            self.reply_mentions.append(self.mention in reply.get("text", ""))
+
+    def _channel(self, conv: dict) -> int:
+        channel = self.channels(conv["id"])
+        if channel == len(self.channel_names):
+            self.channel_names.append(
+                conv.get("name", "DM" if conv.get("is_im") else "private-channel")
+            )
+            self.channel_kinds.append(
+                DIRECT if conv.get("is_im") or conv.get("is_mpim") else CHANNEL
+            )
+        return channel
+
+    def columns(self) -> dict:
+        """The columns as NumPy arrays (views, no copies)"""
+        return {
+            "ts": np.frombuffer(self.ts, dtype=np.float64),
+            "channel": np.frombuffer(self.channel, dtype=np.int32),
+            "own": np.frombuffer(self.own, dtype=np.int8).astype(bool),
+            "thread_role": np.frombuffer(self.thread_role, dtype=np.int8),
+            "thread_length": np.frombuffer(self.thread_length, dtype=np.int32),
+            "thread_own_replies": np.frombuffer(self.thread_own_replies, dtype=np.int32),
+            "channel_kind": np.frombuffer(self.channel_kinds, dtype=np.int8),
+            "mentions": np.frombuffer(self.mentions, dtype=np.int8).astype(bool),
+            "reply_thread": np.frombuffer(self.reply_thread, dtype=np.int32),
+            "reply_ts": np.frombuffer(self.reply_ts, dtype=np.float64),
+            "reply_own": np.frombuffer(self.reply_own, dtype=np.int8).astype(bool),
+            "reply_mentions": np.frombuffer(self.reply_mentions, dtype=np.int8).astype(bool),
+        }
+
+    def nbytes(self) -> int:
+        """Approximate memory held, texts included"""
+        columns = sum(
+            column.itemsize * len(column)
+            for column in (
+                self.ts,
+                self.channel,
+                self.own,
+                self.thread_role,
+                self.thread_length,
+                self.thread_own_replies,
+                self.mentions,
+                self.reply_thread,
+                self.reply_ts,
+                self.reply_own,
+                self.reply_mentions,
+            )
+        )
+        return columns + sum(len(text) for text in self.own_texts)
+
+
+class EventRecords:
+    """Columnar store of GitHub user events.
+
+    One row per event with its time, interned type and repo and its commit
+    count. With details=True the few strings the AI analysis shows per event
+    (action, title, first commit message) are kept as well."""
+
+    def __init__(self, details: bool = True):
+        self.details = details
+        self.types = Interner()
+        self.repos = Interner()
+        self.actions = Interner()
+
+        self.ts = array("d")
+        self.type = array("h")
+        self.repo = array("i")  # -1 when the event has no repo
+        self.commits = array("i")
+        self.action = array("h")  # -1 when the payload has no action
+        self.title = []  # details only
+        self.commit_message = []  # details only
+
+    def __len__(self):
+        return len(self.ts)
+
+    def add_events(self, events: list):
+        """Add one page of /users/{username}/events"""
+        timestamps = parse_timestamps([event["created_at"] for event in events])
+        self.ts.frombytes(timestamps.astype(np.float64).tobytes())
+        for event in events:
+            payload = event.get("payload", {})
+            event_type = event["type"]
+            commits = payload.get("commits") or []
+            self.type.append(self.types(event_type))
+            self.repo.append(self.repos(event["repo"]["name"]) if "repo" in event else -1)
+            self.commits.append(len(commits))
+            if not self.details:
+                continue
+
+            action = payload.get("action")
+            self.action.append(self.actions(action) if action is not None else -1)
+            if event_type == "PullRequestEvent":
+                title = payload.get("pull_request", {}).get("title")
+            elif event_type == "IssuesEvent":
+                title = payload.get("issue", {}).get("title")
+            else:
+                title = None
+            self.title.append(title)
+            self.commit_message.append(commits[0].get("message", "") if commits else None)
+
+    def columns(self) -> dict:
+        return {
+            "ts": np.frombuffer(self.ts, dtype=np.float64),
+            "type": np.frombuffer(self.type, dtype=np.int16),
+            "repo": np.frombuffer(self.repo, dtype=np.int32),
+            "commits": np.frombuffer(self.commits, dtype=np.int32),
+        }
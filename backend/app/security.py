@@ -1,14 +1,18 @@
+import logging
 import os
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 # Get key from environment or generate one if not exists
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY").encode()
 if not ENCRYPTION_KEY:
-    print("Warning: ENCRYPTION_KEY not found in environment. Generating a new one...")
-    print("Please add this key to your .env file:")
-    print(Fernet.generate_key().decode())
+    logger.warning(
+        "ENCRYPTION_KEY not found in environment, using a temporary key. "
+        "Generate one with Fernet.generate_key() and add it to your .env file"
+    )
     ENCRYPTION_KEY = Fernet.generate_key()
 else:
     # If key is provided as string in .env, encode it to bytes
@@ -22,7 +26,7 @@ def encrypt_token(token: str) -> bytes:
     try:
         return fernet.encrypt(token.encode())
     except Exception as e:
-        print(f"Error encrypting token: {e}")
+        logger.error("Error encrypting token: %s", e)
         raise e
 
 
@@ -30,5 +34,5 @@ def decrypt_token(encrypted_token: bytes) -> str:
     try:
         return fernet.decrypt(encrypted_token).decode()
     except Exception as e:
-        print(f"Error decrypting token: {e}")
+        logger.error("Error decrypting token: %s", e)
         raise e
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import asyncpg
+import numpy as np
+import orjson
+from .timebuckets import EPOCH_WEEKDAY
+
+logger = logging.getLogger(__name__)
+
+# Bump when components, saturations or weights change so every user's next
+# analysis records a fresh score instead of matching the last inputs hash
+SCORING_VERSION = 1
+
+# (name, source, saturation, weight). A component's raw value is a rate or
+# ratio from the source's analysis; it contributes min(raw / saturation, 1),
+# so saturation is the level we treat as maximal risk for that signal.
+COMPONENTS = [
+    ("slack.after_hours_ratio", "slack", 0.5, 3.0),
+    ("slack.weekend_ratio", "slack", 0.3, 2.0),
+    ("slack.messages_per_day", "slack", 150.0, 1.0),
+    ("calendar.meeting_hours_per_day", "calendar", 6.0, 3.0),
+    ("calendar.back_to_back_ratio", "calendar", 0.5, 2.0),
+    ("calendar.off_hours_ratio", "calendar", 0.3, 2.0),
+    ("github.commits_per_day", "github", 20.0, 1.0),
+    ("github.weekend_day_ratio", "github", 0.5, 2.0),
+]
+COMPONENT_NAMES = [name for name, _, _, _ in COMPONENTS]
+SATURATION = np.array([saturation for _, _, saturation, _ in COMPONENTS])
+WEIGHTS = np.array([weight for _, _, _, weight in COMPONENTS])
+
+# Rounding of raw inputs before hashing, so float noise does not count as change
+HASH_DECIMALS = 4
+
+
+def _ratio(part, whole) -> float:
+    return part / whole if whole else 0.0
+
+
+def slack_components(activity: dict, days: int) -> dict:
+    """Raw component values from aggregate_slack_activity output"""
+    messages = activity["message_count"]
+    daily = activity["time_analysis"]["daily_breakdown"]
+    return {
+        "slack.after_hours_ratio": _ratio(activity["after_hours_messages"], messages),
+        "slack.weekend_ratio": _ratio(daily["Saturday"] + daily["Sunday"], messages),
+        "slack.messages_per_day": messages / days,
+    }
+
+
+def calendar_components(stats: dict, days: int) -> dict:
+    """Raw component values from aggregate_calendar_events output"""
+    meetings = stats["total_meetings"]
+    return {
+        "calendar.meeting_hours_per_day": stats["total_duration_minutes"] / 60 / days,
+        "calendar.back_to_back_ratio": _ratio(stats["back_to_back_meetings"], meetings),
+        "calendar.off_hours_ratio": _ratio(
+            stats["meetings_after_hours"] + stats["early_meetings"], meetings
+        ),
+    }
+
+
+def github_components(stats: dict, days: int) -> dict:
+    """Raw component values from aggregate_github_events output"""
+    active_days = np.array(list(stats["events_by_day"]), dtype="datetime64[D]")
+    weekend = (active_days.astype(np.int64) + EPOCH_WEEKDAY) % 7 >= 5
+    return {
+        "github.commits_per_day": stats["commit_count"] / days,
+        "github.weekend_day_ratio": _ratio(int(weekend.sum()), len(active_days)),
+    }
+
+
+SOURCE_COMPONENTS = {
+    "slack": slack_components,
+    "calendar": calendar_components,
+    "github": github_components,
+}
+
+
+def risk_scores(raw: np.ndarray) -> np.ndarray:
+    """0-1 risk scores for rows of raw component values (one row per user or
+    per point in time, columns in COMPONENT_NAMES order). NaN marks a
+    component with no data; the score is the weighted mean of the rest."""
+    raw = np.atleast_2d(np.asarray(raw, dtype=np.float64))
+    present = ~np.isnan(raw)
+    normalized = np.minimum(np.nan_to_num(raw) / SATURATION, 1.0)
+    weights = WEIGHTS * present
+    totals = weights.sum(axis=-1)
+    scores = (normalized * weights).sum(axis=-1) / np.where(totals > 0, totals, 1)
+    return np.round(scores, 4)
+
+
+def score_components(components: dict) -> float:
+    """Risk score of one user's {component name: raw value}"""
+    raw = [components.get(name, np.nan) for name in COMPONENT_NAMES]
+    return float(risk_scores(raw)[0])
+
+
+def inputs_hash(components: dict) -> str:
+    rounded = {name: round(value, HASH_DECIMALS) for name, value in components.items()}
+    key = orjson.dumps([SCORING_VERSION, rounded], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(key).hexdigest()
+
+
+def _score_row(row) -> dict:
+    return {
+        "risk_score": row["risk_score"],
+        "components": orjson.loads(row["components"]) if row["components"] else {},
+        "generated_at": row["generated_at"],
+    }
+
+
+async def _latest_row(db: asyncpg.Connection, user_id: int):
+    return await db.fetchrow(
+        """
+        SELECT risk_score, components, inputs_hash, generated_at
+        FROM burnout_scores
+        WHERE user_id = $1
+        ORDER BY generated_at DESC
+        LIMIT 1
+        """,
+        user_id,
+    )
+
+
+async def latest_burnout_score(db: asyncpg.Connection, user_id: int) -> dict | None:
+    row = await _latest_row(db, user_id)
+    return _score_row(row) if row else None
+
+
+async def update_burnout_score(
+    db: asyncpg.Connection, user_id: int, source: str, stats: dict, days: int
+) -> dict:
+    """Fold one source's fresh analysis into the user's latest components and
+    record a new score, unless the inputs are the same as last time.
+
+    Sources are analysed separately, so the other sources' components are
+    carried over from the latest row."""
+    fresh = SOURCE_COMPONENTS[source](stats, max(days, 1))
+    latest = await _latest_row(db, user_id)
+    components = orjson.loads(latest["components"]) if latest and latest["components"] else {}
+    components.update(fresh)
+    digest = inputs_hash(components)
+    if latest and latest["inputs_hash"] == digest:
+        return _score_row(latest)
+
+    risk_score = score_components(components)
+    row = await db.fetchrow(
+        """
+        INSERT INTO burnout_scores (user_id, risk_score, components, inputs_hash)
+        VALUES ($1, $2, $3::jsonb, $4)
+        RETURNING risk_score, components, inputs_hash, generated_at
+        """,
+        user_id,
+        risk_score,
+        orjson.dumps(components).decode(),
+        digest,
+    )
+    logger.info("Burnout score for user %s is %.2f after %s analysis", user_id, risk_score, source)
+    return _score_row(row)
+
+
+def describe_burnout_score(score: dict | None) -> str:
+    """Prompt block giving the LLM the computed score and its main drivers"""
+    if not score:
+        return "Burnout risk score: not available yet"
+    raw = np.array([score["components"].get(name, np.nan) for name in COMPONENT_NAMES])
+    present = ~np.isnan(raw)
+    contribution = np.minimum(np.nan_to_num(raw) / SATURATION, 1.0) * WEIGHTS * present
+    drivers = [
+        f"{COMPONENT_NAMES[i]}={raw[i]:.2f}"
+        for i in np.argsort(-contribution, kind="stable")[:3]
+        if contribution[i] > 0
+    ]
+    return (
+        f"Burnout risk score (0-1, computed from the metrics): {score['risk_score']:.2f}"
+        + (f"; main drivers: {', '.join(drivers)}" if drivers else "")
+    )
@@ -3,10 +3,31 @@ from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
 from datetime import datetime, timedelta, timezone
 import os
+import asyncio
+import json
 import asyncpg
+import logging
+import numpy as np
 from ..security import decrypt_token
-from openai import OpenAI
-from anthropic import Anthropic
+from ..upstreams import GOOGLE_TOKEN_URI, execute, google_client_options
+from ..prompts import PromptBuilder, summarize_meetings
+from ..llm import complete
+from .burnout import describe_burnout_score, update_burnout_score
+from .trends import record_rollups, record_sketches
+from ..sketches import digests_by_day
+from .timebuckets import (
+    WEEKDAYS,
+    bucket_times,
+    count_by_day,
+    count_by_hour,
+    count_by_weekday,
+    fetch_work_schedule,
+    local_strings,
+    parse_timestamps,
+    work_schedule,
+)
+
+logger = logging.getLogger(__name__)
 
 # OAuth 2.0 scopes for Google Calendar
 SCOPES = [
@@ -59,175 +80,262 @@ async def get_calendar_service(user_id: int, db: asyncpg.Connection):
 
     refresh_token = decrypt_token(user["google_refresh_token"])
 
-    creds = Credentials.from_authorized_user_info(
-        {
-            "refresh_token": refresh_token,
-            "client_id": os.getenv("GOOGLE_CLIENT_ID"),
-            "client_secret": os.getenv("GOOGLE_CLIENT_SECRET"),
-            "token_uri": "https://oauth2.googleapis.com/token",
-        },
-        SCOPES,
+    # Built directly since from_authorized_user_info ignores a custom token_uri
+    creds = Credentials(
+        token=None,
+        refresh_token=refresh_token,
+        client_id=os.getenv("GOOGLE_CLIENT_ID"),
+        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+        token_uri=GOOGLE_TOKEN_URI,
+        scopes=SCOPES,
     )
 
-    return build("calendar", "v3", credentials=creds)
+    return build(
+        "calendar",
+        "v3",
+        credentials=creds,
+        client_options=google_client_options(),
+    )
 
 
-async def analyze_calendar_activity(
-    user_id: int, db: asyncpg.Connection, days: int = 7
-):
-    """Analyze user's calendar activity for the specified number of days"""
-    try:
-        service = await get_calendar_service(user_id, db)
-
-        # Get events from the last N days in UTC
-        now = datetime.now(timezone.utc)
-        start_time = (now - timedelta(days=days)).isoformat()
-        end_time = now.isoformat()
-
-        events_result = (
-            service.events()
-            .list(
-                calendarId="primary",
-                timeMin=start_time,
-                timeMax=end_time,
-                singleEvents=True,
-                orderBy="startTime",
+async def mirror_live(db: asyncpg.Connection, user_id: int) -> bool:
+    """Whether the user's watch channel is live and the mirror synced, so
+    every calendar change reaches the mirror (and bumps the version), and
+    the mirror reaches the present"""
+    live = await db.fetchval(
+        """
+        SELECT synced_at IS NOT NULL AND expires_at > $2 AND mirrored_until > $2
+        FROM calendar_channels WHERE user_id = $1
+        """,
+        user_id,
+        datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+    return bool(live)
+
+
+async def mirrored_events(
+    db: asyncpg.Connection, user_id: int, time_min: datetime, time_max: datetime
+) -> list | None:
+    """events.list items overlapping the window, by start, from the calendar
+    mirror kept by calendar_sync. None unless the mirror is live, so callers
+    list the calendar instead."""
+    if not await mirror_live(db, user_id):
+        return None
+    rows = await db.fetch(
+        """
+        SELECT event FROM calendar_events
+        WHERE user_id = $1 AND end_at > $2 AND start_at < $3
+        ORDER BY start_at
+        """,
+        user_id,
+        time_min.astimezone(timezone.utc).replace(tzinfo=None),
+        time_max.astimezone(timezone.utc).replace(tzinfo=None),
+    )
+    return [json.loads(row["event"]) for row in rows]
+
+
+async def _window_events(service, db: asyncpg.Connection, user_id: int, days: int) -> list:
+    """The last N days of events, from the mirror when it is live"""
+    now = datetime.now(timezone.utc)
+    events = await mirrored_events(db, user_id, now - timedelta(days=days), now)
+    if events is not None:
+        return events
+    events_result = await asyncio.to_thread(
+        execute,
+        service.events().list(
+            calendarId="primary",
+            timeMin=(now - timedelta(days=days)).isoformat(),
+            timeMax=now.isoformat(),
+            singleEvents=True,
+            orderBy="startTime",
+        ),
+    )
+    return events_result.get("items", [])
+
+
+def _timed_events(events: list) -> list:
+    """Events with a start and end time; all-day events only have dates"""
+    return [
+        event
+        for event in events
+        if "dateTime" in event.get("start", {}) and "dateTime" in event.get("end", {})
+    ]
+
+
+def _bucket_events(events: list, schedule: dict) -> tuple:
+    """(start timestamps, end timestamps, start buckets, end buckets) of timed events"""
+    starts = parse_timestamps([event["start"]["dateTime"] for event in events])
+    ends = parse_timestamps([event["end"]["dateTime"] for event in events])
+    return starts, ends, bucket_times(starts, schedule), bucket_times(ends, schedule)
+
+
+def _local_isoformat(timestamps, local) -> list:
+    """datetime.isoformat() of each timestamp in local time with its UTC offset"""
+    formatted = []
+    for stamp, offset in zip(
+        local_strings(local).tolist(), np.rint(local - timestamps).astype(int).tolist()
+    ):
+        sign = "-" if offset < 0 else "+"
+        hours, minutes = divmod(abs(offset) // 60, 60)
+        formatted.append(f"{stamp}{sign}{hours:02d}:{minutes:02d}")
+    return formatted
+
+
+def aggregate_calendar_events(
+    events: list, days: int, schedule: dict | None = None
+) -> dict:
+    """Aggregate listed events into the meeting statistics used for AI analysis.
+    Times are bucketed in the schedule's timezone and work hours."""
+    schedule = schedule or work_schedule()
+    timed = _timed_events(events)
+    starts, ends, start, end = _bucket_events(timed, schedule)
+    durations = (ends - starts) / 60  # in minutes
+
+    # Gaps between each meeting and the one before it
+    gaps = (starts[1:] - ends[:-1]) / 60
+    free = np.flatnonzero(gaps >= 15)  # Less than 15 minutes is back-to-back
+    free_starts = _local_isoformat(ends[free], end["local"][free])
+    free_ends = _local_isoformat(starts[free + 1], start["local"][free + 1])
+
+    start_times = local_strings(start["local"], "m").tolist()
+    end_times = local_strings(end["local"], "m").tolist()
+
+    # Analyze calendar data
+    calendar_stats = {
+        "total_meetings": len(events),
+        "total_duration_minutes": float(durations.sum()),
+        "meetings_after_hours": int(start["late"].sum()),  # Starting after work hours
+        "early_meetings": int(start["early"].sum()),  # Starting before work hours
+        "longest_meeting_duration": float(durations.max()) if len(timed) else 0,
+        "back_to_back_meetings": int((gaps < 15).sum()),
+        "meeting_free_blocks": [
+            {"start": block_start, "end": block_end, "duration_minutes": gap}
+            for block_start, block_end, gap in zip(
+                free_starts, free_ends, gaps[free].tolist()
             )
-            .execute()
+        ],
+        # Store meeting details for AI analysis
+        "meeting_details": [
+            {
+                "title": event.get("summary", "Untitled"),
+                "start_time": start_time[11:16],
+                "end_time": end_time[11:16],
+                "day": WEEKDAYS[weekday],
+                "duration_minutes": duration,
+                "attendees": len(event.get("attendees", [])),
+                "description": event.get("description", ""),
+                "is_recurring": bool(event.get("recurringEventId")),
+            }
+            for event, start_time, end_time, weekday, duration in zip(
+                timed, start_times, end_times, start["weekday"].tolist(), durations.tolist()
+            )
+        ],
+        "daily_meeting_counts": count_by_day(start["day"]),  # Meetings per day
+        # Distinct recurring series
+        "recurring_meetings": len(
+            {event["recurringEventId"] for event in timed if event.get("recurringEventId")}
+        ),
+        "weekly_patterns": count_by_weekday(start["weekday"]),
+    }
+
+    # Calculate averages and additional metrics
+    if calendar_stats["total_meetings"] > 0:
+        calendar_stats["average_meeting_duration"] = (
+            calendar_stats["total_duration_minutes"]
+            / calendar_stats["total_meetings"]
         )
+        calendar_stats["meetings_per_day"] = calendar_stats["total_meetings"] / days
+
+    return calendar_stats
+
+
+def calendar_daily_sketches(events: list, schedule: dict | None = None) -> dict:
+    """{metric: {'YYYY-MM-DD': TDigest}}: meeting minutes by local start day"""
+    schedule = schedule or work_schedule()
+    starts, ends, start, _ = _bucket_events(_timed_events(events), schedule)
+    return {"calendar.meeting_minutes": digests_by_day(start["day"], (ends - starts) / 60)}
+
+
+def calendar_activity_stats(events: list, days: int, schedule: dict | None = None) -> dict:
+    """Aggregate listed events into the /calendar/activity statistics.
+    Times are bucketed in the schedule's timezone and work hours."""
+    schedule = schedule or work_schedule()
+    timed = _timed_events(events)
+    starts, ends, start, _ = _bucket_events(timed, schedule)
+    durations = (ends - starts) / 60  # in minutes
+    gaps = (starts[1:] - ends[:-1]) / 60
+
+    # Initialize analytics data
+    calendar_stats = {
+        "total_meetings": len(events),
+        "total_duration_minutes": float(durations.sum()),
+        "meetings_after_hours": int(start["late"].sum()),  # Starting after work hours
+        "early_meetings": int(start["early"].sum()),  # Starting before work hours
+        "back_to_back_meetings": int((gaps < 15).sum()),  # Under 15 minutes apart
+        "recurring_meetings": len(
+            {event["recurringEventId"] for event in timed if event.get("recurringEventId")}
+        ),
+        "daily_meeting_counts": count_by_day(start["day"]),  # Meetings per day
+        "weekly_patterns": count_by_weekday(start["weekday"]),
+        "hourly_distribution": count_by_hour(start["hour"]),
+        "meeting_durations": durations.tolist(),  # List of all meeting durations
+        "meeting_types": {  # Categorize meetings
+            "one_on_one": 0,
+            "team_meetings": 0,
+            "external_meetings": 0,
+        },
+    }
 
-        events = events_result.get("items", [])
-
-        # Set timezone to IST
-        ist = timezone(timedelta(hours=5, minutes=30))
-
-        # Analyze calendar data
-        calendar_stats = {
-            "total_meetings": len(events),
-            "total_duration_minutes": 0,
-            "meetings_after_hours": 0,  # Meetings after 5 PM
-            "early_meetings": 0,  # Meetings before 9 AM
-            "longest_meeting_duration": 0,
-            "back_to_back_meetings": 0,
-            "meeting_free_blocks": [],
-            "meeting_details": [],  # Store meeting details for AI analysis
-            "daily_meeting_counts": {},  # Track meetings per day
-            "recurring_meetings": 0,  # Track recurring meetings
-            "weekly_patterns": {  # Track meeting patterns by day of week
-                "Monday": 0,
-                "Tuesday": 0,
-                "Wednesday": 0,
-                "Thursday": 0,
-                "Friday": 0,
-                "Saturday": 0,
-                "Sunday": 0,
-            },
-        }
+    for event in timed:
+        # Categorize meeting type
+        attendees = event.get("attendees", [])
+        num_attendees = len(attendees)
 
-        previous_end_time = None
-        seen_recurring_meetings = set()  # Track recurring meeting IDs
-
-        for event in events:
-            # Skip events without timing information
-            if "dateTime" not in event.get("start", {}) or "dateTime" not in event.get(
-                "end", {}
-            ):
-                continue
-
-            # Convert to UTC first, then to IST
-            start_utc = datetime.fromisoformat(
-                event["start"]["dateTime"].replace("Z", "+00:00")
-            ).replace(tzinfo=timezone.utc)
-            end_utc = datetime.fromisoformat(
-                event["end"]["dateTime"].replace("Z", "+00:00")
-            ).replace(tzinfo=timezone.utc)
-
-            start = start_utc.astimezone(ist)
-            end = end_utc.astimezone(ist)
-
-            # Track daily counts
-            day_key = start.strftime("%Y-%m-%d")
-            calendar_stats["daily_meeting_counts"][day_key] = (
-                calendar_stats["daily_meeting_counts"].get(day_key, 0) + 1
+        if num_attendees == 1:
+            calendar_stats["meeting_types"]["one_on_one"] += 1
+        elif all(
+            a.get("email", "").endswith(
+                event.get("organizer", {}).get("email", "").split("@")[1]
             )
+            for a in attendees
+        ):
+            calendar_stats["meeting_types"]["team_meetings"] += 1
+        else:
+            calendar_stats["meeting_types"]["external_meetings"] += 1
+
+    # Calculate averages and additional metrics
+    if calendar_stats["total_meetings"] > 0:
+        calendar_stats["average_meeting_duration"] = (
+            calendar_stats["total_duration_minutes"]
+            / calendar_stats["total_meetings"]
+        )
+        calendar_stats["meetings_per_day"] = calendar_stats["total_meetings"] / days
 
-            # Track weekly patterns
-            day_name = start.strftime("%A")
-            calendar_stats["weekly_patterns"][day_name] += 1
-
-            # Track recurring meetings
-            if event.get("recurringEventId"):
-                recurring_id = event["recurringEventId"]
-                if recurring_id not in seen_recurring_meetings:
-                    seen_recurring_meetings.add(recurring_id)
-                    calendar_stats["recurring_meetings"] += 1
-
-            # Store meeting details for AI analysis
-            calendar_stats["meeting_details"].append(
-                {
-                    "title": event.get("summary", "Untitled"),
-                    "start_time": start.strftime("%H:%M"),
-                    "end_time": end.strftime("%H:%M"),
-                    "day": day_name,
-                    "duration_minutes": (end - start).total_seconds() / 60,
-                    "attendees": len(event.get("attendees", [])),
-                    "description": event.get("description", ""),
-                    "is_recurring": bool(event.get("recurringEventId")),
-                }
-            )
+        # Calculate median meeting duration
+        if len(durations):
+            calendar_stats["median_meeting_duration"] = float(np.median(durations))
 
-            # Calculate duration
-            duration = (end - start).total_seconds() / 60  # in minutes
-            calendar_stats["total_duration_minutes"] += duration
+    return calendar_stats
 
-            # Track longest meeting
-            calendar_stats["longest_meeting_duration"] = max(
-                calendar_stats["longest_meeting_duration"], duration
-            )
 
-            # Check if meeting is after hours (after 5 PM IST)
-            if start.hour >= 17:
-                calendar_stats["meetings_after_hours"] += 1
-
-            # Check if meeting is early (before 9 AM IST)
-            if start.hour < 9:
-                calendar_stats["early_meetings"] += 1
-
-            # Check for back-to-back meetings
-            if previous_end_time:
-                gap = (start - previous_end_time).total_seconds() / 60
-                if gap < 15:  # Less than 15 minutes between meetings
-                    calendar_stats["back_to_back_meetings"] += 1
-                else:
-                    calendar_stats["meeting_free_blocks"].append(
-                        {
-                            "start": previous_end_time.isoformat(),
-                            "end": start.isoformat(),
-                            "duration_minutes": gap,
-                        }
-                    )
+async def analyze_calendar_activity(
+    user_id: int, db: asyncpg.Connection, days: int = 7
+):
+    """Analyze user's calendar activity for the specified number of days"""
+    try:
+        service = await get_calendar_service(user_id, db)
 
-            previous_end_time = end
+        # Events from the last N days
+        events = await _window_events(service, db, user_id, days)
 
-        # Calculate averages and additional metrics
-        if calendar_stats["total_meetings"] > 0:
-            calendar_stats["average_meeting_duration"] = (
-                calendar_stats["total_duration_minutes"]
-                / calendar_stats["total_meetings"]
-            )
-            calendar_stats["meetings_per_day"] = calendar_stats["total_meetings"] / days
-
-        # Use Anthropic for calendar pattern analysis
-        anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        calendar_analysis = anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=300,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""
-                    Analyze these calendar patterns for the past {days} days for potential burnout risk:
-                    
+        schedule = await fetch_work_schedule(db, user_id)
+        calendar_stats = aggregate_calendar_events(events, days, schedule)
+        burnout = await update_burnout_score(db, user_id, "calendar", calendar_stats, days)
+        await record_rollups(db, user_id, "calendar", calendar_stats, days, schedule)
+        await record_sketches(db, user_id, calendar_daily_sketches(events, schedule), days, schedule)
+
+        # Shared statistics block for both prompts
+        stats_block = f"""
                     Meeting Statistics:
                     - Total meetings: {calendar_stats['total_meetings']}
                     - Total duration: {calendar_stats['total_duration_minutes']} minutes
@@ -241,19 +349,32 @@ async def analyze_calendar_activity(
                     
                     Weekly Pattern:
                     {chr(10).join([f"- {day}: {count} meetings" for day, count in calendar_stats['weekly_patterns'].items()])}
-                    
+                    """
+        daily_counts_block = f"""
                     Daily Meeting Counts:
                     {chr(10).join([f"- {date}: {count} meetings" for date, count in calendar_stats['daily_meeting_counts'].items()])}
-                    
+                    """
+        meetings_block = f"""
                     Meeting Details:
-                    {chr(10).join([
-                        f"- {meeting['title']}: {meeting['day']} {meeting['start_time']}-{meeting['end_time']} ({meeting['duration_minutes']} min, {meeting['attendees']} attendees){' (Recurring)' if meeting['is_recurring'] else ''}"
-                        for meeting in calendar_stats['meeting_details']
-                    ])}
-
+{summarize_meetings(calendar_stats['meeting_details'])}
+                    """
+
+        # Burnout-oriented analysis of the meeting load
+        burnout_prompt = (
+            PromptBuilder("calendar-burnout")
+            .add(
+                f"""
+                    Analyze these calendar patterns for the past {days} days for potential burnout risk:
+                    {stats_block}
+                    {describe_burnout_score(burnout)}
+                    Explain this score; do not estimate a score of your own."""
+            )
+            .add(daily_counts_block, shrinkable=True)
+            .add(meetings_block, shrinkable=True)
+            .add(
+                """
                     Return a JSON response analyzing burnout risk and meeting load:
-                    {{
-                        "risk_score": 0.7,
+                    {
                         "key_insights": [
                             "First insight about weekly meeting patterns",
                             "Second insight about meeting distribution",
@@ -268,80 +389,66 @@ async def analyze_calendar_activity(
                             "First specific recommendation",
                             "Second actionable suggestion"
                         ]
-                    }}
-                    """,
-                }
-            ],
+                    }
+                    """
+            )
+            .build()
         )
+        # Schedule optimization prompt, run concurrently with the burnout one
 
-        # Use OpenAI for detailed schedule optimization analysis
-        openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        schedule_analysis = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""
+        schedule_prompt = (
+            PromptBuilder("schedule-optimization")
+            .add(
+                f"""
                     Analyze these calendar patterns for schedule optimization and productivity insights:
-                    
-                    Meeting Statistics:
-                    - Total meetings: {calendar_stats['total_meetings']}
-                    - Total duration: {calendar_stats['total_duration_minutes']} minutes
-                    - Average meetings per day: {calendar_stats.get('meetings_per_day', 0):.1f}
-                    - After-hours meetings: {calendar_stats['meetings_after_hours']}
-                    - Early morning meetings: {calendar_stats['early_meetings']}
-                    - Back-to-back meetings: {calendar_stats['back_to_back_meetings']}
-                    - Average duration: {calendar_stats.get('average_meeting_duration', 0):.1f} minutes
-                    - Recurring meetings: {calendar_stats['recurring_meetings']}
-                    
-                    Weekly Pattern:
-                    {chr(10).join([f"- {day}: {count} meetings" for day, count in calendar_stats['weekly_patterns'].items()])}
-                    
-                    Meeting Details:
-                    {chr(10).join([
-                        f"- {meeting['title']}: {meeting['day']} {meeting['start_time']}-{meeting['end_time']} ({meeting['duration_minutes']} min, {meeting['attendees']} attendees){' (Recurring)' if meeting['is_recurring'] else ''}"
-                        for meeting in calendar_stats['meeting_details']
-                    ])}
-
+                    {stats_block}"""
+            )
+            .add(meetings_block, shrinkable=True)
+            .add(
+                """
                     Return a JSON response focusing on schedule optimization:
-                    {{
+                    {
                         "productivity_score": 0.8,
                         "schedule_insights": [
                             "First insight about meeting efficiency",
                             "Second insight about focus time blocks",
                             "Third insight about meeting distribution"
                         ],
-                        "focus_time_analysis": {{
+                        "focus_time_analysis": {
                             "available_focus_blocks": "Analysis of available focus time",
                             "best_focus_hours": ["Time slots best for focused work"],
                             "meeting_free_days": ["Days with fewer meetings"]
-                        }},
+                        },
                         "optimization_suggestions": [
                             "First suggestion for schedule optimization",
                             "Second suggestion for better time management",
                             "Third suggestion for meeting efficiency"
                         ],
-                        "meeting_patterns": {{
+                        "meeting_patterns": {
                             "peak_meeting_times": "Analysis of when most meetings occur",
                             "ideal_meeting_blocks": "Suggested time blocks for meetings",
                             "protected_time_blocks": "Recommended times to protect for focus work"
-                        }}
-                    }}
-                    """,
-                }
-            ],
+                        }
+                    }
+                    """
+            )
+            .build()
+        )
+        calendar_analysis, schedule_analysis = await asyncio.gather(
+            complete("calendar-burnout", burnout_prompt, max_tokens=300),
+            complete("schedule-optimization", schedule_prompt, max_tokens=1024),
         )
 
         # Combine both analyses
         calendar_stats["ai_analysis"] = {
-            "burnout_risk": calendar_analysis.content,
-            "schedule_optimization": schedule_analysis.choices[0].message.content,
+            "burnout_risk": calendar_analysis.text,
+            "schedule_optimization": schedule_analysis.text,
         }
 
         return calendar_stats
 
     except Exception as e:
-        print(f"Error analyzing calendar activity: {str(e)}")
+        logger.error("Error analyzing calendar activity: %s", e)
         raise e
 
 
@@ -352,158 +459,12 @@ async def get_calendar_activity_stats(
     try:
         service = await get_calendar_service(user_id, db)
 
-        # Get events from the last N days in UTC
-        now = datetime.now(timezone.utc)
-        start_time = (now - timedelta(days=days)).isoformat()
-        end_time = now.isoformat()
-
-        events_result = (
-            service.events()
-            .list(
-                calendarId="primary",
-                timeMin=start_time,
-                timeMax=end_time,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-
-        events = events_result.get("items", [])
-
-        # Set timezone to IST
-        ist = timezone(timedelta(hours=5, minutes=30))
-
-        # Initialize analytics data
-        calendar_stats = {
-            "total_meetings": len(events),
-            "total_duration_minutes": 0,
-            "meetings_after_hours": 0,  # Meetings after 5 PM
-            "early_meetings": 0,  # Meetings before 9 AM
-            "back_to_back_meetings": 0,
-            "recurring_meetings": 0,
-            "daily_meeting_counts": {},  # Track meetings per day
-            "weekly_patterns": {  # Track meeting patterns by day of week
-                "Monday": 0,
-                "Tuesday": 0,
-                "Wednesday": 0,
-                "Thursday": 0,
-                "Friday": 0,
-                "Saturday": 0,
-                "Sunday": 0,
-            },
-            "hourly_distribution": {str(hour).zfill(2): 0 for hour in range(24)},
-            "meeting_durations": [],  # List of all meeting durations
-            "meeting_types": {  # Categorize meetings
-                "one_on_one": 0,
-                "team_meetings": 0,
-                "external_meetings": 0,
-            },
-        }
-
-        previous_end_time = None
-        seen_recurring_meetings = set()
-
-        for event in events:
-            # Skip events without timing information
-            if "dateTime" not in event.get("start", {}) or "dateTime" not in event.get(
-                "end", {}
-            ):
-                continue
-
-            # Convert to UTC first, then to IST
-            start_utc = datetime.fromisoformat(
-                event["start"]["dateTime"].replace("Z", "+00:00")
-            ).replace(tzinfo=timezone.utc)
-            end_utc = datetime.fromisoformat(
-                event["end"]["dateTime"].replace("Z", "+00:00")
-            ).replace(tzinfo=timezone.utc)
-
-            start = start_utc.astimezone(ist)
-            end = end_utc.astimezone(ist)
-
-            # Track daily counts
-            day_key = start.strftime("%Y-%m-%d")
-            calendar_stats["daily_meeting_counts"][day_key] = (
-                calendar_stats["daily_meeting_counts"].get(day_key, 0) + 1
-            )
-
-            # Track weekly patterns
-            day_name = start.strftime("%A")
-            calendar_stats["weekly_patterns"][day_name] += 1
-
-            # Track hourly distribution
-            hour = start.strftime("%H")
-            calendar_stats["hourly_distribution"][hour] += 1
-
-            # Track recurring meetings
-            if event.get("recurringEventId"):
-                recurring_id = event["recurringEventId"]
-                if recurring_id not in seen_recurring_meetings:
-                    seen_recurring_meetings.add(recurring_id)
-                    calendar_stats["recurring_meetings"] += 1
-
-            # Calculate duration
-            duration = (end - start).total_seconds() / 60  # in minutes
-            calendar_stats["total_duration_minutes"] += duration
-            calendar_stats["meeting_durations"].append(duration)
-
-            # Check if meeting is after hours (after 5 PM IST)
-            if start.hour >= 17:
-                calendar_stats["meetings_after_hours"] += 1
-
-            # Check if meeting is early (before 9 AM IST)
-            if start.hour < 9:
-                calendar_stats["early_meetings"] += 1
-
-            # Check for back-to-back meetings
-            if previous_end_time:
-                gap = (start - previous_end_time).total_seconds() / 60
-                if gap < 15:  # Less than 15 minutes between meetings
-                    calendar_stats["back_to_back_meetings"] += 1
-
-            previous_end_time = end
-
-            # Categorize meeting type
-            attendees = event.get("attendees", [])
-            num_attendees = len(attendees)
-
-            if num_attendees == 1:
-                calendar_stats["meeting_types"]["one_on_one"] += 1
-            elif all(
-                a.get("email", "").endswith(
-                    event.get("organizer", {}).get("email", "").split("@")[1]
-                )
-                for a in attendees
-            ):
-                calendar_stats["meeting_types"]["team_meetings"] += 1
-            else:
-                calendar_stats["meeting_types"]["external_meetings"] += 1
-
-        # Calculate averages and additional metrics
-        if calendar_stats["total_meetings"] > 0:
-            calendar_stats["average_meeting_duration"] = (
-                calendar_stats["total_duration_minutes"]
-                / calendar_stats["total_meetings"]
-            )
-            calendar_stats["meetings_per_day"] = calendar_stats["total_meetings"] / days
-
-            # Calculate median meeting duration
-            sorted_durations = sorted(calendar_stats["meeting_durations"])
-            mid = len(sorted_durations) // 2
-            calendar_stats["median_meeting_duration"] = (
-                sorted_durations[mid]
-                if len(sorted_durations) % 2
-                else (sorted_durations[mid - 1] + sorted_durations[mid]) / 2
-            )
+        # Events from the last N days
+        events = await _window_events(service, db, user_id, days)
 
-        # Sort daily meeting counts
-        calendar_stats["daily_meeting_counts"] = dict(
-            sorted(calendar_stats["daily_meeting_counts"].items())
-        )
-
-        return calendar_stats
+        schedule = await fetch_work_schedule(db, user_id)
+        return calendar_activity_stats(events, days, schedule)
 
     except Exception as e:
-        print(f"Error fetching calendar activity: {str(e)}")
+        logger.error("Error fetching calendar activity: %s", e)
         raise e
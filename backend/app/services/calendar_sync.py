@@ -0,0 +1,384 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+import asyncpg
+from googleapiclient.errors import HttpError
+from ..database import connection
+from ..etags import bump_activity_version
+from ..tracing import create_task
+from ..upstreams import execute
+from .calendar import get_calendar_service
+
+logger = logging.getLogger(__name__)
+
+# Public address of /google/calendar/notifications; watch channels are only
+# registered when it is set (Google requires HTTPS on a verified domain)
+CALENDAR_WEBHOOK_URL = os.getenv("CALENDAR_WEBHOOK_URL")
+# Requested channel lifetime; Google may grant less. Channels expiring within
+# CALENDAR_CHANNEL_RENEW_BEFORE are replaced every CALENDAR_RENEW_INTERVAL.
+CALENDAR_CHANNEL_TTL = int(os.getenv("CALENDAR_CHANNEL_TTL", 7 * 86400))
+CALENDAR_CHANNEL_RENEW_BEFORE = int(os.getenv("CALENDAR_CHANNEL_RENEW_BEFORE", 86400))
+CALENDAR_RENEW_INTERVAL = int(os.getenv("CALENDAR_RENEW_INTERVAL", 3600))
+
+# The mirror holds events back to this many days, the longest analysis window
+MIRROR_DAYS = 90
+# Full syncs list events up to this many days ahead: recurring events are
+# expanded, so an open-ended series needs an end. The mirror is not read past
+# it, and is fully resynced once less than half of it is left.
+CALENDAR_SYNC_HORIZON_DAYS = int(os.getenv("CALENDAR_SYNC_HORIZON_DAYS", 14))
+PAGE_SIZE = 2500
+
+# Any constants all workers agree on: one renewal pass at a time, and one
+# sync per user (the second key being the user id)
+RENEW_LOCK_KEY = 4_310_002
+SYNC_LOCK_KEY = 4_310_003
+
+# Users with a sync running in this worker, and those notified again meanwhile
+_syncing = set()
+_dirty = set()
+
+
+def _utc(value: str) -> datetime:
+    """Naive UTC datetime of an RFC 3339 dateTime or an all-day date"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _event_bounds(event: dict) -> tuple[datetime, datetime]:
+    start, end = event.get("start", {}), event.get("end", {})
+    start_at = _utc(start.get("dateTime") or start["date"])
+    end_value = end.get("dateTime") or end.get("date")
+    return start_at, _utc(end_value) if end_value else start_at
+
+
+def _list_pages(service, **params) -> list:
+    """Every page of a single-events listing of the primary calendar.
+    Blocking: run it in a thread."""
+    pages, page_token = [], None
+    while True:
+        result = execute(
+            service.events().list(
+                calendarId="primary",
+                singleEvents=True,
+                maxResults=PAGE_SIZE,
+                pageToken=page_token,
+                **params,
+            )
+        )
+        pages.append(result)
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return pages
+
+
+async def _apply_page(db: asyncpg.Connection, user_id: int, items: list, until: datetime) -> int:
+    """Upsert the page's events starting before until, and drop its cancelled
+    ones"""
+    cancelled = [event["id"] for event in items if event.get("status") == "cancelled"]
+    stored = [
+        event
+        for event in items
+        if event.get("status") != "cancelled" and _event_bounds(event)[0] < until
+    ]
+    if cancelled:
+        await db.execute(
+            "DELETE FROM calendar_events WHERE user_id = $1 AND event_id = ANY($2::text[])",
+            user_id,
+            cancelled,
+        )
+    if stored:
+        bounds = [_event_bounds(event) for event in stored]
+        await db.execute(
+            """
+            INSERT INTO calendar_events (user_id, event_id, start_at, end_at, event)
+            SELECT $1, event_id, start_at, end_at, event
+            FROM unnest($2::text[], $3::timestamp[], $4::timestamp[], $5::jsonb[])
+                AS e(event_id, start_at, end_at, event)
+            ON CONFLICT (user_id, event_id) DO UPDATE
+            SET start_at = EXCLUDED.start_at, end_at = EXCLUDED.end_at, event = EXCLUDED.event
+            """,
+            user_id,
+            [event["id"] for event in stored],
+            [start for start, _ in bounds],
+            [end for _, end in bounds],
+            [json.dumps(event) for event in stored],
+        )
+    return len(items)
+
+
+async def _full_sync(service, db: asyncpg.Connection, user_id: int) -> tuple[int, str, datetime]:
+    """Replace the mirror with the calendar from MIRROR_DAYS ago up to
+    CALENDAR_SYNC_HORIZON_DAYS ahead, the end of which is returned"""
+    now = datetime.now(timezone.utc)
+    time_min = now - timedelta(days=MIRROR_DAYS)
+    time_max = now + timedelta(days=CALENDAR_SYNC_HORIZON_DAYS)
+    until = time_max.replace(tzinfo=None)
+    # Fetched before the transaction, so no connection waits on Google
+    pages = await asyncio.to_thread(
+        _list_pages, service, timeMin=time_min.isoformat(), timeMax=time_max.isoformat()
+    )
+    changed, sync_token = 0, None
+    async with db.transaction():
+        await db.execute("DELETE FROM calendar_events WHERE user_id = $1", user_id)
+        for page in pages:
+            changed += await _apply_page(db, user_id, page.get("items", []), until)
+            sync_token = page.get("nextSyncToken", sync_token)
+    return changed, sync_token, until
+
+
+async def _delta_sync(
+    service, db: asyncpg.Connection, user_id: int, sync_token: str, until: datetime
+) -> tuple[int, str]:
+    """Apply what changed since sync_token; cancelled events come as such.
+    Deltas are not bounded in time, so instances past until are dropped."""
+    pages = await asyncio.to_thread(_list_pages, service, syncToken=sync_token)
+    changed = 0
+    async with db.transaction():
+        for page in pages:
+            changed += await _apply_page(db, user_id, page.get("items", []), until)
+            sync_token = page.get("nextSyncToken", sync_token)
+        await db.execute(
+            "DELETE FROM calendar_events WHERE user_id = $1 AND end_at < $2",
+            user_id,
+            datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=MIRROR_DAYS),
+        )
+    return changed, sync_token
+
+
+async def sync_calendar(db: asyncpg.Connection, user_id: int) -> int:
+    """Bring the user's calendar mirror up to date: a syncToken delta when
+    there is one and the mirror reaches far enough ahead, else (or when
+    Google expired the token) a full listing. Returns the number of events
+    changed."""
+    await db.execute("SELECT pg_advisory_lock($1, $2)", SYNC_LOCK_KEY, user_id)
+    try:
+        row = await db.fetchrow(
+            "SELECT sync_token, mirrored_until FROM calendar_channels WHERE user_id = $1",
+            user_id,
+        )
+        sync_token, until = (row["sync_token"], row["mirrored_until"]) if row else (None, None)
+        service = await get_calendar_service(user_id, db)
+        changed = None
+        if sync_token and until and until > _resync_after():
+            try:
+                changed, sync_token = await _delta_sync(service, db, user_id, sync_token, until)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                logger.info("Calendar sync token of user %s expired, resyncing", user_id)
+        if changed is None:
+            changed, sync_token, until = await _full_sync(service, db, user_id)
+
+        await db.execute(
+            """
+            UPDATE calendar_channels SET sync_token = $2, mirrored_until = $3, synced_at = NOW()
+            WHERE user_id = $1
+            """,
+            user_id,
+            sync_token,
+            until,
+        )
+        if changed:
+            await bump_activity_version(db, user_id, "calendar")
+        return changed
+    finally:
+        await db.execute("SELECT pg_advisory_unlock($1, $2)", SYNC_LOCK_KEY, user_id)
+
+
+def _resync_after() -> datetime:
+    """Mirrors reaching no further than this are fully resynced"""
+    return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(
+        days=CALENDAR_SYNC_HORIZON_DAYS / 2
+    )
+
+
+def _stop_channel(service, channel_id: str, resource_id: str | None):
+    try:
+        execute(service.channels().stop(body={"id": channel_id, "resourceId": resource_id}))
+    except Exception as e:
+        logger.warning("Error stopping calendar channel %s: %s", channel_id, e)
+
+
+async def watch_calendar(db: asyncpg.Connection, user_id: int):
+    """Register a new events.watch channel for the user's primary calendar,
+    replacing (and stopping) any previous one, and bring the mirror up to
+    date"""
+    service = await get_calendar_service(user_id, db)
+    channel_id, token = str(uuid.uuid4()), secrets.token_urlsafe(32)
+    channel = await asyncio.to_thread(
+        execute,
+        service.events().watch(
+            calendarId="primary",
+            body={
+                "id": channel_id,
+                "type": "web_hook",
+                "address": CALENDAR_WEBHOOK_URL,
+                "token": token,
+                "params": {"ttl": str(CALENDAR_CHANNEL_TTL)},
+            },
+        ),
+    )
+    expires_at = datetime.fromtimestamp(int(channel["expiration"]) / 1000, timezone.utc)
+
+    previous = await db.fetchrow(
+        "SELECT channel_id, resource_id, sync_token FROM calendar_channels WHERE user_id = $1",
+        user_id,
+    )
+    await db.execute(
+        """
+        INSERT INTO calendar_channels (user_id, channel_id, resource_id, token, expires_at)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (user_id) DO UPDATE
+        SET channel_id = EXCLUDED.channel_id, resource_id = EXCLUDED.resource_id,
+            token = EXCLUDED.token, expires_at = EXCLUDED.expires_at, created_at = NOW(),
+            -- A mirror that went unwatched is not read until the sync below
+            synced_at = CASE WHEN calendar_channels.expires_at > $6
+                THEN calendar_channels.synced_at END
+        """,
+        user_id,
+        channel_id,
+        channel.get("resourceId"),
+        token,
+        expires_at.replace(tzinfo=None),
+        datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+    logger.info("Watching calendar of user %s until %s", user_id, expires_at)
+
+    if previous:
+        await asyncio.to_thread(
+            _stop_channel, service, previous["channel_id"], previous["resource_id"]
+        )
+    # Changes made while no channel was live (after an expiry or a failed
+    # renewal) were never notified: catch up, a delta when there is a token
+    await sync_calendar(db, user_id)
+
+
+async def unwatch_calendar(db: asyncpg.Connection, user_id: int):
+    """Stop the user's channel and drop the mirror, e.g. on disconnect"""
+    channel = await db.fetchrow(
+        "SELECT channel_id, resource_id FROM calendar_channels WHERE user_id = $1", user_id
+    )
+    if channel is None:
+        return
+    try:
+        service = await get_calendar_service(user_id, db)
+        await asyncio.to_thread(
+            _stop_channel, service, channel["channel_id"], channel["resource_id"]
+        )
+    except Exception as e:
+        logger.warning("Error stopping calendar channel of user %s: %s", user_id, e)
+    await db.execute("DELETE FROM calendar_channels WHERE user_id = $1", user_id)
+    await db.execute("DELETE FROM calendar_events WHERE user_id = $1", user_id)
+
+
+async def _watch_in_background(user_id: int):
+    try:
+        async with connection() as db:
+            await watch_calendar(db, user_id)
+    except Exception as e:
+        logger.warning("Error watching calendar of user %s: %s", user_id, e)
+
+
+def request_watch(user_id: int):
+    """Start watching a newly connected calendar, if notifications are set up"""
+    if CALENDAR_WEBHOOK_URL:
+        create_task(_watch_in_background(user_id), "calendar.watch")
+
+
+async def _sync_until_clean(user_id: int):
+    try:
+        while True:
+            _dirty.discard(user_id)
+            try:
+                async with connection() as db:
+                    await sync_calendar(db, user_id)
+            except Exception as e:
+                logger.warning("Error syncing calendar of user %s: %s", user_id, e)
+            if user_id not in _dirty:
+                return
+    finally:
+        _syncing.discard(user_id)
+
+
+def request_sync(user_id: int):
+    """Sync the user's mirror in the background. Notifications arriving while
+    a sync runs are coalesced into one more sync after it."""
+    if user_id in _syncing:
+        _dirty.add(user_id)
+        return
+    _syncing.add(user_id)
+    create_task(_sync_until_clean(user_id), "calendar.sync")
+
+
+async def handle_notification(
+    db: asyncpg.Connection,
+    channel_id: str | None,
+    token: str | None,
+    resource_state: str | None,
+) -> str:
+    """Act on one push notification: 'sync' is the handshake sent when a
+    channel is created, anything else means the calendar changed. Returns
+    'invalid' when the channel token does not match."""
+    channel = await db.fetchrow(
+        "SELECT user_id, token FROM calendar_channels WHERE channel_id = $1", channel_id
+    )
+    if channel is None:
+        # A replaced channel still notifying until it is stopped
+        return "ignored"
+    if not token or not hmac.compare_digest(channel["token"], token):
+        return "invalid"
+    if resource_state == "sync":
+        return "sync"
+    request_sync(channel["user_id"])
+    return "changed"
+
+
+async def renew_channels():
+    """Watch calendars whose channel is missing or about to expire"""
+    try:
+        async with connection() as db:
+            if not await db.fetchval("SELECT pg_try_advisory_lock($1)", RENEW_LOCK_KEY):
+                return
+            try:
+                rows = await db.fetch(
+                    """
+                    SELECT u.id
+                    FROM users u
+                    LEFT JOIN calendar_channels c ON c.user_id = u.id
+                    WHERE u.google_refresh_token IS NOT NULL AND u.disabled IS NOT TRUE
+                        AND (c.user_id IS NULL OR c.expires_at < $1)
+                    """,
+                    datetime.now(timezone.utc).replace(tzinfo=None)
+                    + timedelta(seconds=CALENDAR_CHANNEL_RENEW_BEFORE),
+                )
+                for row in rows:
+                    try:
+                        await watch_calendar(db, row["id"])
+                    except Exception as e:
+                        logger.warning("Error renewing calendar channel of user %s: %s", row["id"], e)
+                # Live channels whose mirror is running out of horizon, which
+                # no notification may come to extend
+                rows = await db.fetch(
+                    "SELECT user_id FROM calendar_channels WHERE mirrored_until < $1",
+                    _resync_after(),
+                )
+                for row in rows:
+                    request_sync(row["user_id"])
+            finally:
+                await db.execute("SELECT pg_advisory_unlock($1)", RENEW_LOCK_KEY)
+    except Exception as e:
+        logger.warning("Error renewing calendar channels: %s", e)
+
+
+async def run_channel_renewal():
+    """Renew calendar channels every CALENDAR_RENEW_INTERVAL seconds"""
+    while True:
+        await renew_channels()
+        await asyncio.sleep(CALENDAR_RENEW_INTERVAL)
@@ -0,0 +1,76 @@
+import os
+from cachetools import TTLCache
+from slack_sdk import WebClient
+from ..metrics import record_cache
+
+# Public channel histories are the same for every member of a workspace, so
+# they are fetched once per workspace and filtered per user. A user only
+# ever reads channels from their own users.conversations listing, which
+# keeps membership intact. DMs and private channels are never shared.
+SLACK_HISTORY_CACHE_TTL = int(os.getenv("SLACK_HISTORY_CACHE_TTL", 300))
+SLACK_HISTORY_CACHE_SIZE = int(os.getenv("SLACK_HISTORY_CACHE_SIZE", 2000))
+
+# Newest messages per conversations.history call, as before
+HISTORY_LIMIT = 1000
+
+# (slack_team_id, channel id) -> {"oldest", "messages", "replies"}
+_histories = TTLCache(maxsize=SLACK_HISTORY_CACHE_SIZE, ttl=SLACK_HISTORY_CACHE_TTL)
+
+
+def shareable(conv: dict) -> bool:
+    return bool(
+        conv.get("is_channel")
+        and not conv.get("is_private")
+        and not conv.get("is_im")
+        and not conv.get("is_mpim")
+    )
+
+
+def fetch_history(
+    client: WebClient,
+    team_id: str | None,
+    conv: dict,
+    oldest: float,
+    latest: float | None = None,
+    with_replies: bool = False,
+) -> tuple[list, dict]:
+    """(messages, {thread_ts: replies}) of a conversation after oldest and up
+    to latest, as conversations.history and conversations.replies return
+    them. Public channels come from the workspace cache when it covers
+    oldest; threads are fetched once each and kept with the history."""
+    key = (team_id, conv["id"])
+    cacheable = bool(team_id) and shareable(conv)
+    entry = _histories.get(key) if cacheable else None
+    hit = entry is not None and entry["oldest"] <= oldest
+    if cacheable:
+        record_cache("slack_history", hit)
+    if not hit:
+        # The newest HISTORY_LIMIT messages after an earlier oldest include
+        # the newest HISTORY_LIMIT after any later one, so wider is reusable
+        entry = {
+            "oldest": oldest,
+            "messages": client.conversations_history(
+                channel=conv["id"], oldest=oldest, limit=HISTORY_LIMIT
+            ).get("messages", []),
+            "replies": {},
+        }
+        if cacheable:
+            _histories[key] = entry
+
+    # oldest and latest are exclusive, as in conversations.history
+    messages = [
+        msg
+        for msg in entry["messages"]
+        if oldest < float(msg["ts"]) and (latest is None or float(msg["ts"]) < latest)
+    ]
+    replies = {}
+    if with_replies:
+        for msg in messages:
+            thread_ts = msg.get("thread_ts")
+            if thread_ts and thread_ts == msg["ts"]:
+                if thread_ts not in entry["replies"]:
+                    entry["replies"][thread_ts] = client.conversations_replies(
+                        channel=conv["id"], ts=thread_ts
+                    )["messages"]
+                replies[thread_ts] = entry["replies"][thread_ts]
+    return messages, replies
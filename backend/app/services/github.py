@@ -1,9 +1,109 @@
-import os
+import asyncio
 from datetime import datetime, timedelta, timezone
-import httpx
-from anthropic import Anthropic
-from openai import OpenAI
+import numpy as np
 from ..security import decrypt_token
+from ..upstreams import GITHUB_API_URL, github_headers, http_client
+from ..prompts import PromptBuilder, summarize_github_events
+from ..llm import complete
+from ..records import EventRecords
+from .burnout import describe_burnout_score, update_burnout_score
+from .github_events import merge_ingested, record_owners
+from .trends import record_rollups
+from .timebuckets import (
+    bucket_times,
+    day_keys,
+    local_strings,
+    work_schedule,
+)
+
+
+# Event types counted as comments
+COMMENT_EVENTS = ["IssueCommentEvent", "CommitCommentEvent", "PullRequestReviewCommentEvent"]
+
+
+async def fetch_org_name(client, access_token: str) -> str | None:
+    """The user's main organization (the first of /user/orgs, which needs
+    read:org for private memberships), or None without any"""
+    response = await client.get(f"{GITHUB_API_URL}/user/orgs", headers=github_headers(access_token))
+    response.raise_for_status()
+    orgs = response.json()
+    return orgs[0]["login"] if orgs else None
+
+
+def aggregate_github_events(
+    records: EventRecords,
+    start_date: datetime,
+    end_date: datetime,
+    include_details=True,
+    schedule: dict | None = None,
+) -> dict:
+    """Aggregate GitHub event records into activity counts, per-day event types
+    and (optionally) the per-event details used for AI analysis. Days are those
+    of the schedule's timezone."""
+    schedule = schedule or work_schedule()
+    columns = records.columns()
+    types = records.types.values
+
+    # Bucket every in-range event's time in the user's timezone at once
+    rows = np.flatnonzero(
+        (columns["ts"] >= start_date.timestamp()) & (columns["ts"] <= end_date.timestamp())
+    )
+    event_type = columns["type"][rows]
+    repo = columns["repo"][rows]
+    buckets = bucket_times(columns["ts"][rows], schedule)
+
+    def of_type(*names):
+        return np.isin(event_type, [records.types.index.get(name, -1) for name in names])
+
+    # Event types per day; days, and types within a day, in order of first
+    # appearance, the first (day, type) of a day being the day's first event
+    events_by_day = {}
+    slots = buckets["day"] * len(types) + event_type
+    unique, first, counts = np.unique(slots, return_index=True, return_counts=True)
+    by_first = np.argsort(first)
+    for slot, count in zip(unique[by_first].tolist(), counts[by_first].tolist()):
+        day, code = divmod(slot, len(types))
+        events_by_day.setdefault(day, {})[types[code]] = count
+    events_by_day = dict(zip(day_keys(list(events_by_day)).tolist(), events_by_day.values()))
+
+    activity_stats = {
+        "commit_count": int(columns["commits"][rows][of_type("PushEvent")].sum()),
+        "pr_count": int(of_type("PullRequestEvent").sum()),
+        "review_count": int(of_type("PullRequestReviewEvent").sum()),
+        "issue_count": int(of_type("IssuesEvent").sum()),
+        "comment_count": int(of_type(*COMMENT_EVENTS).sum()),
+        "active_repos": {records.repos.values[code] for code in np.unique(repo[repo >= 0]).tolist()},
+        "events_by_day": events_by_day,
+    }
+    if not include_details:
+        return activity_stats
+
+    # Store event details for AI analysis, with minimal essential payload info
+    event_details = []
+    created = local_strings(buckets["local"]).tolist()
+    for row, code, repo_code, created_at in zip(
+        rows.tolist(), event_type.tolist(), repo.tolist(), created
+    ):
+        details = {
+            "type": types[code],
+            "repo": records.repos.values[repo_code] if repo_code >= 0 else None,
+            "created_at": created_at.replace("T", " "),
+        }
+        action = records.action[row]
+        action = records.actions.values[action] if action >= 0 else None
+        if types[code] == "PushEvent":
+            details["commit_count"] = records.commits[row]
+            if records.commit_message[row] is not None:
+                details["commit_message"] = records.commit_message[row]
+        elif types[code] in ("PullRequestEvent", "IssuesEvent"):
+            details["action"] = action
+            details["title"] = records.title[row]
+        elif types[code] in ("IssueCommentEvent", "PullRequestReviewCommentEvent"):
+            details["action"] = action
+        event_details.append(details)
+    activity_stats["event_details"] = event_details
+
+    return activity_stats
 
 
 async def analyze_github_activity(user_id: int, db, days: int = 7):
@@ -11,7 +111,8 @@ async def analyze_github_activity(user_id: int, db, days: int = 7):
     # Get user's GitHub token
     github_data = await db.fetchrow(
         """
-        SELECT github_username, github_access_token
+        SELECT github_username, github_access_token,
+               timezone, work_start_hour, work_end_hour
         FROM users
         WHERE id = $1
         """,
@@ -21,6 +122,12 @@ async def analyze_github_activity(user_id: int, db, days: int = 7):
     if not github_data or not github_data["github_access_token"]:
         raise ValueError("GitHub not connected")
 
+    schedule = work_schedule(
+        github_data["timezone"],
+        github_data["work_start_hour"],
+        github_data["work_end_hour"],
+    )
+
     access_token = decrypt_token(github_data["github_access_token"])
     username = github_data["github_username"]
 
@@ -28,117 +135,33 @@ async def analyze_github_activity(user_id: int, db, days: int = 7):
     end_date = datetime.now(timezone.utc)
     start_date = end_date - timedelta(days=days)
 
-    async with httpx.AsyncClient() as client:
-        # Get user's events
+    async with http_client() as client:
+        # Get user's events, from webhook deliveries for the repository
+        # owners they cover
         events_response = await client.get(
-            f"https://api.github.com/users/{username}/events",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github.v3+json",
-            },
+            f"{GITHUB_API_URL}/users/{username}/events",
+            headers=github_headers(access_token),
+        )
+        polled = events_response.json()
+        await record_owners(db, user_id, polled)
+        events = await merge_ingested(db, username, polled, start_date)
+        records = EventRecords()
+        records.add_events(events)
+
+        activity_stats = aggregate_github_events(
+            records, start_date, end_date, schedule=schedule
         )
-        events = events_response.json()
-
-        # Collect activity stats
-        activity_stats = {
-            "commit_count": 0,
-            "pr_count": 0,
-            "review_count": 0,
-            "issue_count": 0,
-            "comment_count": 0,
-            "active_repos": set(),
-            "events_by_day": {},
-            "event_details": [],
-        }
-
-        # Set timezone to IST
-        ist = timezone(timedelta(hours=5, minutes=30))
-
-        for event in events:
-            # Convert event time to IST
-            event_utc = datetime.strptime(
-                event["created_at"], "%Y-%m-%dT%H:%M:%SZ"
-            ).replace(tzinfo=timezone.utc)
-            event_date = event_utc.astimezone(ist)
-
-            if start_date <= event_date <= end_date:
-                event_type = event["type"]
-                day = event_date.strftime("%Y-%m-%d")
-
-                if day not in activity_stats["events_by_day"]:
-                    activity_stats["events_by_day"][day] = {}
-
-                if event_type not in activity_stats["events_by_day"][day]:
-                    activity_stats["events_by_day"][day][event_type] = 0
-
-                activity_stats["events_by_day"][day][event_type] += 1
-
-                if "repo" in event:
-                    activity_stats["active_repos"].add(event["repo"]["name"])
-
-                # Track specific event types
-                if event_type == "PushEvent":
-                    activity_stats["commit_count"] += len(
-                        event["payload"].get("commits", [])
-                    )
-                elif event_type == "PullRequestEvent":
-                    activity_stats["pr_count"] += 1
-                elif event_type == "PullRequestReviewEvent":
-                    activity_stats["review_count"] += 1
-                elif event_type == "IssuesEvent":
-                    activity_stats["issue_count"] += 1
-                elif event_type in [
-                    "IssueCommentEvent",
-                    "CommitCommentEvent",
-                    "PullRequestReviewCommentEvent",
-                ]:
-                    activity_stats["comment_count"] += 1
-
-                # Store event details for AI analysis
-                event_details = {
-                    "type": event_type,
-                    "repo": event["repo"]["name"],
-                    "created_at": event_date.strftime("%Y-%m-%d %H:%M:%S"),
-                }
-
-                # Add minimal essential payload info based on event type
-                if event_type == "PushEvent":
-                    event_details["commit_count"] = len(
-                        event["payload"].get("commits", [])
-                    )
-                    if event["payload"].get("commits"):
-                        event_details["commit_message"] = event["payload"]["commits"][
-                            0
-                        ].get("message", "")
-                elif event_type == "PullRequestEvent":
-                    pr_payload = event["payload"].get("pull_request", {})
-                    event_details["action"] = event["payload"].get("action")
-                    event_details["title"] = pr_payload.get("title")
-                elif event_type == "IssuesEvent":
-                    event_details["action"] = event["payload"].get("action")
-                    event_details["title"] = (
-                        event["payload"].get("issue", {}).get("title")
-                    )
-                elif event_type in [
-                    "IssueCommentEvent",
-                    "PullRequestReviewCommentEvent",
-                ]:
-                    event_details["action"] = event["payload"].get("action")
-
-                activity_stats["event_details"].append(event_details)
 
         # Convert active_repos to list for JSON serialization
         activity_stats["active_repos"] = list(activity_stats["active_repos"])
-
-        # Use Anthropic to analyze activity patterns
-        anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        activity_analysis = anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=300,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""
+        burnout = await update_burnout_score(db, user_id, "github", activity_stats, days)
+        await record_rollups(db, user_id, "github", activity_stats, days, schedule)
+
+        # Burnout-oriented analysis of the activity pattern
+        activity_prompt = (
+            PromptBuilder("github-activity")
+            .add(
+                f"""
                 Analyze these GitHub activity patterns for potential burnout risk and work-life balance:
                 
                 Past {days} days activity:
@@ -148,46 +171,63 @@ async def analyze_github_activity(user_id: int, db, days: int = 7):
                 - Issues: {activity_stats['issue_count']}
                 - Comments: {activity_stats['comment_count']}
                 - Active repositories: {len(activity_stats['active_repos'])}
-                
+
+                {describe_burnout_score(burnout)}
+                """
+            )
+            .add(
+                f"""
                 Daily activity pattern:
-                {activity_stats['events_by_day']}
-                
+{chr(10).join(f"- {day}: {counts}" for day, counts in sorted(activity_stats['events_by_day'].items()))}
+                """,
+                shrinkable=True,
+            )
+            .add(
+                """
                 Provide a brief analysis focusing on:
                 1. Work intensity and potential burnout risks
                 2. Code review and collaboration patterns
                 3. Suggestions for better work-life balance
-                """,
-                }
-            ],
+                """
+            )
+            .build()
         )
 
-        # Use OpenAI to analyze code complexity and quality trends
-        openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        code_analysis = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""
+        # Code complexity and quality trends, run concurrently with the above
+        code_prompt = (
+            PromptBuilder("code-quality")
+            .add(
+                """
                 Analyze the following GitHub activity details for code quality and complexity patterns:
-                
+                """
+            )
+            .add(
+                f"""
                 Event details:
-                {activity_stats['event_details']}
+{summarize_github_events(activity_stats['event_details'])}
                 
                 Active repositories:
-                {activity_stats['active_repos']}
-                
+                {', '.join(activity_stats['active_repos'])}
+                """,
+                shrinkable=True,
+            )
+            .add(
+                """
                 Provide insights on:
                 1. Code complexity trends
                 2. Quality of contributions
                 3. Areas for potential improvement
-                """,
-                }
-            ],
+                """
+            )
+            .build()
+        )
+        activity_analysis, code_analysis = await asyncio.gather(
+            complete("github-activity", activity_prompt, max_tokens=300),
+            complete("code-quality", code_prompt, max_tokens=1024),
         )
 
         return {
             "stats": activity_stats,
-            "activity_analysis": activity_analysis.content[0].text,
-            "code_analysis": code_analysis.choices[0].message.content,
+            "activity_analysis": activity_analysis.text,
+            "code_analysis": code_analysis.text,
         }
@@ -0,0 +1,261 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import asyncpg
+from ..etags import bump_activity_version
+
+logger = logging.getLogger(__name__)
+
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+# The repository owners of a user's last poll are taken as all they work in
+# for this long: while hooks cover every one of them, revalidations are
+# answered from the activity version without polling. An unhooked owner the
+# user starts working in shows up after at most this long.
+GITHUB_OWNERS_TTL = int(os.getenv("GITHUB_OWNERS_TTL", 3600))
+# A hook silent for longer than this may have been removed or disabled in
+# between, so its stream counts as starting over with the next delivery
+GITHUB_STREAM_STALE_AFTER = int(os.getenv("GITHUB_STREAM_STALE_AFTER", 86400))
+
+# Webhook event -> the Events API type the aggregations count, and the
+# actions that type shows up with there. Other actions (labeled,
+# synchronize, edited, ...) would only inflate the counts.
+EVENT_TYPES = {
+    "push": ("PushEvent", None),
+    "pull_request": ("PullRequestEvent", {"opened", "closed", "reopened"}),
+    "pull_request_review": ("PullRequestReviewEvent", {"submitted"}),
+    "issues": ("IssuesEvent", {"opened", "closed", "reopened"}),
+}
+
+
+def verify_signature(body: bytes, signature: str | None) -> bool:
+    """X-Hub-Signature-256: HMAC-SHA256 of the body with the webhook secret"""
+    if not GITHUB_WEBHOOK_SECRET or not signature:
+        return False
+    expected = "sha256=" + hmac.new(
+        GITHUB_WEBHOOK_SECRET.encode(), body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def _workspace(payload: dict) -> str | None:
+    """Login of the account owning the repository (or org hook)"""
+    owner = payload.get("repository", {}).get("owner", {}).get("login")
+    return owner or payload.get("organization", {}).get("login")
+
+
+def _epoch(value) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _event_payload(event: str, payload: dict) -> tuple[dict, float | None]:
+    """The Events API payload fields the records read, and when it happened"""
+    if event == "push":
+        commits = [{"message": commit.get("message", "")} for commit in payload.get("commits", [])]
+        return {"commits": commits}, _epoch(payload.get("repository", {}).get("pushed_at"))
+    action = payload.get("action")
+    if event == "pull_request":
+        pull_request = payload.get("pull_request", {})
+        return (
+            {"action": action, "pull_request": {"title": pull_request.get("title")}},
+            _epoch(pull_request.get("updated_at")),
+        )
+    if event == "issues":
+        issue = payload.get("issue", {})
+        return (
+            {"action": action, "issue": {"title": issue.get("title")}},
+            _epoch(issue.get("updated_at")),
+        )
+    review = payload.get("review", {})
+    # The Events API reports submitted reviews as created
+    return (
+        {"action": "created", "review": {"state": review.get("state")}},
+        _epoch(review.get("submitted_at")),
+    )
+
+
+async def _start_stream(db: asyncpg.Connection, workspace: str, restart: bool):
+    """Record a delivery. The stream restarts, so deliveries missed before
+    it are not taken as covered, when the hook was (re)created or has been
+    silent for GITHUB_STREAM_STALE_AFTER."""
+    await db.execute(
+        """
+        INSERT INTO ingest_streams (source, workspace)
+        VALUES ('github', $1)
+        ON CONFLICT (source, workspace) DO UPDATE
+        SET streaming_since = CASE WHEN $2 OR ingest_streams.last_event_at < $3
+                THEN NOW() ELSE ingest_streams.streaming_since END,
+            last_event_at = NOW()
+        """,
+        workspace,
+        restart,
+        datetime.now(timezone.utc).replace(tzinfo=None)
+        - timedelta(seconds=GITHUB_STREAM_STALE_AFTER),
+    )
+
+
+async def ingest_webhook(
+    db: asyncpg.Connection, event: str, delivery_id: str, payload: dict
+) -> str:
+    """Store one webhook delivery in activity_ingest and invalidate the
+    cached GitHub activity of the connected user who triggered it. Returns
+    what was done, for logging. Redeliveries keep their X-GitHub-Delivery
+    id, so they are stored once."""
+    workspace = _workspace(payload)
+    if not workspace:
+        return "ignored"
+    # A ping is sent when the hook is created: events start arriving now
+    await _start_stream(db, workspace, restart=event == "ping")
+    if event not in EVENT_TYPES:
+        return "ping" if event == "ping" else "ignored"
+
+    event_type, actions = EVENT_TYPES[event]
+    action = payload.get("action")
+    if actions is not None and action not in actions:
+        return "ignored"
+    if event == "push" and payload.get("deleted"):
+        return "ignored"
+
+    actor = payload.get("sender", {}).get("login")
+    repo = payload.get("repository", {}).get("full_name")
+    details, occurred_at = _event_payload(event, payload)
+    inserted = await db.fetchval(
+        """
+        INSERT INTO activity_ingest
+            (source, workspace, event_id, event_type, subtype, channel, actor,
+             payload, occurred_at)
+        VALUES ('github', $1, $2, $3, $4, $5, $6, $7::jsonb, to_timestamp($8))
+        ON CONFLICT (source, event_id) DO NOTHING
+        RETURNING id
+        """,
+        workspace,
+        delivery_id,
+        event_type,
+        action,
+        repo,
+        actor,
+        json.dumps(details),
+        occurred_at or time.time(),
+    )
+    if inserted is None:
+        return "duplicate"
+
+    if actor:
+        user_ids = await db.fetch(
+            """
+            SELECT id FROM users
+            WHERE lower(github_username) = lower($1) AND github_access_token IS NOT NULL
+            """,
+            actor,
+        )
+        for row in user_ids:
+            await bump_activity_version(db, row["id"], "github")
+    logger.debug("Ingested GitHub %s in %s", event_type, repo)
+    return event_type
+
+
+async def merge_ingested(
+    db: asyncpg.Connection, username: str, events: list, since: datetime
+) -> list:
+    """The user's events after since, newest first and shaped like
+    /users/{username}/events: the polled events, except that for repository
+    owners whose hooks have been delivering since before since the webhook
+    deliveries are used instead. The events API drops events past its
+    300-event cap, and owners without a hook (orgs, other people's repos)
+    are only known from polling."""
+    since_utc = since.astimezone(timezone.utc).replace(tzinfo=None)
+    rows = await db.fetch(
+        """
+        SELECT i.event_id, i.event_type, i.channel, i.actor, i.payload, i.occurred_at
+        FROM activity_ingest i
+        JOIN ingest_streams s ON s.source = 'github' AND s.workspace = i.workspace
+        WHERE i.source = 'github' AND lower(i.actor) = lower($1) AND i.occurred_at > $2
+            AND s.streaming_since <= $2
+        """,
+        username,
+        since_utc,
+    )
+    owners = {owner for owner in map(_owner, events) if owner}
+    covered = {
+        row["workspace"].lower()
+        for row in await db.fetch(
+            """
+            SELECT workspace FROM ingest_streams
+            WHERE source = 'github' AND lower(workspace) = ANY($1::text[])
+                AND streaming_since <= $2
+            """,
+            list(owners),
+            since_utc,
+        )
+    } if owners else set()
+
+    merged = [
+        event
+        for event in events
+        if _owner(event) not in covered
+    ]
+    merged.extend(
+        {
+            "id": row["event_id"],
+            "type": row["event_type"],
+            "actor": {"login": row["actor"]},
+            "repo": {"name": row["channel"]},
+            "payload": json.loads(row["payload"]) if row["payload"] else {},
+            "created_at": row["occurred_at"].strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        for row in rows
+    )
+    # ISO 8601 UTC strings sort chronologically
+    merged.sort(key=lambda event: event["created_at"], reverse=True)
+    return merged
+
+
+def _owner(event: dict) -> str | None:
+    return event["repo"]["name"].split("/")[0].lower() if "repo" in event else None
+
+
+async def record_owners(db: asyncpg.Connection, user_id: int, events: list):
+    """Remember the repository owners of a poll of the user's events"""
+    await db.execute(
+        """
+        INSERT INTO github_event_owners (user_id, owners, polled_at)
+        VALUES ($1, $2::text[], NOW())
+        ON CONFLICT (user_id) DO UPDATE
+        SET owners = EXCLUDED.owners, polled_at = EXCLUDED.polled_at
+        """,
+        user_id,
+        sorted({owner for owner in map(_owner, events) if owner}),
+    )
+
+
+async def owners_covered(db: asyncpg.Connection, user_id: int, since: datetime) -> bool:
+    """Whether hooks have been delivering since before since for every
+    repository owner of the user's recent poll, so each event bumps the
+    activity version"""
+    owners = await db.fetchval(
+        "SELECT owners FROM github_event_owners WHERE user_id = $1 AND polled_at > $2",
+        user_id,
+        datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=GITHUB_OWNERS_TTL),
+    )
+    if owners is None:
+        return False
+    if not owners:
+        return True
+    covered = await db.fetchval(
+        """
+        SELECT count(*) FROM ingest_streams
+        WHERE source = 'github' AND lower(workspace) = ANY($1::text[])
+            AND streaming_since <= $2
+        """,
+        owners,
+        since.astimezone(timezone.utc).replace(tzinfo=None),
+    )
+    return covered == len(owners)
+
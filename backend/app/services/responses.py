@@ -0,0 +1,74 @@
+import numpy as np
+from ..records import BROADCAST_REPLY, DIRECT, MessageRecords
+
+# Replies later than this after a message do not count as responding to it
+MAX_RESPONSE_SECONDS = 86400
+
+
+def find_responses(records: MessageRecords) -> dict:
+    """The user's responses: for each of their messages, the earliest message
+    TO them before it in the same conversation that they had not answered
+    yet and that is at most MAX_RESPONSE_SECONDS older.
+
+    Conversations are each channel's top level and each thread (its parent
+    and replies); a parent with replies belongs to its thread only, so it is
+    answered once. A message is TO the user when it is in a DM or group DM,
+    mentions them, or is a thread reply after they took part in the thread.
+
+    Returns aligned arrays "received" (when the message arrived), "minutes"
+    (until the response), "direct" and "thread". One pass over the merged,
+    time-ordered messages; each conversation only needs its last message of
+    the user and its first unanswered one at any point."""
+    columns = records.columns()
+    reply_thread = columns["reply_thread"]
+    threads = np.unique(reply_thread)
+    in_channel = columns["thread_role"] != BROADCAST_REPLY
+    in_channel[threads] = False
+    top_level = np.flatnonzero(in_channel)
+    # Conversation ids: channels as they are, threads after them by starter row
+    offset = len(records.channel_names)
+
+    conv = np.concatenate([columns["channel"][top_level], offset + threads, offset + reply_thread])
+    ts = np.concatenate([columns["ts"][top_level], columns["ts"][threads], columns["reply_ts"]])
+    own = np.concatenate([columns["own"][top_level], columns["own"][threads], columns["reply_own"]])
+    mentions = np.concatenate(
+        [columns["mentions"][top_level], columns["mentions"][threads], columns["reply_mentions"]]
+    )
+    channel = np.concatenate(
+        [columns["channel"][top_level], columns["channel"][threads], columns["channel"][reply_thread]]
+    )
+    in_thread = np.r_[np.zeros(len(top_level), dtype=bool), np.ones(len(threads) + len(reply_thread), dtype=bool)]
+
+    # Slack timestamps are unique within a conversation, so only the
+    # conversation pass needs a stable sort (~2x quicker than np.lexsort)
+    order = np.argsort(ts)
+    order = order[np.argsort(conv[order], kind="stable")]
+    conv, ts, own, mentions, channel, in_thread = (
+        column[order] for column in (conv, ts, own, mentions, channel, in_thread)
+    )
+    n = len(conv)
+    index = np.arange(n)
+    direct = columns["channel_kind"][channel] == DIRECT
+
+    # Whether the user wrote in the conversation before each message
+    conv_start = np.maximum.accumulate(np.where(np.r_[True, conv[1:] != conv[:-1]], index, 0))
+    last_own = np.maximum.accumulate(np.where(own, index, -1))
+    took_part = np.r_[-1, last_own[:-1]] >= conv_start
+    addressed = ~own & (direct | mentions | (in_thread & took_part))
+
+    # The user's next message after each one, in the same conversation
+    next_own = np.minimum.accumulate(np.where(own, index, n)[::-1])[::-1]
+    received = np.flatnonzero(addressed & (next_own < n))
+    reply = next_own[received]
+    kept = (conv[reply] == conv[received]) & (ts[reply] - ts[received] <= MAX_RESPONSE_SECONDS)
+    received, reply = received[kept], reply[kept]
+    # Both ascend, so the first pair of each reply has its earliest message
+    first = np.flatnonzero(np.r_[True, reply[1:] != reply[:-1]]) if len(reply) else reply
+    received, reply = received[first], reply[first]
+
+    return {
+        "received": ts[received],
+        "minutes": (ts[reply] - ts[received]) / 60,
+        "direct": direct[received],
+        "thread": in_thread[received],
+    }
@@ -0,0 +1,232 @@
+import os
+import re
+import numpy as np
+
+# Scoring mode for Slack sentiment:
+#   "llm"    - every bucket goes to the LLM (previous behaviour)
+#   "local"  - lexicon scorer only, no LLM calls
+#   "hybrid" - lexicon scorer, LLM only for buckets below the confidence threshold
+SENTIMENT_MODE = os.getenv("SLACK_SENTIMENT_MODE", "hybrid")
+MIN_LOCAL_CONFIDENCE = float(os.getenv("SLACK_SENTIMENT_MIN_CONFIDENCE", 0.6))
+
+# Word valences on a -3..3 scale, tuned for workplace chat
+LEXICON = {
+    # positive
+    "thanks": 2, "thank": 2, "thx": 2, "ty": 1.5, "appreciate": 2.5,
+    "appreciated": 2.5, "great": 2.5, "good": 1.5, "nice": 2, "awesome": 3,
+    "amazing": 3, "excellent": 3, "love": 2.5, "glad": 2, "happy": 2.5,
+    "cool": 1.5, "perfect": 2.5, "congrats": 3, "congratulations": 3,
+    "well": 0.5, "works": 1, "working": 0.5, "fixed": 1.5, "resolved": 1.5,
+    "done": 1, "shipped": 2, "merged": 1, "approved": 1.5, "lgtm": 2,
+    "helpful": 2, "excited": 2.5, "exciting": 2.5, "welcome": 1.5,
+    "sure": 0.5, "yes": 0.5, "yay": 2.5, "fantastic": 3, "brilliant": 3,
+    "kudos": 3, "win": 2, "success": 2.5, "successful": 2.5, "easy": 1,
+    "clean": 1, "smooth": 1.5, "fun": 2, "enjoy": 2, "hope": 1, "agree": 1,
+    # negative
+    "bug": -1, "bugs": -1, "broken": -2, "break": -1, "breaks": -1.5,
+    "fail": -2, "failed": -2, "failing": -2, "failure": -2, "error": -1.5,
+    "errors": -1.5, "issue": -1, "issues": -1, "problem": -1.5,
+    "problems": -1.5, "wrong": -2, "bad": -2.5, "worse": -2.5, "worst": -3,
+    "sorry": -1, "unfortunately": -1.5, "stuck": -2, "blocked": -2,
+    "blocker": -2, "urgent": -1.5, "asap": -1.5, "late": -1, "delay": -1.5,
+    "delayed": -1.5, "down": -1, "outage": -2.5, "crash": -2.5,
+    "crashed": -2.5, "annoying": -2.5, "frustrated": -2.5, "frustrating": -2.5,
+    "tired": -2, "exhausted": -3, "overwhelmed": -3, "stress": -2.5,
+    "stressed": -2.5, "stressful": -2.5, "hate": -3, "confused": -1.5,
+    "confusing": -1.5, "concern": -1, "concerned": -1.5, "worried": -2,
+    "angry": -3, "upset": -2.5, "sad": -2, "busy": -1, "deadline": -1,
+    "hotfix": -1.5, "incident": -2, "rollback": -1.5, "revert": -1,
+    "no": -0.5, "cant": -1, "can't": -1, "won't": -0.5, "ugh": -2,
+}
+
+EMOJI_VALENCE = {
+    ":tada:": 3, ":raised_hands:": 2.5, ":pray:": 2, ":+1:": 2,
+    ":thumbsup:": 2, ":heart:": 2.5, ":smile:": 2, ":slightly_smiling_face:": 1,
+    ":joy:": 2, ":rocket:": 2.5, ":fire:": 1.5, ":white_check_mark:": 1.5,
+    ":100:": 2.5, ":clap:": 2.5, ":muscle:": 2, ":sweat_smile:": -0.5,
+    ":disappointed:": -2.5, ":cry:": -2.5, ":rage:": -3, ":angry:": -3,
+    ":confused:": -1.5, ":weary:": -2.5, ":tired_face:": -2.5,
+    ":face_palm:": -2, ":facepalm:": -2, ":x:": -1.5, ":warning:": -1,
+    ":-1:": -2, ":thumbsdown:": -2,
+}
+
+NEGATORS = {"not", "no", "never", "dont", "don't", "isnt", "isn't", "wasnt",
+            "wasn't", "didnt", "didn't", "doesnt", "doesn't", "without", "nothing"}
+INTENSIFIERS = {"very": 1.5, "really": 1.4, "so": 1.3, "super": 1.5,
+                "extremely": 1.8, "totally": 1.4, "quite": 1.2, "too": 1.3}
+GRATITUDE = {"thanks", "thank", "thx", "ty", "appreciate", "appreciated", "kudos"}
+URGENCY = {"urgent", "asap", "blocker", "blocked", "incident", "outage", "hotfix",
+           "deadline", "now", "immediately"}
+
+TOKEN_PATTERN = re.compile(r":[a-z0-9_+\-]+:|[a-z']+")
+
+# Vocabulary shared by every call; index 0 is "unknown"
+_VOCAB = {}
+for _word in set(LEXICON) | set(EMOJI_VALENCE) | NEGATORS | set(INTENSIFIERS) | URGENCY:
+    _VOCAB[_word] = len(_VOCAB) + 1
+_VALENCE = np.zeros(len(_VOCAB) + 1)
+_NEGATOR = np.zeros(len(_VOCAB) + 1, dtype=bool)
+_INTENSITY = np.ones(len(_VOCAB) + 1)
+_GRATITUDE = np.zeros(len(_VOCAB) + 1, dtype=bool)
+_URGENCY = np.zeros(len(_VOCAB) + 1, dtype=bool)
+for _word, _index in _VOCAB.items():
+    _VALENCE[_index] = LEXICON.get(_word, EMOJI_VALENCE.get(_word, 0))
+    _NEGATOR[_index] = _word in NEGATORS
+    _INTENSITY[_index] = INTENSIFIERS.get(_word, 1.0)
+    _GRATITUDE[_index] = _word in GRATITUDE
+    _URGENCY[_index] = _word in URGENCY
+
+# Negation reaches this many tokens forward
+NEGATION_WINDOW = 3
+
+
+def _tokenize(messages: list[str]):
+    """Flatten all messages into vocab ids plus the owning message index"""
+    token_ids, message_ids = [], []
+    exclamations = np.zeros(len(messages))
+    questions = np.zeros(len(messages))
+    for i, text in enumerate(messages):
+        text = (text or "").lower()
+        exclamations[i] = text.count("!")
+        questions[i] = text.count("?")
+        ids = [_VOCAB.get(token, 0) for token in TOKEN_PATTERN.findall(text)]
+        token_ids.extend(ids)
+        message_ids.extend([i] * len(ids))
+    return (
+        np.asarray(token_ids, dtype=np.int32),
+        np.asarray(message_ids, dtype=np.int32),
+        exclamations,
+        questions,
+    )
+
+
+def score_messages(messages: list[str]) -> dict:
+    """Score a batch of messages in one vectorized pass.
+
+    Returns per-message arrays: a compound score in [-1, 1], whether the
+    message carried any sentiment-bearing token, and gratitude/urgency/
+    exclamation/question feature counts used for tone descriptors."""
+    n = len(messages)
+    token_ids, message_ids, exclamations, questions = _tokenize(messages)
+
+    valence = _VALENCE[token_ids]
+    if len(token_ids):
+        # A token is negated if a negator from the same message precedes it
+        # within the window
+        is_negator = _NEGATOR[token_ids]
+        negated = np.zeros(len(token_ids), dtype=bool)
+        for shift in range(1, NEGATION_WINDOW + 1):
+            same_message = message_ids[shift:] == message_ids[:-shift]
+            negated[shift:] |= is_negator[:-shift] & same_message
+        valence = np.where(negated & ~is_negator, -0.75 * valence, valence)
+
+        # Intensifiers scale the following token
+        boost = np.ones(len(token_ids))
+        same_message = message_ids[1:] == message_ids[:-1]
+        boost[1:] = np.where(same_message, _INTENSITY[token_ids[:-1]], 1.0)
+        valence = valence * boost
+
+    raw = np.bincount(message_ids, weights=valence, minlength=n)
+    raw += np.minimum(exclamations, 3) * 0.3 * np.sign(raw)
+    compound = raw / np.sqrt(raw * raw + 15)  # VADER-style normalisation
+    hits = np.bincount(message_ids, weights=valence != 0, minlength=n)
+
+    return {
+        "compound": compound,
+        "has_sentiment": hits > 0,
+        "gratitude": np.bincount(
+            message_ids, weights=_GRATITUDE[token_ids], minlength=n
+        ),
+        "urgency": np.bincount(message_ids, weights=_URGENCY[token_ids], minlength=n),
+        "exclamations": exclamations,
+        "questions": questions,
+    }
+
+
+def _tone_descriptors(mean, gratitude, urgency, exclamation, question, spread):
+    """Pick three adjectives from the strongest tone features of a bucket"""
+    candidates = [
+        (gratitude, "appreciative"),
+        (urgency, "urgent"),
+        (exclamation, "enthusiastic" if mean >= 0 else "agitated"),
+        (question, "inquisitive"),
+        (max(mean, 0) * 2, "positive"),
+        (max(-mean, 0) * 2, "frustrated"),
+        (spread, "mixed"),
+        (0.15, "professional"),
+        (0.1, "concise"),
+        (0.05, "neutral"),
+    ]
+    descriptors = []
+    for _, word in sorted(candidates, key=lambda c: -c[0]):
+        if word not in descriptors:
+            descriptors.append(word)
+        if len(descriptors) == 3:
+            break
+    return descriptors
+
+
+def score_buckets(buckets: dict) -> dict:
+    """Score every bucket (day or channel -> list of messages) in one batch.
+
+    Produces the same overall_sentiment/tone_descriptors/confidence_score
+    shape the LLM is asked for."""
+    keys = [key for key, messages in buckets.items() if messages]
+    if not keys:
+        return {}
+
+    messages, bucket_ids = [], []
+    for index, key in enumerate(keys):
+        messages.extend(buckets[key])
+        bucket_ids.extend([index] * len(buckets[key]))
+    bucket_ids = np.asarray(bucket_ids, dtype=np.int32)
+
+    scores = score_messages(messages)
+    k = len(keys)
+    count = np.bincount(bucket_ids, minlength=k).astype(float)
+    covered = np.bincount(bucket_ids, weights=scores["has_sentiment"], minlength=k)
+    total = np.bincount(bucket_ids, weights=scores["compound"], minlength=k)
+    mean = np.divide(total, covered, out=np.zeros(k), where=covered > 0)
+    squares = np.bincount(bucket_ids, weights=scores["compound"] ** 2, minlength=k)
+    spread = np.sqrt(
+        np.maximum(np.divide(squares, covered, out=np.zeros(k), where=covered > 0) - mean**2, 0)
+    )
+    sign = np.where(mean > 0.05, 1, np.where(mean < -0.05, -1, 0))
+    agreeing = np.bincount(
+        bucket_ids,
+        weights=scores["has_sentiment"]
+        & (np.sign(np.round(scores["compound"], 2)) == sign[bucket_ids]),
+        minlength=k,
+    )
+    rates = {
+        name: np.bincount(bucket_ids, weights=scores[name] > 0, minlength=k) / count
+        for name in ("gratitude", "urgency", "exclamations", "questions")
+    }
+
+    # Confidence grows with lexicon coverage, agreement between messages and
+    # sample size
+    coverage = covered / count
+    agreement = np.divide(agreeing, covered, out=np.zeros(k), where=covered > 0)
+    size = 1 - np.exp(-count / 10)
+    confidence = np.clip(0.25 + 0.35 * coverage + 0.25 * agreement + 0.15 * size, 0, 1)
+    confidence = np.where(covered == 0, 0.3 * size, confidence)
+
+    results = {}
+    for i, key in enumerate(keys):
+        results[key] = {
+            "overall_sentiment": (
+                "positive" if sign[i] > 0 else "negative" if sign[i] < 0 else "neutral"
+            ),
+            "tone_descriptors": _tone_descriptors(
+                mean[i],
+                rates["gratitude"][i],
+                rates["urgency"][i],
+                rates["exclamations"][i],
+                rates["questions"][i],
+                spread[i],
+            ),
+            "confidence_score": round(float(confidence[i]), 2),
+            "score": round(float(mean[i]), 3),
+            "source": "local",
+        }
+    return results
@@ -1,18 +1,380 @@
-import os, asyncpg
-from slack_sdk import WebClient
+import logging
+import os, asyncio, asyncpg
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
+import numpy as np
 from ..security import decrypt_token
-from openai import OpenAI
-from anthropic import Anthropic
+from ..upstreams import slack_client
+from ..prompts import PromptBuilder, truncate_text
+from ..llm import complete, parse_json
+from .sentiment import (
+    MIN_LOCAL_CONFIDENCE,
+    SENTIMENT_MODE,
+    score_buckets,
+)
+from .burnout import describe_burnout_score, latest_burnout_score, update_burnout_score
+from .trends import record_rollups, record_sketches
 from .calendar import analyze_calendar_activity
+from .channel_history import fetch_history
+from .slack_events import ingested_histories
+from . import slack_directory
 from .github import analyze_github_activity
+from .responses import find_responses
+from ..sketches import digests_by_day
+from ..records import (
+    DIRECT,
+    LONG_THREAD_LENGTH,
+    THREAD_STARTER,
+    MessageRecords,
+)
+from .timebuckets import (
+    bucket_times,
+    count_by_day,
+    count_by_hour,
+    count_by_weekday,
+    day_keys,
+    work_hours_label,
+    work_schedule,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Cap on concurrent sentiment calls per analysis
+SENTIMENT_CONCURRENCY = int(os.getenv("SLACK_SENTIMENT_CONCURRENCY", 8))
+
+
+async def analyze_sentiment_buckets(buckets: dict, kind: str) -> dict:
+    """Score each non-empty bucket (a day or a channel) with the local scorer,
+    sending it to the LLM only when the mode and local confidence call for it"""
+    local_results = score_buckets(buckets) if SENTIMENT_MODE != "llm" else {}
+    if SENTIMENT_MODE == "local":
+        return local_results
+
+    semaphore = asyncio.Semaphore(SENTIMENT_CONCURRENCY)
+
+    async def analyze(key, messages):
+        sentiment_prompt = (
+            PromptBuilder("sentiment")
+            .add(
+                f"""Analyze the sentiment and tone of these Slack messages from one {kind}. Return a JSON with:
+                        1. overall_sentiment (positive/negative/neutral)
+                        2. tone_descriptors (list of 3 adjectives)
+                        3. confidence_score (0-1)
+                        
+                        Messages:"""
+            )
+            .add(
+                "\n".join(truncate_text(m, 300) for m in messages[:50]),
+                shrinkable=True,
+            )  # Limit to 50 messages per bucket
+            .build()
+        )
+        try:
+            async with semaphore:
+                sentiment_analysis = await complete(
+                    "sentiment", sentiment_prompt, max_tokens=150
+                )
+            result = parse_json(sentiment_analysis.text)
+            result["source"] = "llm"
+            return result
+        except Exception as e:
+            logger.warning("Error analyzing sentiment for %s %s: %s", kind, key, e)
+            return local_results.get(key)
+
+    keys = [
+        key
+        for key, messages in buckets.items()
+        if messages
+        and (
+            key not in local_results
+            or local_results[key]["confidence_score"] < MIN_LOCAL_CONFIDENCE
+        )
+    ]
+    results = await asyncio.gather(*(analyze(key, buckets[key]) for key in keys))
+
+    combined = dict(local_results)
+    for key, result in zip(keys, results):
+        if result is not None:
+            combined[key] = result
+    return combined
+
+
+def aggregate_slack_activity(
+    records: MessageRecords, schedule: dict | None = None, responses: dict | None = None
+) -> dict:
+    """Aggregate fetched conversation histories into the Slack analysis metrics.
+    Times are bucketed in the schedule's timezone and work hours; responses
+    are find_responses(records), computed when not given."""
+    schedule = schedule or work_schedule()
+    columns = records.columns()
+    own = columns["own"]
+    names = records.channel_names
+
+    # Count the user's messages based on conversation type
+    own_kinds = columns["channel_kind"][columns["channel"][own]]
+    total_messages = int(own.sum())
+    dm_messages = int((own_kinds == DIRECT).sum())
+    channel_messages = total_messages - dm_messages
+
+    # Analyze threads, each once from its starter
+    starters = np.flatnonzero(columns["thread_role"] == THREAD_STARTER)
+    lengths = columns["thread_length"][starters]
+    own_replies = columns["thread_own_replies"][starters]
+    own_starters = own[starters]
+    # Only threads the user was engaged in count towards thread_depths
+    engaged = (own_replies > 0) | own_starters
+
+    # Initialize thread stats for each channel
+    threads_by_channel = {
+        name: {"initiated_threads": 0, "avg_thread_length": 0, "deep_discussions": 0}
+        for name in names
+    }
+    for channel in columns["channel"][starters[own_starters]].tolist():
+        threads_by_channel[names[channel]]["initiated_threads"] += 1
+
+    # Deep discussions: threads with >5 messages and significant participation
+    deep_discussions = []
+    for row, thread_ts, topic in records.deep_threads:
+        channel_name = names[records.channel[row]]
+        deep_discussions.append(
+            {
+                "channel": channel_name,
+                "length": records.thread_length[row],
+                "user_participation": records.thread_own_replies[row],
+                "timestamp": thread_ts,
+                "topic": topic,  # First 100 chars of thread starter
+            }
+        )
+        threads_by_channel[channel_name]["deep_discussions"] += 1
+
+    thread_stats = {
+        "threads_initiated": int(own_starters.sum()),
+        "thread_replies": int(own_replies.sum()),
+        "avg_thread_length": 0,
+        "long_threads": int((lengths > LONG_THREAD_LENGTH).sum()),
+        "thread_depths": lengths[engaged].tolist(),  # List of thread lengths
+        "threads_by_channel": threads_by_channel,  # Thread activity by channel
+        "deep_discussions": deep_discussions,  # Threads with significant engagement
+    }
+
+    # Bucket every message of the user in their timezone at once
+    buckets = bucket_times(columns["ts"][own], schedule)
+    daily_breakdown = count_by_weekday(buckets["weekday"])
+    hourly_heatmap = count_by_hour(buckets["hour"])
+    work_hours_messages = int(buckets["work_hours"].sum())
+    after_hours_messages = total_messages - work_hours_messages
+
+    # Group message content per local day and per channel for sentiment analysis
+    daily_messages = {}  # Format: {'YYYY-MM-DD': [messages]}
+    for msg_date, msg_text in zip(day_keys(buckets["day"]).tolist(), records.own_texts):
+        if msg_date not in daily_messages:
+            daily_messages[msg_date] = []
+        daily_messages[msg_date].append(msg_text)
+    channel_messages_content = {}  # Format: {'channel_name': [messages]}
+    for channel, msg_text in zip(columns["channel"][own].tolist(), records.own_texts):
+        if names[channel] not in channel_messages_content:
+            channel_messages_content[names[channel]] = []
+        channel_messages_content[names[channel]].append(msg_text)
+
+    # Calculate thread averages
+    if thread_stats["thread_depths"]:
+        thread_stats["avg_thread_length"] = sum(thread_stats["thread_depths"]) / len(
+            thread_stats["thread_depths"]
+        )
+        for channel in thread_stats["threads_by_channel"]:
+            channel_threads = thread_stats["threads_by_channel"][channel]
+            if channel_threads["initiated_threads"] > 0:
+                channel_threads["avg_thread_length"] = (
+                    sum(d for d in thread_stats["thread_depths"] if d > 0)
+                    / channel_threads["initiated_threads"]
+                )
+
+    # Average minutes to respond to DMs, mentions and threads the user is in
+    if responses is None:
+        responses = find_responses(records)
+    response_minutes = responses["minutes"]
+    avg_response_time = float(response_minutes.mean()) if len(response_minutes) else 0
+
+    # Calculate peak hours (top 3 most active hours)
+    peak_hours = sorted(hourly_heatmap.items(), key=lambda x: x[1], reverse=True)[:3]
+
+    # Calculate busiest days
+    busiest_days = sorted(daily_breakdown.items(), key=lambda x: x[1], reverse=True)
+
+    # Calculate work hours vs after hours ratio
+    work_hours_ratio = work_hours_messages / total_messages if total_messages else 0
+
+    return {
+        "message_count": total_messages,
+        "dm_message_count": dm_messages,
+        "channel_message_count": channel_messages,
+        "after_hours_messages": after_hours_messages,
+        "avg_response_time": avg_response_time,
+        "time_analysis": {
+            "daily_breakdown": daily_breakdown,
+            "hourly_heatmap": hourly_heatmap,
+            "peak_hours": peak_hours,
+            "busiest_days": busiest_days,
+            "work_hours_ratio": work_hours_ratio,
+        },
+        "thread_analysis": thread_stats,
+        "daily_messages": daily_messages,
+        "channel_messages_content": channel_messages_content,
+    }
+
+
+def slack_daily_sketches(
+    records: MessageRecords, schedule: dict | None = None, responses: dict | None = None
+) -> dict:
+    """{metric: {'YYYY-MM-DD': TDigest}}: response minutes by the local day
+    of the message responded to, and the lengths of the threads the user
+    engaged in by the day they started"""
+    schedule = schedule or work_schedule()
+    columns = records.columns()
+    if responses is None:
+        responses = find_responses(records)
+
+    starters = np.flatnonzero(columns["thread_role"] == THREAD_STARTER)
+    engaged = starters[(columns["thread_own_replies"][starters] > 0) | columns["own"][starters]]
+    return {
+        "slack.response_minutes": digests_by_day(
+            bucket_times(responses["received"], schedule)["day"], responses["minutes"]
+        ),
+        "slack.thread_length": digests_by_day(
+            bucket_times(columns["ts"][engaged], schedule)["day"],
+            columns["thread_length"][engaged],
+        ),
+    }
+
+
+def build_slack_activity_chart(
+    records: MessageRecords,
+    start_date: datetime,
+    end_date: datetime,
+    schedule: dict | None = None,
+) -> dict:
+    """Aggregate conversation histories into the /slack/activity chart data.
+    Times are bucketed in the schedule's timezone and work hours."""
+    schedule = schedule or work_schedule()
+    columns = records.columns()
+
+    # Messages in our date range
+    rows = np.flatnonzero(
+        (columns["ts"] >= start_date.timestamp()) & (columns["ts"] <= end_date.timestamp())
+    )
+    ts = columns["ts"][rows]
+    channel = columns["channel"][rows]
+    own = columns["own"][rows]
+
+    # Responses to messages received in the range, threads included
+    responses = find_responses(records)
+    in_range = (responses["received"] >= start_date.timestamp()) & (
+        responses["received"] <= end_date.timestamp()
+    )
+    received_timestamps = responses["received"][in_range]
+    response_minutes = responses["minutes"][in_range].tolist()
+
+    user_timestamps = ts[own]
+    # The user's messages per channel name, DMs all sharing theirs
+    channel_distribution = {}
+    own_counts = np.bincount(channel[own], minlength=len(records.channel_names))
+    for channel_name, count in zip(records.channel_names, own_counts.tolist()):
+        if count:
+            channel_distribution[channel_name] = channel_distribution.get(channel_name, 0) + count
+
+    # Bucket all timestamps in the user's timezone at once
+    buckets = bucket_times(user_timestamps, schedule)
+    messages_by_day = count_by_day(buckets["day"])
+    work_hours_count = int(buckets["work_hours"].sum())
+    after_hours_count = len(user_timestamps) - work_hours_count
+    weekday_count = int((buckets["weekday"] < 5).sum())
+    weekend_count = len(user_timestamps) - weekday_count
+    # Distinct (day, hour) slots with at least one message, counted per day
+    active_slots = np.unique(buckets["day"] * 24 + buckets["hour"])
+    daily_active_hours = count_by_day(active_slots // 24)
+
+    response_times_by_hour = defaultdict(list)
+    received_hours = bucket_times(received_timestamps, schedule)["hour"]
+    for hour, minutes in zip(received_hours.tolist(), response_minutes):
+        response_times_by_hour[hour].append(minutes)
+
+    # Calculate average response times by hour with better handling
+    avg_response_times = []
+    for hour in range(24):
+        times = response_times_by_hour[hour]
+        if times:
+            # Remove outliers (responses > 4 hours)
+            filtered_times = [t for t in times if t <= 240]
+            if filtered_times:
+                avg_time = sum(filtered_times) / len(filtered_times)
+            else:
+                avg_time = 0  # Default to 0 minutes if all responses were outliers
+        else:
+            # If no data for this hour, interpolate from adjacent hours
+            prev_hour = (hour - 1) % 24
+            next_hour = (hour + 1) % 24
+            prev_times = response_times_by_hour[prev_hour]
+            next_times = response_times_by_hour[next_hour]
+
+            if prev_times or next_times:
+                all_adjacent_times = prev_times + next_times
+                filtered_times = [t for t in all_adjacent_times if t <= 240]
+                avg_time = (
+                    sum(filtered_times) / len(filtered_times)
+                    if filtered_times
+                    else 0
+                )
+            else:
+                avg_time = 0  # Default when no data available
+
+        avg_response_times.append(
+            {
+                "hour": hour,
+                "avgResponseTime": round(avg_time, 2),
+                "messageCount": len(times),
+            }
+        )
+
+    # Format the response data
+    response = {
+        "messagesByDay": [
+            {"date": date, "count": count} for date, count in messages_by_day.items()
+        ],
+        "workHoursVsAfterHours": [
+            {
+                "name": f"Work Hours ({work_hours_label(schedule)})",
+                "messages": work_hours_count,
+            },
+            {"name": "After Hours", "messages": after_hours_count},
+        ],
+        "channelDistribution": [
+            {"name": channel, "value": count}
+            for channel, count in sorted(
+                channel_distribution.items(), key=lambda x: x[1], reverse=True
+            )[
+                :5
+            ]  # Top 5 channels
+        ],
+        "responseTimesByHour": avg_response_times,
+        "weekdayVsWeekend": [
+            {"name": "Weekdays", "messages": weekday_count},
+            {"name": "Weekends", "messages": weekend_count},
+        ],
+        "dailyActiveHours": [
+            {"date": date, "hours": hours} for date, hours in daily_active_hours.items()
+        ],
+    }
+
+    return response
 
 
 async def analyze_slack_activity(user_id: int, db: asyncpg.Connection, days: int = 7):
     """Fetch and analyze user's Slack activity in real-time"""
     user = await db.fetchrow(
         """
-        SELECT slack_user_id, slack_access_token, slack_bot_token 
+        SELECT slack_user_id, slack_team_id, slack_access_token, slack_bot_token,
+               timezone, work_start_hour, work_end_hour
         FROM users 
         WHERE id = $1
         """,
@@ -23,293 +385,75 @@ async def analyze_slack_activity(user_id: int, db: asyncpg.Connection, days: int
 
     # Use user token for API calls since we're reading their messages
     user_token = decrypt_token(user["slack_access_token"])
-    client = WebClient(token=user_token)
+    client = slack_client(user_token)
 
     try:
-        # Get user's Slack profile info
-        user_info = client.users_info(user=user["slack_user_id"])["user"]
-        user_profile = {
-            "real_name": user_info["profile"].get("real_name", ""),
-            "display_name": user_info["profile"].get("display_name", ""),
-            "first_name": user_info["profile"].get("first_name", ""),
-            "email": user_info["profile"].get("email", ""),
-            "title": user_info["profile"].get("title", ""),
-            "status_text": user_info["profile"].get("status_text", ""),
-            "status_emoji": user_info["profile"].get("status_emoji", ""),
-        }
-
-        # Get all conversations including DMs
-        conversations = client.users_conversations(
-            user=user["slack_user_id"],
-            types="public_channel,private_channel,mpim,im",
-            exclude_archived=True,
-            limit=1000,
+        # Profile and conversations, cached per Slack user
+        user_profile = await slack_directory.user_profile(db, client, user["slack_user_id"])
+        conversations = await slack_directory.user_conversations(
+            db, client, user["slack_user_id"]
         )
 
-        # Initialize metrics
-        total_messages = 0
-        dm_messages = 0
-        channel_messages = 0
-        after_hours_messages = 0
-        response_times = []
-
-        # Initialize thread metrics
-        thread_stats = {
-            "threads_initiated": 0,
-            "thread_replies": 0,
-            "avg_thread_length": 0,
-            "long_threads": 0,  # Threads with > 5 messages
-            "thread_depths": [],  # List of thread lengths
-            "threads_by_channel": {},  # Thread activity by channel
-            "deep_discussions": [],  # Threads with significant engagement
-        }
-
-        # Initialize time-based metrics
-        daily_breakdown = {
-            "Monday": 0,
-            "Tuesday": 0,
-            "Wednesday": 0,
-            "Thursday": 0,
-            "Friday": 0,
-            "Saturday": 0,
-            "Sunday": 0,
-        }
-        hourly_heatmap = {str(hour).zfill(2): 0 for hour in range(24)}
-        daily_messages = {}  # Format: {'YYYY-MM-DD': [messages]}
-        channel_messages_content = {}  # Format: {'channel_name': [messages]}
-
         # Last N days timestamp
         week_ago = (datetime.now(timezone.utc) - timedelta(days=days)).timestamp()
 
-        # Analyze each conversation
-        for conv in conversations["channels"]:
+        # Each conversation's history and the replies of its threads, from
+        # ingested events for channels they cover, else fetched; only the
+        # compact records of them are kept
+        ingested = await ingested_histories(
+            db,
+            user["slack_team_id"],
+            [conv["id"] for conv in conversations],
+            week_ago,
+        )
+        records = MessageRecords(user["slack_user_id"])
+        for conv in conversations:
             try:
-                # Get conversation history
-                messages = client.conversations_history(
-                    channel=conv["id"], oldest=week_ago, limit=1000
-                )["messages"]
-
-                # Get channel name for context
-                channel_name = conv.get(
-                    "name", "DM" if conv.get("is_im") else "private-channel"
-                )
-
-                # Initialize thread stats for this channel
-                if channel_name not in thread_stats["threads_by_channel"]:
-                    thread_stats["threads_by_channel"][channel_name] = {
-                        "initiated_threads": 0,
-                        "avg_thread_length": 0,
-                        "deep_discussions": 0,
-                    }
-
-                # Filter user's messages
-                user_messages = [
-                    m for m in messages if m.get("user") == user["slack_user_id"]
-                ]
-
-                # Count messages based on conversation type
-                if conv.get("is_im") or conv.get("is_mpim"):
-                    dm_messages += len(user_messages)
+                if conv["id"] in ingested:
+                    messages, replies = ingested[conv["id"]]
                 else:
-                    channel_messages += len(user_messages)
-
-                total_messages += len(user_messages)
-
-                # Analyze threads
-                thread_messages = [m for m in messages if m.get("thread_ts")]
-                for msg in thread_messages:
-                    thread_ts = msg.get("thread_ts")
-
-                    # Only analyze each thread once
-                    if thread_ts == msg["ts"]:  # This is the thread starter
-                        replies = client.conversations_replies(
-                            channel=conv["id"], ts=thread_ts
-                        )["messages"]
-
-                        thread_length = len(replies)
-                        user_replies = [
-                            r for r in replies if r.get("user") == user["slack_user_id"]
-                        ]
-
-                        # Only add to thread_depths if user was engaged in the thread
-                        if (
-                            len(user_replies) > 0
-                            or msg.get("user") == user["slack_user_id"]
-                        ):
-                            thread_stats["thread_depths"].append(thread_length)
-
-                        if thread_length > 5:
-                            thread_stats["long_threads"] += 1
-
-                        # Check if user started the thread
-                        if msg.get("user") == user["slack_user_id"]:
-                            thread_stats["threads_initiated"] += 1
-                            thread_stats["threads_by_channel"][channel_name][
-                                "initiated_threads"
-                            ] += 1
-
-                        # Count user's replies in this thread
-                        thread_stats["thread_replies"] += len(user_replies)
-
-                        # Track deep discussions (threads with >5 messages and user participated significantly)
-                        if thread_length > 5 and len(user_replies) > 2:
-                            thread_info = {
-                                "channel": channel_name,
-                                "length": thread_length,
-                                "user_participation": len(user_replies),
-                                "timestamp": msg["ts"],
-                                "topic": msg.get("text", "")[
-                                    :100
-                                ],  # First 100 chars of thread starter
-                            }
-                            thread_stats["deep_discussions"].append(thread_info)
-                            thread_stats["threads_by_channel"][channel_name][
-                                "deep_discussions"
-                            ] += 1
-
-                # Analyze message timing and content
-                for msg in user_messages:
-                    # Convert Slack timestamp to UTC first
-                    utc_datetime = datetime.fromtimestamp(
-                        float(msg["ts"]), tz=timezone.utc
+                    messages, replies = fetch_history(
+                        client, user["slack_team_id"], conv, week_ago, with_replies=True
                     )
-                    # Convert to IST (or your desired timezone)
-                    ist = timezone(timedelta(hours=5, minutes=30))  # IST is UTC+5:30
-                    msg_datetime = utc_datetime.astimezone(ist)
-
-                    msg_text = msg.get("text", "")
-
-                    # Update daily breakdown
-                    day_name = msg_datetime.strftime("%A")
-                    daily_breakdown[day_name] += 1
-
-                    # Update hourly heatmap
-                    hour = msg_datetime.strftime("%H")
-                    hourly_heatmap[hour] += 1
-
-                    # Store message content for sentiment analysis
-                    msg_date = msg_datetime.strftime("%Y-%m-%d")
-                    if msg_date not in daily_messages:
-                        daily_messages[msg_date] = []
-                    daily_messages[msg_date].append(msg_text)
-
-                    if channel_name not in channel_messages_content:
-                        channel_messages_content[channel_name] = []
-                    channel_messages_content[channel_name].append(msg_text)
-
-                    # Count after-hours messages (using local time)
-                    if not (9 <= msg_datetime.hour < 17):
-                        after_hours_messages += 1
-
+                records.add_conversation(conv, messages, replies)
             except Exception as e:
-                print(f"Error analyzing conversation {conv['id']}: {str(e)}")
+                logger.warning("Error analyzing conversation %s: %s", conv["id"], e)
                 continue
 
-        # Calculate thread averages
-        if thread_stats["thread_depths"]:
-            thread_stats["avg_thread_length"] = sum(
-                thread_stats["thread_depths"]
-            ) / len(thread_stats["thread_depths"])
-            for channel in thread_stats["threads_by_channel"]:
-                channel_threads = thread_stats["threads_by_channel"][channel]
-                if channel_threads["initiated_threads"] > 0:
-                    channel_threads["avg_thread_length"] = (
-                        sum(d for d in thread_stats["thread_depths"] if d > 0)
-                        / channel_threads["initiated_threads"]
-                    )
-
-        # Calculate average response time
-        avg_response_time = (
-            sum(response_times) / len(response_times) if response_times else 0
+        schedule = work_schedule(
+            user["timezone"], user["work_start_hour"], user["work_end_hour"]
         )
-
-        # Calculate peak hours (top 3 most active hours)
-        peak_hours = sorted(hourly_heatmap.items(), key=lambda x: x[1], reverse=True)[
-            :3
-        ]
-
-        # Calculate busiest days
-        busiest_days = sorted(daily_breakdown.items(), key=lambda x: x[1], reverse=True)
-
-        # Calculate work hours vs after hours ratio
-        work_hours_messages = sum(hourly_heatmap[str(h).zfill(2)] for h in range(9, 17))
-        total_messages_in_heatmap = sum(hourly_heatmap.values())
-        work_hours_ratio = (
-            work_hours_messages / total_messages_in_heatmap
-            if total_messages_in_heatmap > 0
-            else 0
+        responses = find_responses(records)
+        activity = aggregate_slack_activity(records, schedule, responses)
+        await update_burnout_score(db, user_id, "slack", activity, days)
+        await record_rollups(db, user_id, "slack", activity, days, schedule)
+        await record_sketches(
+            db, user_id, slack_daily_sketches(records, schedule, responses), days, schedule
         )
 
-        # Analyze sentiment for each day's messages
-        anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        daily_sentiment = {}
-        for date, messages in daily_messages.items():
-            if messages:  # Only analyze if there are messages
-                combined_messages = "\n".join(
-                    messages[:50]
-                )  # Limit to 50 messages per day
-                sentiment_analysis = anthropic.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=150,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": f"""Analyze the sentiment and tone of these Slack messages from one day. Return a JSON with:
-                        1. overall_sentiment (positive/negative/neutral)
-                        2. tone_descriptors (list of 3 adjectives)
-                        3. confidence_score (0-1)
-                        
-                        Messages:
-                        {combined_messages}""",
-                        }
-                    ],
-                )
-                daily_sentiment[date] = sentiment_analysis.content
-
-        # Analyze sentiment by channel
-        channel_sentiment = {}
-        for channel, messages in channel_messages_content.items():
-            if messages:
-                combined_messages = "\n".join(messages[:50])
-                sentiment_analysis = anthropic.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=150,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": f"""Analyze the sentiment and tone of these Slack messages from one channel. Return a JSON with:
-                        1. overall_sentiment (positive/negative/neutral)
-                        2. tone_descriptors (list of 3 adjectives)
-                        3. confidence_score (0-1)
-                        
-                        Messages:
-                        {combined_messages}""",
-                        }
-                    ],
-                )
-                channel_sentiment[channel] = sentiment_analysis.content
+        # Analyze sentiment for each day's and each channel's messages
+        daily_sentiment, channel_sentiment = await asyncio.gather(
+            analyze_sentiment_buckets(activity.pop("daily_messages"), "day"),
+            analyze_sentiment_buckets(
+                activity.pop("channel_messages_content"), "channel"
+            ),
+        )
 
         return {
             "user_profile": user_profile,
-            "message_count": total_messages,
-            "dm_message_count": dm_messages,
-            "channel_message_count": channel_messages,
-            "after_hours_messages": after_hours_messages,
-            "avg_response_time": avg_response_time,
+            "message_count": activity["message_count"],
+            "dm_message_count": activity["dm_message_count"],
+            "channel_message_count": activity["channel_message_count"],
+            "after_hours_messages": activity["after_hours_messages"],
+            "avg_response_time": activity["avg_response_time"],
             "daily_sentiment": daily_sentiment,
             "channel_sentiment": channel_sentiment,
-            "time_analysis": {
-                "daily_breakdown": daily_breakdown,
-                "hourly_heatmap": hourly_heatmap,
-                "peak_hours": peak_hours,
-                "busiest_days": busiest_days,
-                "work_hours_ratio": work_hours_ratio,
-            },
-            "thread_analysis": thread_stats,
+            "time_analysis": activity["time_analysis"],
+            "thread_analysis": activity["thread_analysis"],
         }
 
     except Exception as e:
-        print(f"Error analyzing Slack activity: {str(e)}")
+        logger.error("Error analyzing Slack activity: %s", e)
         raise e
 
 
@@ -321,7 +465,7 @@ async def generate_slack_nudge(user_id: int, db: asyncpg.Connection) -> str:
         try:
             slack_data = await analyze_slack_activity(user_id, db)
         except Exception as e:
-            print(f"Error getting Slack analysis: {e}")
+            logger.error("Error getting Slack analysis: %s", e)
             slack_data = None
 
         # # Get calendar analysis
@@ -340,8 +484,10 @@ async def generate_slack_nudge(user_id: int, db: asyncpg.Connection) -> str:
         #     print(f"Error getting GitHub analysis: {e}")
         #     github_analysis = None
 
+        # The deterministic score the nudge should build on
+        burnout = await latest_burnout_score(db, user_id)
+
         # Prepare the combined analysis for AI
-        anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
         # Add Cross-Platform Analysis
         analysis_prompt = f"""
@@ -349,6 +495,8 @@ async def generate_slack_nudge(user_id: int, db: asyncpg.Connection) -> str:
 
         Analyzing {slack_data['user_profile']['display_name'] or slack_data['user_profile']['real_name'] or 'there'}'s activity data across platforms to provide personalized insights.
 
+        {describe_burnout_score(burnout)}
+
         Analyze the following key metrics for a concise work-life balance assessment:
 
         1. Critical Patterns:
@@ -394,16 +542,13 @@ async def generate_slack_nudge(user_id: int, db: asyncpg.Connection) -> str:
 
         Focus on the most impactful insights that could make the biggest difference to their work-life balance."""
 
-        # Generate the nudge using Claude
-        response = anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=400,
-            temperature=0.7,
-            messages=[{"role": "user", "content": analysis_prompt}],
+        # Generate the nudge through the LLM router
+        response = await complete(
+            "nudge", analysis_prompt, max_tokens=400, temperature=0.7
         )
 
-        return response.content[0].text
+        return response.text
 
     except Exception as e:
-        print(f"Error generating nudge: {e}")
+        logger.error("Error generating nudge: %s", e)
         return "I noticed some interesting patterns in your work habits. Would you like to discuss strategies for maintaining a healthy work-life balance?"
@@ -0,0 +1,140 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import asyncpg
+from slack_sdk import WebClient
+from ..metrics import record_cache
+
+# A Slack user's conversations and profile rarely change, so they are kept in
+# slack_directory for this long. member_joined_channel / member_left_channel
+# and user_change events invalidate them sooner.
+SLACK_DIRECTORY_TTL = int(os.getenv("SLACK_DIRECTORY_TTL", 3600))
+
+CONVERSATION_TYPES = "public_channel,private_channel,mpim,im"
+# The parts of a users.conversations entry the readers use: its type and name
+CONVERSATION_FIELDS = ["id", "name", "is_channel", "is_group", "is_private", "is_im", "is_mpim", "user"]
+PROFILE_FIELDS = [
+    "real_name",
+    "display_name",
+    "first_name",
+    "email",
+    "title",
+    "status_text",
+    "status_emoji",
+]
+
+
+def list_conversations(client: WebClient, slack_user_id: str) -> list:
+    """Every unarchived conversation of the user, following cursors"""
+    conversations, cursor = [], None
+    while True:
+        response = client.users_conversations(
+            user=slack_user_id,
+            types=CONVERSATION_TYPES,
+            exclude_archived=True,
+            limit=1000,
+            cursor=cursor,
+        )
+        conversations.extend(
+            {field: conv[field] for field in CONVERSATION_FIELDS if field in conv}
+            for conv in response["channels"]
+        )
+        cursor = response.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return conversations
+
+
+def fetch_profile(client: WebClient, slack_user_id: str) -> dict:
+    profile = client.users_info(user=slack_user_id)["user"]["profile"]
+    return {field: profile.get(field, "") for field in PROFILE_FIELDS}
+
+
+async def _cached(db: asyncpg.Connection, slack_user_id: str, column: str):
+    """The stored column value while fresh, else None"""
+    value = await db.fetchval(
+        f"""
+        SELECT {column} FROM slack_directory
+        WHERE slack_user_id = $1 AND {column}_fetched_at > $2
+        """,
+        slack_user_id,
+        datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=SLACK_DIRECTORY_TTL),
+    )
+    record_cache(f"slack_{column}", value is not None)
+    return json.loads(value) if value is not None else None
+
+
+async def _store(db: asyncpg.Connection, slack_user_id: str, column: str, value):
+    await db.execute(
+        f"""
+        INSERT INTO slack_directory (slack_user_id, {column}, {column}_fetched_at)
+        VALUES ($1, $2::jsonb, NOW())
+        ON CONFLICT (slack_user_id) DO UPDATE
+        SET {column} = EXCLUDED.{column}, {column}_fetched_at = NOW()
+        """,
+        slack_user_id,
+        json.dumps(value),
+    )
+
+
+async def user_conversations(db: asyncpg.Connection, client: WebClient, slack_user_id: str) -> list:
+    """The user's conversations (id, type flags and name), cached"""
+    conversations = await _cached(db, slack_user_id, "conversations")
+    if conversations is None:
+        conversations = list_conversations(client, slack_user_id)
+        await _store(db, slack_user_id, "conversations", conversations)
+    return conversations
+
+
+async def stored_conversations(db: asyncpg.Connection, slack_user_id: str) -> list | None:
+    """The stored conversation listing even past SLACK_DIRECTORY_TTL, or None
+    when there is none or a membership event invalidated it. Ingested
+    membership events keep it current where the workspace is covered."""
+    value = await db.fetchval(
+        """
+        SELECT conversations FROM slack_directory
+        WHERE slack_user_id = $1 AND conversations_fetched_at IS NOT NULL
+        """,
+        slack_user_id,
+    )
+    return json.loads(value) if value is not None else None
+
+
+async def user_profile(db: asyncpg.Connection, client: WebClient, slack_user_id: str) -> dict:
+    """The user's PROFILE_FIELDS, cached"""
+    profile = await _cached(db, slack_user_id, "profile")
+    if profile is None:
+        profile = fetch_profile(client, slack_user_id)
+        await _store(db, slack_user_id, "profile", profile)
+    return profile
+
+
+async def joined_channel(db: asyncpg.Connection, slack_user_id: str):
+    """The listing lacks the new channel (and its name): list again next time"""
+    await db.execute(
+        "UPDATE slack_directory SET conversations_fetched_at = NULL WHERE slack_user_id = $1",
+        slack_user_id,
+    )
+
+
+async def left_channel(db: asyncpg.Connection, slack_user_id: str, channel_id: str):
+    """Drop the channel from the stored listing, which otherwise stays valid"""
+    await db.execute(
+        """
+        UPDATE slack_directory
+        SET conversations = COALESCE(
+            (SELECT jsonb_agg(conv) FROM jsonb_array_elements(conversations) AS conv
+             WHERE conv->>'id' <> $2),
+            '[]'::jsonb
+        )
+        WHERE slack_user_id = $1
+        """,
+        slack_user_id,
+        channel_id,
+    )
+
+
+async def profile_changed(db: asyncpg.Connection, slack_user_id: str):
+    await db.execute(
+        "UPDATE slack_directory SET profile_fetched_at = NULL WHERE slack_user_id = $1",
+        slack_user_id,
+    )
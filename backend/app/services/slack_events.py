@@ -0,0 +1,274 @@
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+import asyncpg
+from slack_sdk.signature import SignatureVerifier
+from ..etags import bump_activity_version
+from . import slack_directory
+
+logger = logging.getLogger(__name__)
+
+SLACK_SIGNING_SECRET = os.getenv("SLACK_SIGNING_SECRET")
+
+# Message subtypes that are ordinary messages for activity purposes; edits
+# and deletions are applied to the stored message instead
+STORED_SUBTYPES = {None, "thread_broadcast", "file_share", "me_message"}
+# Subtypes carrying the current state of an earlier message, e.g. a thread
+# parent with its thread_ts once it got replies
+UPDATE_SUBTYPES = {"message_changed", "message_replied"}
+REACTION_EVENTS = {"reaction_added", "reaction_removed"}
+MEMBERSHIP_EVENTS = {"member_joined_channel", "member_left_channel"}
+# After these, events may stop arriving for any of the workspace's channels
+REVOKED_EVENTS = {"app_uninstalled", "tokens_revoked"}
+MENTION = re.compile(r"<@(U[A-Z0-9]+)")
+
+
+def verify_signature(body: bytes, timestamp: str | None, signature: str | None) -> bool:
+    """Slack's v0 request signature, rejecting requests older than five minutes"""
+    if not SLACK_SIGNING_SECRET or not timestamp or not signature:
+        return False
+    return SignatureVerifier(SLACK_SIGNING_SECRET).is_valid(body, timestamp, signature)
+
+
+async def _connected_users(db: asyncpg.Connection, team_id: str, slack_user_ids: list) -> dict:
+    rows = await db.fetch(
+        """
+        SELECT id, slack_user_id FROM users
+        WHERE slack_team_id = $1 AND slack_user_id = ANY($2::text[])
+            AND slack_access_token IS NOT NULL
+        """,
+        team_id,
+        slack_user_ids,
+    )
+    return {row["slack_user_id"]: row["id"] for row in rows}
+
+
+async def _bump_connected(db: asyncpg.Connection, team_id: str, slack_user_ids: list):
+    """Invalidate the Slack activity of the connected users among slack_user_ids"""
+    slack_user_ids = [slack_user_id for slack_user_id in slack_user_ids if slack_user_id]
+    if not slack_user_ids:
+        return
+    users = await _connected_users(db, team_id, slack_user_ids)
+    for user_id in users.values():
+        await bump_activity_version(db, user_id, "slack")
+
+
+def _involved(actor: str | None, *texts: str | None) -> list:
+    """The author and the users mentioned, whose response times a message
+    counts towards"""
+    return list({actor, *(user for text in texts if text for user in MENTION.findall(text))})
+
+
+async def _cover_channel(db: asyncpg.Connection, team_id: str, channel: str):
+    await db.execute(
+        """
+        INSERT INTO ingest_channels (source, workspace, channel)
+        VALUES ('slack', $1, $2)
+        ON CONFLICT DO NOTHING
+        """,
+        team_id,
+        channel,
+    )
+
+
+async def ingest_event(db: asyncpg.Connection, payload: dict) -> str:
+    """Store one event_callback in activity_ingest and invalidate the cached
+    activity of the connected user it belongs to. Returns what was done,
+    for logging. Slack retries are idempotent thanks to the event_id key."""
+    team_id = payload.get("team_id")
+    event = payload.get("event", {})
+    event_type = event.get("type")
+    subtype = event.get("subtype")
+
+    await db.execute(
+        """
+        INSERT INTO ingest_streams (source, workspace)
+        VALUES ('slack', $1)
+        ON CONFLICT (source, workspace) DO UPDATE SET last_event_at = NOW()
+        """,
+        team_id,
+    )
+
+    if event_type in MEMBERSHIP_EVENTS:
+        actor, channel = event.get("user"), event.get("channel")
+        if event_type == "member_joined_channel":
+            await slack_directory.joined_channel(db, actor)
+        else:
+            await slack_directory.left_channel(db, actor, channel)
+        await _bump_connected(db, team_id, [actor])
+        return event_type
+    if event_type in REVOKED_EVENTS:
+        # Coverage starts over with the next event of each channel
+        await db.execute(
+            "DELETE FROM ingest_channels WHERE source = 'slack' AND workspace = $1", team_id
+        )
+        return event_type
+    if event_type == "user_change":
+        await slack_directory.profile_changed(db, event.get("user", {}).get("id"))
+        return event_type
+
+    if event_type == "message" and subtype == "message_deleted":
+        deleted = await db.fetch(
+            """
+            DELETE FROM activity_ingest
+            WHERE source = 'slack' AND workspace = $1 AND channel = $2 AND ts = $3
+            RETURNING actor, text
+            """,
+            team_id,
+            event.get("channel"),
+            event.get("deleted_ts"),
+        )
+        for row in deleted:
+            await _bump_connected(db, team_id, _involved(row["actor"], row["text"]))
+        return "deleted"
+    if event_type == "message" and subtype in UPDATE_SUBTYPES:
+        message = event.get("message", {})
+        edited = await db.fetch(
+            """
+            UPDATE activity_ingest
+            SET text = $4, thread_ts = COALESCE(thread_ts, $5)
+            WHERE source = 'slack' AND workspace = $1 AND channel = $2 AND ts = $3
+            RETURNING actor
+            """,
+            team_id,
+            event.get("channel"),
+            message.get("ts"),
+            message.get("text", ""),
+            message.get("thread_ts"),
+        )
+        previous = event.get("previous_message", {}).get("text")
+        for row in edited:
+            await _bump_connected(
+                db, team_id, _involved(row["actor"], message.get("text"), previous)
+            )
+        return "edited"
+
+    if event_type == "message" and subtype in STORED_SUBTYPES:
+        actor, channel, ts = event.get("user"), event.get("channel"), event.get("ts")
+        thread_ts, text = event.get("thread_ts"), event.get("text", "")
+    elif event_type in REACTION_EVENTS:
+        item = event.get("item", {})
+        actor, channel, ts = event.get("user"), item.get("channel"), event.get("event_ts")
+        thread_ts, text = item.get("ts"), event.get("reaction", "")
+    else:
+        return "ignored"
+
+    if channel:
+        await _cover_channel(db, team_id, channel)
+    inserted = await db.fetchval(
+        """
+        INSERT INTO activity_ingest
+            (source, workspace, event_id, event_type, subtype, channel,
+             channel_type, actor, ts, thread_ts, text, occurred_at)
+        VALUES ('slack', $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, to_timestamp($11))
+        ON CONFLICT (source, event_id) DO NOTHING
+        RETURNING id
+        """,
+        team_id,
+        payload.get("event_id"),
+        event_type,
+        subtype,
+        channel,
+        event.get("channel_type"),
+        actor,
+        ts,
+        thread_ts,
+        text,
+        float(ts or payload.get("event_time") or time.time()),
+    )
+    if inserted is None:
+        return "duplicate"
+
+    mentions = text if event_type == "message" else None
+    await _bump_connected(db, team_id, _involved(actor, mentions))
+    logger.debug("Ingested Slack %s in %s/%s", event_type, team_id, channel)
+    return event_type
+
+
+async def covered_channels(
+    db: asyncpg.Connection, team_id: str | None, channel_ids: list, oldest: float
+) -> list:
+    """The channels among channel_ids whose events have been ingested since
+    before oldest"""
+    if not team_id or not channel_ids:
+        return []
+    rows = await db.fetch(
+        """
+        SELECT channel FROM ingest_channels
+        WHERE source = 'slack' AND workspace = $1 AND channel = ANY($2::text[])
+            AND streaming_since <= $3
+        """,
+        team_id,
+        channel_ids,
+        datetime.fromtimestamp(oldest, timezone.utc).replace(tzinfo=None),
+    )
+    return [row["channel"] for row in rows]
+
+
+async def all_covered(
+    db: asyncpg.Connection, team_id: str | None, conversations: list, oldest: float
+) -> bool:
+    """Whether every one of the conversations is covered since before oldest,
+    so any change to them bumps the activity version"""
+    channel_ids = [conv["id"] for conv in conversations]
+    return len(await covered_channels(db, team_id, channel_ids, oldest)) == len(channel_ids)
+
+
+async def ingested_histories(
+    db: asyncpg.Connection,
+    team_id: str | None,
+    channel_ids: list,
+    oldest: float,
+    latest: float | None = None,
+) -> dict:
+    """{channel id: (messages, {thread_ts: replies})} shaped like
+    conversations.history / conversations.replies, built from ingested
+    events. Only channels covered since before oldest are included; callers
+    fetch the history of the others."""
+    channel_ids = await covered_channels(db, team_id, channel_ids, oldest)
+    if not channel_ids:
+        return {}
+
+    rows = await db.fetch(
+        """
+        SELECT channel, actor, ts, thread_ts, subtype, text
+        FROM activity_ingest
+        WHERE source = 'slack' AND workspace = $1 AND event_type = 'message'
+            AND channel = ANY($2::text[]) AND ts > $3 AND ts < $4
+        ORDER BY channel, ts
+        """,
+        team_id,
+        channel_ids,
+        # Slack ts strings are fixed width, so they compare as text
+        f"{oldest:.6f}",
+        f"{latest or datetime.now(timezone.utc).timestamp() + 1:.6f}",
+    )
+    histories = {channel: ([], {}) for channel in channel_ids}
+    for row in rows:
+        messages, replies = histories[row["channel"]]
+        message = {"type": "message", "user": row["actor"], "text": row["text"], "ts": row["ts"]}
+        thread_ts = row["thread_ts"]
+        if thread_ts and thread_ts != row["ts"]:
+            message["thread_ts"] = thread_ts
+            replies.setdefault(thread_ts, []).append(message)
+            # The channel history shows broadcast replies, not other replies
+            if row["subtype"] == "thread_broadcast":
+                messages.append(message)
+        else:
+            messages.append(message)
+
+    for messages, replies in histories.values():
+        # Slack sends a thread parent before it has replies, so without
+        # thread_ts: it is a parent when replies point at it. Like
+        # conversations.replies, each thread lists its parent first.
+        for message in messages:
+            ts = message["ts"]
+            if ts in replies and "thread_ts" not in message:
+                message["thread_ts"] = ts
+            if message.get("thread_ts") == ts:
+                replies[ts] = [message] + replies.get(ts, [])
+        # Newest first, as conversations.history returns them
+        messages.reverse()
+    return histories
@@ -0,0 +1,174 @@
+import logging
+import os
+import time
+from datetime import date, datetime, timezone
+import asyncpg
+from ..database import connection
+from ..metrics import record_cache
+from ..tracing import create_task
+from .trends import QUANTILES, fetch_quantiles, summarize_digest
+
+logger = logging.getLogger(__name__)
+
+# Cohorts (and single metrics) with fewer members than this are not reported,
+# so nobody's numbers can be singled out from a small team
+TEAM_MIN_MEMBERS = int(os.getenv("TEAM_MIN_MEMBERS", 5))
+# Percentiles outside the quartiles are only reported from this many members
+# on: in a small cohort p10 and p90 are all but its minimum and maximum, one
+# member's own value
+TEAM_TAIL_MIN_MEMBERS = int(os.getenv("TEAM_TAIL_MIN_MEMBERS", 20))
+# member_stats is refreshed in the background once it is older than this,
+# each worker starting at most one refresh per TEAM_STATS_REFRESH_INTERVAL
+TEAM_STATS_MAX_AGE = int(os.getenv("TEAM_STATS_MAX_AGE", 900))
+TEAM_STATS_REFRESH_INTERVAL = int(os.getenv("TEAM_STATS_REFRESH_INTERVAL", 60))
+
+# Cohort kinds and the users column that defines them
+COHORTS = {"slack": "slack_team_id", "github": "github_org_name"}
+
+# member_stats columns reported per cohort
+TEAM_METRICS = [
+    "risk_score",
+    "after_hours_ratio",
+    "weekend_ratio",
+    "meeting_hours_per_day",
+    "back_to_back_ratio",
+    "messages_per_day",
+    "reviews_per_week",
+    "commits_per_day",
+]
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+# Any constant both workers agree on; keeps concurrent refreshes to one
+REFRESH_LOCK_KEY = 4_310_001
+
+_last_refresh_request = float("-inf")
+
+
+async def refresh_member_stats():
+    """REFRESH MATERIALIZED VIEW CONCURRENTLY member_stats, unless another
+    worker is already at it. Reads keep being served from the old contents."""
+    try:
+        async with connection() as db:
+            if not await db.fetchval("SELECT pg_try_advisory_lock($1)", REFRESH_LOCK_KEY):
+                return
+            try:
+                await db.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY member_stats")
+                logger.info("Refreshed member_stats")
+            finally:
+                await db.execute("SELECT pg_advisory_unlock($1)", REFRESH_LOCK_KEY)
+    except Exception as e:
+        logger.warning("Error refreshing member_stats: %s", e)
+
+
+def request_refresh():
+    """Start a background refresh, throttled per worker"""
+    global _last_refresh_request
+    now = time.monotonic()
+    if now - _last_refresh_request < TEAM_STATS_REFRESH_INTERVAL:
+        return
+    _last_refresh_request = now
+    create_task(refresh_member_stats(), "team_stats.refresh")
+
+
+def _cohort_query() -> str:
+    columns = "".join(
+        f""",
+            count({metric}) AS {metric}_members,
+            avg({metric}) AS {metric}_mean,
+            percentile_cont($2::float8[]) WITHIN GROUP (ORDER BY {metric})
+                AS {metric}_percentiles"""
+        for metric in TEAM_METRICS
+    )
+    return f"""
+        SELECT count(*) AS members, min(refreshed_at) AS refreshed_at{columns}
+        FROM member_stats
+        WHERE {{column}} = $1
+    """
+
+
+COHORT_QUERY = _cohort_query()
+
+
+def _reported(quantile: float, members: int) -> bool:
+    """Whether a quantile of members' values may be published"""
+    return members >= TEAM_TAIL_MIN_MEMBERS or 0.25 <= quantile <= 0.75
+
+
+async def cohort_stats(db: asyncpg.Connection, kind: str, cohort_id: str) -> dict:
+    """Distribution of each member metric across one team or org: member
+    count, mean and PERCENTILES, each suppressed below TEAM_MIN_MEMBERS
+    and the tail percentiles below TEAM_TAIL_MIN_MEMBERS"""
+    row = await db.fetchrow(
+        COHORT_QUERY.format(column=COHORTS[kind]), cohort_id, PERCENTILES
+    )
+    refreshed_at = row["refreshed_at"]
+    stale = refreshed_at is None or (
+        datetime.now(timezone.utc) - refreshed_at
+    ).total_seconds() > TEAM_STATS_MAX_AGE
+    record_cache("team_stats", not stale)
+    if stale:
+        request_refresh()
+
+    result = {
+        "cohort": {"kind": kind, "id": cohort_id},
+        "refreshed_at": refreshed_at,
+        "min_members": TEAM_MIN_MEMBERS,
+        "tail_min_members": TEAM_TAIL_MIN_MEMBERS,
+        "suppressed": row["members"] < TEAM_MIN_MEMBERS,
+        "metrics": {},
+    }
+    if result["suppressed"]:
+        return result
+
+    result["members"] = row["members"]
+    for metric in TEAM_METRICS:
+        members = row[f"{metric}_members"]
+        if members < TEAM_MIN_MEMBERS:
+            result["metrics"][metric] = {"suppressed": True}
+            continue
+        result["metrics"][metric] = {
+            "members": members,
+            "suppressed": False,
+            "mean": row[f"{metric}_mean"],
+            "percentiles": {
+                f"p{round(p * 100)}": value
+                for p, value in zip(PERCENTILES, row[f"{metric}_percentiles"])
+                if _reported(p, members)
+            },
+        }
+    return result
+
+
+async def cohort_quantiles(
+    db: asyncpg.Connection, kind: str, cohort_id: str, metric: str, start: date, end: date
+) -> dict:
+    """Quantiles of a sketched metric across one team or org between start
+    and end: the merge of every member's daily sketches, suppressed when
+    fewer than TEAM_MIN_MEMBERS members contributed, and the tail quantiles
+    when fewer than TEAM_TAIL_MIN_MEMBERS did"""
+    member_ids = [
+        row["id"]
+        for row in await db.fetch(
+            f"""
+            SELECT id FROM users
+            WHERE {COHORTS[kind]} = $1 AND disabled IS NOT TRUE
+            """,
+            cohort_id,
+        )
+    ]
+    digest, members = await fetch_quantiles(db, member_ids, metric, start, end)
+    result = {
+        "cohort": {"kind": kind, "id": cohort_id},
+        "metric": metric,
+        "start": start,
+        "end": end,
+        "min_members": TEAM_MIN_MEMBERS,
+        "tail_min_members": TEAM_TAIL_MIN_MEMBERS,
+        "suppressed": members < TEAM_MIN_MEMBERS,
+    }
+    if not result["suppressed"]:
+        result["members"] = members
+        result.update(
+            summarize_digest(digest, [q for q in QUANTILES if _reported(q, members)])
+        )
+    return result
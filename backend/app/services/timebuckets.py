@@ -0,0 +1,177 @@
+import os
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import asyncpg
+import numpy as np
+
+# Used for users who have not set their own; matches the IST / 9-17 that
+# the aggregations used to hardcode
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Asia/Kolkata")
+DEFAULT_WORK_START_HOUR = 9
+DEFAULT_WORK_END_HOUR = 17
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+HOUR_KEYS = [str(hour).zfill(2) for hour in range(24)]
+
+SECONDS_PER_DAY = 86400
+# Day 0 of the epoch, 1970-01-01, was a Thursday
+EPOCH_WEEKDAY = 3
+
+
+def valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def work_schedule(
+    timezone_name: str | None = None,
+    work_start_hour: int | None = None,
+    work_end_hour: int | None = None,
+) -> dict:
+    """A user's timezone and working hours [start, end), with defaults for
+    anything unset or invalid"""
+    if not timezone_name or not valid_timezone(timezone_name):
+        timezone_name = DEFAULT_TIMEZONE
+    start = DEFAULT_WORK_START_HOUR if work_start_hour is None else work_start_hour
+    end = DEFAULT_WORK_END_HOUR if work_end_hour is None else work_end_hour
+    if not 0 <= start < end <= 24:
+        start, end = DEFAULT_WORK_START_HOUR, DEFAULT_WORK_END_HOUR
+    return {
+        "timezone": ZoneInfo(timezone_name),
+        "work_start_hour": start,
+        "work_end_hour": end,
+    }
+
+
+async def fetch_work_schedule(db: asyncpg.Connection, user_id: int) -> dict:
+    row = await db.fetchrow(
+        "SELECT timezone, work_start_hour, work_end_hour FROM users WHERE id = $1",
+        user_id,
+    )
+    if not row:
+        return work_schedule()
+    return work_schedule(row["timezone"], row["work_start_hour"], row["work_end_hour"])
+
+
+def work_hours_label(schedule: dict) -> str:
+    """"9-5" style label for chart legends"""
+    return "-".join(
+        str(hour % 12 or 12)
+        for hour in (schedule["work_start_hour"], schedule["work_end_hour"])
+    )
+
+
+def _utc_offset(zone, ts: int) -> int:
+    return int(datetime.fromtimestamp(ts, zone).utcoffset().total_seconds())
+
+
+def utc_offsets(zone, start: float, end: float) -> tuple[np.ndarray, np.ndarray]:
+    """(change points, offsets): the UTC offset in seconds in effect from each
+    change point on, covering [start, end]. The zone is probed once a day and
+    any change is bisected down to the second, so a 90 day window costs about
+    a hundred lookups however many timestamps are converted."""
+    start, end = int(np.floor(start)), int(np.ceil(end))
+    points, offsets = [-np.inf], [_utc_offset(zone, start)]
+    t = start
+    while t < end:
+        probe = min(t + SECONDS_PER_DAY, end)
+        offset = _utc_offset(zone, probe)
+        if offset != offsets[-1]:
+            lo, hi = t, probe
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if _utc_offset(zone, mid) == offsets[-1]:
+                    lo = mid
+                else:
+                    hi = mid
+            points.append(hi)
+            offsets.append(offset)
+        t = probe
+    return np.array(points, dtype=np.float64), np.array(offsets, dtype=np.float64)
+
+
+def bucket_times(timestamps, schedule: dict) -> dict:
+    """Local calendar fields of epoch timestamps (seconds, UTC) in the
+    schedule's timezone, as arrays aligned with the input:
+
+    local        seconds since the epoch, shifted to local wall-clock time
+    day          local day number (days since 1970-01-01)
+    weekday      0 = Monday .. 6 = Sunday
+    hour         0..23
+    work_hours   True inside [work_start_hour, work_end_hour)
+    early        True before work_start_hour
+    late         True at or after work_end_hour
+    """
+    ts = np.asarray(timestamps, dtype=np.float64)
+    if ts.size:
+        points, offsets = utc_offsets(schedule["timezone"], ts.min(), ts.max())
+        local = ts + offsets[np.searchsorted(points, ts, side="right") - 1]
+    else:
+        local = ts
+    day = np.floor_divide(local, SECONDS_PER_DAY).astype(np.int64)
+    hour = ((local - day * SECONDS_PER_DAY) // 3600).astype(np.int64)
+    early = hour < schedule["work_start_hour"]
+    late = hour >= schedule["work_end_hour"]
+    return {
+        "local": local,
+        "day": day,
+        "weekday": (day + EPOCH_WEEKDAY) % 7,
+        "hour": hour,
+        "work_hours": ~(early | late),
+        "early": early,
+        "late": late,
+    }
+
+
+def day_keys(days) -> np.ndarray:
+    """'YYYY-MM-DD' strings for local day numbers"""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype(str)
+
+
+def local_strings(local, unit: str = "s") -> np.ndarray:
+    """ISO 'YYYY-MM-DDTHH:MM:SS' strings (truncated to unit) for local seconds"""
+    seconds = np.floor(np.asarray(local, dtype=np.float64)).astype(np.int64)
+    return np.datetime_as_string(seconds.astype("datetime64[s]"), unit=unit)
+
+
+def count_by_day(days, mask=None) -> dict:
+    """{'YYYY-MM-DD': count} in date order"""
+    days = np.asarray(days)
+    if mask is not None:
+        days = days[mask]
+    unique, counts = np.unique(days, return_counts=True)
+    return dict(zip(day_keys(unique).tolist(), counts.tolist()))
+
+
+def count_by_hour(hours, mask=None) -> dict:
+    """{'00': count, ..., '23': count}"""
+    hours = np.asarray(hours)
+    if mask is not None:
+        hours = hours[mask]
+    return dict(zip(HOUR_KEYS, np.bincount(hours, minlength=24).tolist()))
+
+
+def count_by_weekday(weekdays, mask=None) -> dict:
+    """{'Monday': count, ..., 'Sunday': count}"""
+    weekdays = np.asarray(weekdays)
+    if mask is not None:
+        weekdays = weekdays[mask]
+    return dict(zip(WEEKDAYS, np.bincount(weekdays, minlength=7).tolist()))
+
+
+def parse_timestamps(values) -> np.ndarray:
+    """Epoch seconds from ISO 8601 strings; naive values are taken as UTC"""
+    if all(value.endswith("Z") for value in values):
+        # UTC only, as GitHub sends them: numpy parses these in C
+        parsed = np.array([value[:-1] for value in values], dtype="datetime64[ms]")
+        return parsed.astype(np.int64) / 1000
+    result = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        result[i] = parsed.timestamp()
+    return result
@@ -0,0 +1,272 @@
+from datetime import date, datetime, timedelta, timezone
+import asyncpg
+import numpy as np
+from ..sketches import TDigest
+from .timebuckets import bucket_times, day_keys
+
+# Daily rollup metrics, written by the analyses, and the burnout score
+ROLLUP_METRICS = [
+    "slack.messages",
+    "calendar.meetings",
+    "github.events",
+    "github.pushes",
+    "github.reviews",
+]
+TREND_METRICS = ["burnout"] + ROLLUP_METRICS
+# Distributions kept as one t-digest per user-day, written by the analyses
+SKETCH_METRICS = [
+    "slack.response_minutes",
+    "slack.thread_length",
+    "calendar.meeting_minutes",
+]
+QUANTILES = [0.5, 0.9, 0.99]
+RESOLUTIONS = ["day", "week", "month"]
+
+# Most points a trend returns unless the caller asks for fewer
+MAX_TREND_POINTS = 300
+
+
+def window_days(days: int, schedule: dict) -> list:
+    """'YYYY-MM-DD' of the local days the last N days cover, today included.
+    The first day is only partly covered, so an analysis has no complete
+    count for it and leaves the stored one alone."""
+    now = datetime.now(timezone.utc).timestamp()
+    first, last = bucket_times([now - days * 86400, now], schedule)["day"].tolist()
+    return day_keys(np.arange(first + 1, last + 1)).tolist()
+
+
+def daily_rollups(source: str, stats: dict) -> dict:
+    """{metric: {'YYYY-MM-DD': value}} from one source's aggregated analysis"""
+    if source == "slack":
+        return {
+            "slack.messages": {
+                day: len(messages) for day, messages in stats["daily_messages"].items()
+            }
+        }
+    if source == "calendar":
+        return {"calendar.meetings": stats["daily_meeting_counts"]}
+    return {
+        "github.events": {
+            day: sum(counts.values()) for day, counts in stats["events_by_day"].items()
+        },
+        "github.pushes": {
+            day: counts.get("PushEvent", 0) for day, counts in stats["events_by_day"].items()
+        },
+        "github.reviews": {
+            day: counts.get("PullRequestReviewEvent", 0)
+            for day, counts in stats["events_by_day"].items()
+        },
+    }
+
+
+async def record_rollups(
+    db: asyncpg.Connection,
+    user_id: int,
+    source: str,
+    stats: dict,
+    days: int,
+    schedule: dict,
+):
+    """Upsert one analysis' daily values in a single statement. Quiet days
+    are stored as zero from the first day with data on; upstream fetches
+    are capped (one page of GitHub events, 1000 messages per channel), so
+    earlier days may be missing rather than quiet."""
+    covered = window_days(days, schedule)
+    metrics, day_values, values = [], [], []
+    for metric, by_day in daily_rollups(source, stats).items():
+        if not by_day:
+            continue
+        first = min(by_day)
+        for day in covered:
+            if day < first:
+                continue
+            metrics.append(metric)
+            day_values.append(date.fromisoformat(day))
+            values.append(float(by_day.get(day, 0)))
+    if not metrics:
+        return
+    await db.execute(
+        """
+        INSERT INTO activity_rollups (user_id, metric, day, value)
+        SELECT $1, metric, day, value
+        FROM unnest($2::text[], $3::date[], $4::float8[]) AS r(metric, day, value)
+        ON CONFLICT (user_id, metric, day) DO UPDATE
+        SET value = EXCLUDED.value, updated_at = NOW()
+        """,
+        user_id,
+        metrics,
+        day_values,
+        values,
+    )
+
+
+async def record_sketches(
+    db: asyncpg.Connection,
+    user_id: int,
+    sketches: dict,
+    days: int,
+    schedule: dict,
+):
+    """Store one analysis' {metric: {'YYYY-MM-DD': TDigest}} per user-day,
+    replacing the covered days' sketches; as with rollups the days before
+    the first one with data are left alone"""
+    covered = window_days(days, schedule)
+    metrics, day_values, digests = [], [], []
+    emptied_metrics, emptied_days = [], []
+    for metric, by_day in sketches.items():
+        if not by_day:
+            continue
+        first = min(by_day)
+        for day in covered:
+            if day < first:
+                continue
+            if day in by_day:
+                metrics.append(metric)
+                day_values.append(date.fromisoformat(day))
+                digests.append(by_day[day].to_bytes())
+            else:
+                emptied_metrics.append(metric)
+                emptied_days.append(date.fromisoformat(day))
+    if metrics:
+        await db.execute(
+            """
+            INSERT INTO activity_sketches (user_id, metric, day, digest)
+            SELECT $1, metric, day, digest
+            FROM unnest($2::text[], $3::date[], $4::bytea[]) AS s(metric, day, digest)
+            ON CONFLICT (user_id, metric, day) DO UPDATE
+            SET digest = EXCLUDED.digest, updated_at = NOW()
+            """,
+            user_id,
+            metrics,
+            day_values,
+            digests,
+        )
+    if emptied_metrics:
+        await db.execute(
+            """
+            DELETE FROM activity_sketches
+            WHERE user_id = $1
+                AND (metric, day) IN (SELECT * FROM unnest($2::text[], $3::date[]))
+            """,
+            user_id,
+            emptied_metrics,
+            emptied_days,
+        )
+
+
+def summarize_digest(digest: TDigest, quantiles: list = QUANTILES) -> dict:
+    """{"count", "mean", "p50", ...} of a merged digest"""
+    if not len(digest):
+        return {"count": 0}
+    return {
+        "count": int(digest.count),
+        "mean": digest.mean(),
+        **{
+            f"p{round(q * 100)}": value
+            for q, value in zip(quantiles, digest.quantile(quantiles).tolist())
+        },
+    }
+
+
+async def fetch_quantiles(
+    db: asyncpg.Connection,
+    user_ids: list,
+    metric: str,
+    start: date,
+    end: date,
+) -> tuple[TDigest, int]:
+    """The merge of the users' stored sketches of a metric between start and
+    end (inclusive), and how many distinct users contributed"""
+    rows = await db.fetch(
+        """
+        SELECT user_id, digest FROM activity_sketches
+        WHERE user_id = ANY($1::int[]) AND metric = $2 AND day BETWEEN $3 AND $4
+        """,
+        user_ids,
+        metric,
+        start,
+        end,
+    )
+    digest = TDigest.merged_bytes(row["digest"] for row in rows)
+    return digest, len({row["user_id"] for row in rows})
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw
+    x, y with threshold points: the first and last, plus per bucket the
+    point spanning the largest triangle with its neighbours' picks"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # The next bucket's average stands in for its yet unknown pick
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+async def fetch_trend(
+    db: asyncpg.Connection,
+    user_id: int,
+    metric: str,
+    start: date,
+    end: date,
+    resolution: str,
+    max_points: int = MAX_TREND_POINTS,
+) -> list:
+    """[{"date", "value"}] of a metric between start and end (inclusive) at
+    day, week or month resolution; rollups are summed per bucket, scores
+    averaged. Longer series are downsampled with LTTB to max_points."""
+    if metric == "burnout":
+        rows = await db.fetch(
+            """
+            SELECT date_trunc($2, generated_at)::date AS bucket, avg(risk_score) AS value
+            FROM burnout_scores
+            WHERE user_id = $1 AND generated_at >= $3::date AND generated_at < $4::date + 1
+            GROUP BY bucket
+            ORDER BY bucket
+            """,
+            user_id,
+            resolution,
+            start,
+            end,
+        )
+    else:
+        rows = await db.fetch(
+            """
+            SELECT date_trunc($2, day::timestamp)::date AS bucket, sum(value) AS value
+            FROM activity_rollups
+            WHERE user_id = $1 AND metric = $3 AND day BETWEEN $4 AND $5
+            GROUP BY bucket
+            ORDER BY bucket
+            """,
+            user_id,
+            resolution,
+            metric,
+            start,
+            end,
+        )
+
+    if len(rows) > max_points:
+        x = np.array([row["bucket"].toordinal() for row in rows], dtype=np.float64)
+        y = np.array([row["value"] for row in rows], dtype=np.float64)
+        rows = [rows[i] for i in lttb(x, y, max_points).tolist()]
+    return [{"date": row["bucket"].isoformat(), "value": row["value"]} for row in rows]
+
+
+def default_trend_range(days: int = 365) -> tuple[date, date]:
+    end = datetime.now(timezone.utc).date()
+    return end - timedelta(days=days - 1), end
@@ -0,0 +1,158 @@
+import numpy as np
+from .services.timebuckets import day_keys
+
+# Centroid budget of a digest: about compression / 2 centroids are kept,
+# smallest at the tails, so p99 stays within a fraction of a percent of rank
+DEFAULT_COMPRESSION = 200
+
+# Leading byte of the serialized form
+FORMAT_VERSION = 1
+
+
+class TDigest:
+    """Mergeable quantile sketch (the merging t-digest of Dunning and Ertl).
+
+    Values are kept as weighted centroids, sorted by mean. Adding values or
+    merging digests concatenates centroids and re-clusters them in one
+    vectorized pass, so merging any number of stored digests costs about as
+    much as sorting their centroids."""
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @classmethod
+    def of(cls, values, compression: int = DEFAULT_COMPRESSION) -> "TDigest":
+        digest = cls(compression)
+        digest.add(values)
+        return digest
+
+    @classmethod
+    def merged(cls, digests, compression: int = DEFAULT_COMPRESSION) -> "TDigest":
+        digest = cls(compression)
+        digest.merge(*digests)
+        return digest
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def __len__(self):
+        return len(self.means)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress(
+                np.concatenate([self.means, values]),
+                np.concatenate([self.weights, np.ones(len(values))]),
+            )
+        return self
+
+    def merge(self, *others: "TDigest"):
+        others = [other for other in others if len(other)]
+        if others:
+            self.min = min([self.min] + [other.min for other in others])
+            self.max = max([self.max] + [other.max for other in others])
+            self._compress(
+                np.concatenate([self.means] + [other.means for other in others]),
+                np.concatenate([self.weights] + [other.weights for other in others]),
+            )
+        return self
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        """Cluster sorted centroids so each spans at most one unit of the
+        arcsine scale k(q) = compression / 2pi * asin(2q - 1)"""
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        before = (np.cumsum(weights) - weights) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * before - 1, -1, 1))
+        cluster = np.floor(k + self.compression / 4).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q):
+        """Value at quantile q (a float or an array of them), interpolating
+        between centroid centers and the exact min and max. Unit centroids
+        interpolate like np.quantile, so small samples come out exact."""
+        if not len(self):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float("nan")
+        centers = np.cumsum(self.weights) - self.weights / 2
+        result = np.interp(
+            np.asarray(q, dtype=np.float64) * (self.count - 1) + 0.5,
+            np.r_[0.0, centers, self.count],
+            np.r_[self.min, self.means, self.max],
+        )
+        return result if np.ndim(q) else float(result)
+
+    def mean(self) -> float:
+        if not len(self):
+            return float("nan")
+        return float((self.means * self.weights).sum() / self.count)
+
+    def to_bytes(self) -> bytes:
+        """Version byte, then little-endian float64 compression, min, max,
+        centroid means and weights"""
+        body = np.concatenate(
+            [[self.compression, self.min, self.max], self.means, self.weights]
+        )
+        return bytes([FORMAT_VERSION]) + body.astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        if data[0] != FORMAT_VERSION:
+            raise ValueError(f"Unknown t-digest format {data[0]}")
+        body = np.frombuffer(data, dtype="<f8", offset=1).astype(np.float64)
+        digest = cls(int(body[0]))
+        digest.min, digest.max = float(body[1]), float(body[2])
+        digest.means, digest.weights = np.split(body[3:], 2)
+        return digest
+
+
+    @classmethod
+    def merged_bytes(cls, blobs, compression: int = DEFAULT_COMPRESSION) -> "TDigest":
+        """The merge of serialized digests, decoded together in one buffer
+        rather than one from_bytes per digest"""
+        blobs = list(blobs)
+        digest = cls(compression)
+        if not blobs:
+            return digest
+        if any(blob[0] != FORMAT_VERSION for blob in blobs):
+            raise ValueError("Unknown t-digest format")
+        body = np.frombuffer(b"".join(blob[1:] for blob in blobs), dtype="<f8")
+        sizes = np.array([(len(blob) - 1) // 8 for blob in blobs])
+        offsets = np.cumsum(sizes) - sizes
+        counts = (sizes - 3) // 2
+        # Position of every centroid mean in body; its weight follows the
+        # blob's other means
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        mean_at = np.repeat(offsets + 3, counts) + within
+        digest.min = float(body[offsets + 1].min())
+        digest.max = float(body[offsets + 2].max())
+        if len(mean_at):
+            digest._compress(
+                body[mean_at].astype(np.float64),
+                body[mean_at + np.repeat(counts, counts)].astype(np.float64),
+            )
+        return digest
+
+def digests_by_day(days: np.ndarray, values: np.ndarray) -> dict:
+    """{'YYYY-MM-DD': TDigest} of values grouped by local day number"""
+    days = np.asarray(days)
+    values = np.asarray(values, dtype=np.float64)
+    if not len(days):
+        return {}
+    order = np.argsort(days, kind="stable")
+    days, values = days[order], values[order]
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    return {
+        key: TDigest.of(group)
+        for key, group in zip(day_keys(days[starts]).tolist(), np.split(values, starts[1:]))
+    }
@@ -0,0 +1,107 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import orjson
+from fastapi import Request, Response
+
+# Server-Timing on every response; set to false to hide the breakdown
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+# Allow ?debug=timing to add a "_timing" block to JSON object responses
+SERVER_TIMING_DEBUG = os.getenv("SERVER_TIMING_DEBUG", "false").lower() == "true"
+
+# Categories in header order
+CATEGORIES = ["auth", "db", "slack", "github", "google", "llm"]
+
+# {category: [seconds, calls]} for the request being served
+_timings: ContextVar[dict | None] = ContextVar("timings", default=None)
+
+
+def record(category: str, seconds: float):
+    """Add one call to the current request's accounting, if there is one"""
+    timings = _timings.get()
+    if timings is None:
+        return
+    entry = timings.setdefault(category, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += 1
+
+
+@contextmanager
+def timed(category: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(category, time.perf_counter() - started)
+
+
+def _ordered(timings: dict) -> list:
+    known = [c for c in CATEGORIES if c in timings]
+    return known + sorted(c for c in timings if c not in CATEGORIES)
+
+
+def server_timing_header(timings: dict, total: float) -> str:
+    """Server-Timing value; durations overlap when calls ran concurrently"""
+    parts = []
+    for category in _ordered(timings):
+        seconds, calls = timings[category]
+        desc = f"{calls} call" if calls == 1 else f"{calls} calls"
+        parts.append(f'{category};dur={seconds * 1000:.1f};desc="{desc}"')
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def timing_summary(timings: dict, total: float) -> dict:
+    return {
+        "total_ms": round(total * 1000, 1),
+        **{
+            category: {
+                "ms": round(timings[category][0] * 1000, 1),
+                "calls": timings[category][1],
+            }
+            for category in _ordered(timings)
+        },
+    }
+
+
+async def _with_debug_block(response: Response, summary: dict) -> Response:
+    """Re-render a JSON object response with the timing summary added"""
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    try:
+        content = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        content = None
+    if isinstance(content, dict):
+        content["_timing"] = summary
+        body = orjson.dumps(content)
+    replaced = Response(body, status_code=response.status_code)
+    # Raw headers keep repeated ones such as Set-Cookie
+    replaced.raw_headers = [
+        (name, value) for name, value in response.raw_headers if name != b"content-length"
+    ] + replaced.raw_headers
+    return replaced
+
+
+async def server_timing(request: Request, call_next):
+    """HTTP middleware accounting time per provider for this request"""
+    if not SERVER_TIMING_ENABLED:
+        return await call_next(request)
+
+    timings = {}
+    token = _timings.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _timings.reset(token)
+    total = time.perf_counter() - started
+
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    # Browsers only expose Server-Timing cross-origin when allowed
+    if os.getenv("FRONTEND_URL"):
+        response.headers["Timing-Allow-Origin"] = os.getenv("FRONTEND_URL")
+
+    if SERVER_TIMING_DEBUG and request.query_params.get("debug") == "timing":
+        return await _with_debug_block(response, timing_summary(timings, total))
+    return response
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+from fastapi import Request
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind
+
+logger = logging.getLogger(__name__)
+
+# Where finished spans go: none, console, file (JSON lines) or otlp. With
+# none the OpenTelemetry API stays a no-op and spans cost next to nothing.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", 1.0))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "work-diary-backend")
+
+# Longest SQL statement recorded on a span
+MAX_STATEMENT_CHARS = 500
+
+tracer = trace.get_tracer("work-diary")
+
+
+def _exporter():
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if TRACING_EXPORTER == "file":
+        return ConsoleSpanExporter(
+            out=open(TRACING_FILE, "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    if TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                OTLPSpanExporter,
+            )
+        except ImportError:
+            logger.warning("TRACING_EXPORTER=otlp needs opentelemetry-exporter-otlp-proto-http")
+            return None
+        # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        return OTLPSpanExporter()
+    return None
+
+
+def configure_tracing():
+    """Install the SDK tracer provider if an exporter is configured"""
+    exporter = _exporter()
+    if exporter is None:
+        return
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info("Tracing enabled, exporting spans to %s", TRACING_EXPORTER)
+
+
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, **attributes):
+    """Child span of the current one; exceptions are recorded on it"""
+    return tracer.start_as_current_span(name, kind=kind, attributes=attributes)
+
+
+def db_span(operation: str, query: str):
+    statement = " ".join(query.split())[:MAX_STATEMENT_CHARS]
+    return span(
+        f"db.{operation}",
+        SpanKind.CLIENT,
+        **{"db.system": "postgresql", "db.operation": operation, "db.statement": statement},
+    )
+
+
+def create_task(coro, name: str) -> asyncio.Task:
+    """asyncio.create_task running coro in its own span under the caller's, so
+    work that outlives the request still lands in the request's trace"""
+
+    async def run():
+        with span(name):
+            return await coro
+
+    return asyncio.create_task(run(), name=name)
+
+
+async def trace_requests(request: Request, call_next):
+    """HTTP middleware opening the server span, continuing any incoming
+    traceparent, and naming it after the matched route template"""
+    with tracer.start_as_current_span(
+        f"{request.method} {request.url.path}",
+        kind=SpanKind.SERVER,
+        context=propagate.extract(request.headers),
+        attributes={"http.method": request.method, "http.target": request.url.path},
+    ) as current:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route:
+            current.update_name(f"{request.method} {route.path}")
+            current.set_attribute("http.route", route.path)
+        current.set_attribute("http.status_code", response.status_code)
+        return response
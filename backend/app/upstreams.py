@@ -0,0 +1,124 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+import httpx
+from dotenv import load_dotenv
+from slack_sdk import WebClient
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+from opentelemetry.trace import SpanKind
+from .metrics import record_upstream, track_upstream
+from .tracing import span
+from .timing import record, timed
+
+load_dotenv()
+
+# Base URLs for every upstream API. Point these at the local stand-ins in
+# backend/fakes to run the backend without touching real services.
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GOOGLE_CALENDAR_API_URL = os.getenv("GOOGLE_CALENDAR_API_URL")  # None = default
+GOOGLE_TOKEN_URI = os.getenv("GOOGLE_TOKEN_URI", "https://oauth2.googleapis.com/token")
+GOOGLE_USERINFO_URL = os.getenv(
+    "GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo"
+)
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL")  # None = SDK default
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None = SDK default
+
+
+# Path segments replaced so per-endpoint metrics use templates, not raw URLs
+GITHUB_PATH_TEMPLATES = [
+    (re.compile(r"^/users/[^/]+"), "/users/{username}"),
+    (re.compile(r"^/repos/[^/]+/[^/]+"), "/repos/{repo}"),
+    (re.compile(r"/commits/[^/]+$"), "/commits/{sha}"),
+]
+
+
+@contextmanager
+def _instrumented(provider: str, endpoint: str):
+    """Span, metrics and per-request timing around one upstream call"""
+    with span(f"{provider} {endpoint}", SpanKind.CLIENT), track_upstream(
+        provider, endpoint
+    ), timed(provider):
+        yield
+
+
+class InstrumentedWebClient(WebClient):
+    """WebClient recording every Web API method call in the upstream metrics"""
+
+    def api_call(self, api_method: str, **kwargs):
+        with _instrumented("slack", api_method):
+            return super().api_call(api_method, **kwargs)
+
+
+def slack_client(token: str | None) -> WebClient:
+    """Slack WebClient against the configured API URL, retrying on 429s"""
+    client = InstrumentedWebClient(token=token, base_url=SLACK_API_URL)
+    client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=2))
+    return client
+
+
+def github_headers(access_token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/vnd.github.v3+json",
+    }
+
+
+def google_client_options() -> dict | None:
+    if GOOGLE_CALENDAR_API_URL:
+        return {"api_endpoint": GOOGLE_CALENDAR_API_URL}
+    return None
+
+
+def _classify(url: httpx.URL) -> tuple[str, str]:
+    """(provider, endpoint template) for an outgoing request"""
+    raw = str(url)
+    if raw.startswith(GITHUB_API_URL):
+        path = raw[len(GITHUB_API_URL) :].split("?", 1)[0] or "/"
+        for pattern, template in GITHUB_PATH_TEMPLATES:
+            path = pattern.sub(template, path)
+        return "github", path
+    if url.host == "github.com":
+        return "github", url.path
+    if raw.startswith(GOOGLE_USERINFO_URL):
+        return "google", "userinfo"
+    return "other", url.host
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Records latency to response headers and the outcome of each request"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        provider, endpoint = _classify(request.url)
+        with span(
+            f"{provider} {request.method} {endpoint}",
+            SpanKind.CLIENT,
+            **{
+                "http.method": request.method,
+                "http.url": str(request.url.copy_with(query=None)),
+            },
+        ) as current:
+            started = time.perf_counter()
+            try:
+                response = await super().handle_async_request(request)
+            except Exception:
+                record_upstream(provider, endpoint, "error", time.perf_counter() - started)
+                raise
+            finally:
+                record(provider, time.perf_counter() - started)
+            current.set_attribute("http.status_code", response.status_code)
+            outcome = "ok" if response.status_code < 400 else f"http_{response.status_code}"
+            record_upstream(provider, endpoint, outcome, time.perf_counter() - started)
+            return response
+
+
+def http_client(**kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient for GitHub and Google REST calls, with upstream metrics"""
+    return httpx.AsyncClient(transport=InstrumentedTransport(), **kwargs)
+
+
+def execute(request):
+    """Run a googleapiclient request, recording it under its API method id"""
+    with _instrumented("google", request.methodId):
+        return request.execute()
@@ -0,0 +1,11 @@
+"""Micro-benchmarks for the activity aggregation loops and for rendering and
+compressing the analysis responses.
+
+Run from the backend directory:
+
+    python -m benchmarks.run                 # small sizes, print results
+    python -m benchmarks.run --size full     # 10k/100k/1M Slack messages
+    python -m benchmarks.run --save          # record baselines.json
+    python -m benchmarks.run --check         # fail on throughput/memory regressions
+    python -m benchmarks.run --filter serialize   # JSON rendering paths only
+"""
@@ -0,0 +1,360 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from cryptography.fernet import Fernet
+
+# The service modules load app.security on import; the aggregations never
+# touch tokens, so a throwaway key is enough when no .env is present
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fakes import data
+from app.compression import compress, supported_encodings
+from app.models import CalendarAnalysis, GithubAnalysis, SlackAnalysis
+from app.records import EventRecords, MessageRecords
+from app.sketches import TDigest
+from app.services.sentiment import score_buckets
+from app.services.slack import (
+    aggregate_slack_activity,
+    build_slack_activity_chart,
+    slack_daily_sketches,
+)
+from app.services.github import aggregate_github_events
+from app.services.calendar import aggregate_calendar_events, calendar_activity_stats
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+SLACK_USER_ID = "U00000001"
+DAYS = 90
+
+# Item counts per preset. "full" matches the sizes we plan capacity around.
+SIZES = {
+    "small": {"slack": [10_000], "calendar": 5_000, "github": 1_000},
+    "full": {"slack": [10_000, 100_000, 1_000_000], "calendar": 50_000, "github": 10_000},
+}
+
+SLACK_CHANNELS = 50
+
+
+def slack_dataset(total_messages: int, now: float) -> tuple[list, int]:
+    """Histories spread evenly over SLACK_CHANNELS conversations, in the shape
+    analyze_slack_activity fetches them. Returns (conversations, item count)
+    where item count includes thread replies."""
+    per_channel = max(1, total_messages // SLACK_CHANNELS)
+    conversations, items = [], 0
+    for conv in data.slack_channels(SLACK_CHANNELS):
+        messages, replies = data.slack_messages(
+            conv["id"], per_channel, SLACK_USER_ID, days=DAYS, now=now
+        )
+        conversations.append({"conversation": conv, "messages": messages, "replies": replies})
+        items += len(messages) + sum(len(thread) for thread in replies.values())
+    return conversations, items
+
+
+def slack_records(conversations: list) -> MessageRecords:
+    records = MessageRecords(SLACK_USER_ID)
+    for item in conversations:
+        records.add_conversation(item["conversation"], item["messages"], item.get("replies"))
+    return records
+
+
+def github_records(events: list, details: bool = True) -> EventRecords:
+    records = EventRecords(details=details)
+    records.add_events(events)
+    return records
+
+
+def build_cases(size: str) -> list[dict]:
+    """Benchmark cases as {name, items, fn}; each fn runs one aggregation"""
+    preset = SIZES[size]
+    now = datetime.now(timezone.utc)
+    start_date = now - timedelta(days=DAYS)
+    cases = []
+
+    for total in preset["slack"]:
+        conversations, items = slack_dataset(total, now.timestamp())
+        records = slack_records(conversations)
+        cases.append(
+            {
+                "name": f"slack.records/{total}",
+                "items": items,
+                "fn": lambda c=conversations: slack_records(c),
+            }
+        )
+        cases.append(
+            {
+                "name": f"slack.aggregate/{total}",
+                "items": items,
+                "fn": lambda r=records: aggregate_slack_activity(r),
+            }
+        )
+        cases.append(
+            {
+                "name": f"slack.chart/{total}",
+                "items": len(records),
+                "fn": lambda r=records: build_slack_activity_chart(r, start_date, now),
+            }
+        )
+
+        cases.append(
+            {
+                "name": f"slack.sketches/{total}",
+                "items": len(records),
+                "fn": lambda r=records: slack_daily_sketches(r),
+            }
+        )
+
+    # A team of 50 over a year of stored daily digests, ~20 responses a day
+    rng = np.random.default_rng(42)
+    digests = [
+        TDigest.of(rng.lognormal(2, 1.2, rng.integers(1, 40))).to_bytes()
+        for _ in range(50 * 365)
+    ]
+    cases.append(
+        {
+            "name": f"sketches.merge/{len(digests)}",
+            "items": len(digests),
+            "fn": lambda: TDigest.merged_bytes(digests).quantile([0.5, 0.9, 0.99]),
+        }
+    )
+
+    count = preset["github"]
+    events = data.github_events(
+        count, "bench-user", data.github_repos(20), days=DAYS, now=now.timestamp()
+    )
+    records = github_records(events)
+    summary_records = github_records(events, details=False)
+    cases.append(
+        {
+            "name": f"github.records/{count}",
+            "items": count,
+            "fn": lambda: github_records(events),
+        }
+    )
+    cases.append(
+        {
+            "name": f"github.analysis/{count}",
+            "items": count,
+            "fn": lambda: aggregate_github_events(records, start_date, now),
+        }
+    )
+    cases.append(
+        {
+            "name": f"github.activity/{count}",
+            "items": count,
+            "fn": lambda: aggregate_github_events(
+                summary_records, start_date, now, include_details=False
+            ),
+        }
+    )
+
+    count = preset["calendar"]
+    meetings = data.calendar_events(count, days=DAYS, now=now.timestamp())
+    cases.append(
+        {
+            "name": f"calendar.analysis/{count}",
+            "items": count,
+            "fn": lambda: aggregate_calendar_events(meetings, DAYS),
+        }
+    )
+    cases.append(
+        {
+            "name": f"calendar.stats/{count}",
+            "items": count,
+            "fn": lambda: calendar_activity_stats(meetings, DAYS),
+        }
+    )
+
+    slack_total = preset["slack"][0]
+    conversations, _ = slack_dataset(slack_total, now.timestamp())
+    payloads = [
+        ("slack", slack_total, SlackAnalysis, slack_analysis_payload(conversations)),
+        ("calendar", len(meetings), CalendarAnalysis, calendar_analysis_payload(meetings)),
+        ("github", len(events), GithubAnalysis, github_analysis_payload(events, start_date, now)),
+    ]
+    for kind, items, model, payload in payloads:
+        cases += serialization_cases(kind, items, model, payload)
+    return cases
+
+
+def slack_analysis_payload(conversations: list) -> dict:
+    """/slack/analyze response with locally scored sentiment"""
+    activity = aggregate_slack_activity(slack_records(conversations))
+    return {
+        "user_profile": {"real_name": "Bench User", "display_name": "bench"},
+        **{
+            key: activity[key]
+            for key in (
+                "message_count",
+                "dm_message_count",
+                "channel_message_count",
+                "after_hours_messages",
+                "avg_response_time",
+                "time_analysis",
+                "thread_analysis",
+            )
+        },
+        "daily_sentiment": score_buckets(activity["daily_messages"]),
+        "channel_sentiment": score_buckets(activity["channel_messages_content"]),
+    }
+
+
+def calendar_analysis_payload(meetings: list) -> dict:
+    """/calendar/analyze response; the AI text is a fixed-size stand-in"""
+    stats = aggregate_calendar_events(meetings, DAYS)
+    stats["ai_analysis"] = {"burnout_risk": "x" * 1200, "schedule_optimization": "x" * 4000}
+    return stats
+
+
+def github_analysis_payload(events: list, start_date: datetime, end_date: datetime) -> dict:
+    stats = aggregate_github_events(github_records(events), start_date, end_date)
+    stats["active_repos"] = list(stats["active_repos"])
+    return {"stats": stats, "activity_analysis": "x" * 1200, "code_analysis": "x" * 4000}
+
+
+def serialization_cases(kind: str, items: int, model, payload: dict) -> list[dict]:
+    """Render one analysis response the way FastAPI would: the previous
+    jsonable_encoder + json path, jsonable_encoder + orjson (untyped routes
+    under the default response class) and the typed response model path.
+    Then compress the typed body with every supported encoding."""
+
+    def typed():
+        content = model.model_validate(payload).model_dump(mode="json", exclude_unset=True)
+        return ORJSONResponse(content).body
+
+    body = typed()
+    cases = [
+        {
+            "name": f"serialize.{kind}.stdlib/{items}",
+            "items": items,
+            "fn": lambda: JSONResponse(jsonable_encoder(payload)).body,
+        },
+        {
+            "name": f"serialize.{kind}.orjson/{items}",
+            "items": items,
+            "fn": lambda: ORJSONResponse(jsonable_encoder(payload)).body,
+        },
+        {"name": f"serialize.{kind}.typed/{items}", "items": items, "fn": typed},
+    ]
+    for encoding in supported_encodings():
+        cases.append(
+            {
+                "name": f"compress.{kind}.{encoding}/{items}",
+                "items": items,
+                "fn": lambda e=encoding: compress(body, e),
+            }
+        )
+    return cases
+
+
+def measure(case: dict, repeat: int) -> dict:
+    """Best-of-repeat wall time, then one traced run for peak memory"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        output = case["fn"]()
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+
+    gc.collect()
+    tracemalloc.start()
+    case["fn"]()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "items": case["items"],
+        "best_seconds": round(best, 6),
+        "ns_per_item": round(best * 1e9 / max(case["items"], 1), 1),
+        "items_per_second": round(case["items"] / best) if best else None,
+        "peak_kib": round(peak / 1024, 1),
+    }
+    # Serialization and compression cases: size of the rendered body
+    if isinstance(output, bytes):
+        result["output_kib"] = round(len(output) / 1024, 1)
+    return result
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> list[str]:
+    """Regressions beyond tolerance in ns/item or peak memory"""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        for metric in ("ns_per_item", "peak_kib"):
+            limit = baseline[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{name}: {metric} {result[metric]} > {baseline[metric]} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the activity aggregations and response rendering")
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="Only run cases containing this text")
+    parser.add_argument("--save", action="store_true", help="Write results as baselines")
+    parser.add_argument("--check", action="store_true", help="Compare against baselines")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"Generating {args.size} datasets...")
+    cases = [c for c in build_cases(args.size) if args.filter in c["name"]]
+
+    results = {}
+    print(
+        f"{'case':<28}{'items':>10}{'ns/item':>12}{'items/s':>14}{'peak KiB':>12}{'out KiB':>10}"
+    )
+    for case in cases:
+        result = measure(case, args.repeat)
+        results[case["name"]] = result
+        print(
+            f"{case['name']:<28}{result['items']:>10}{result['ns_per_item']:>12}"
+            f"{result['items_per_second']:>14}{result['peak_kib']:>12}"
+            f"{result.get('output_kib', ''):>10}"
+        )
+
+    stored = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            stored = json.load(f)
+
+    if args.save:
+        stored.setdefault("results", {}).update(results)
+        stored["metadata"] = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results)} baselines to {BASELINES_PATH}")
+
+    if args.check:
+        if not stored.get("results"):
+            print("No baselines recorded; run with --save first")
+            sys.exit(1)
+        regressions = compare(results, stored["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
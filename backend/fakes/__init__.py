@@ -0,0 +1,27 @@
+"""Local stand-ins for the Slack, GitHub, Google Calendar, Anthropic and
+OpenAI APIs used by the backend.
+
+Run them all on one port with:
+
+    python -m fakes.server --port 9000
+
+and point the backend at them:
+
+    SLACK_API_URL=http://localhost:9000/slack/api/
+    GITHUB_API_URL=http://localhost:9000/github
+    GOOGLE_CALENDAR_API_URL=http://localhost:9000/google/calendar/v3/
+    GOOGLE_TOKEN_URI=http://localhost:9000/google/token
+    GOOGLE_USERINFO_URL=http://localhost:9000/google/oauth2/v2/userinfo
+    ANTHROPIC_BASE_URL=http://localhost:9000/anthropic
+    OPENAI_BASE_URL=http://localhost:9000/openai/v1
+
+Data volumes, latency, page sizes and rate limits are configured with
+FAKE_* environment variables, see fakes/config.py. A Slack user token of
+the form xoxp-fake-<user id> makes that user the author of the "own"
+messages, so several backend users can share one stand-in workspace.
+
+python -m fakes.slack_events replays the same workspace to a backend's
+/slack/events webhook as signed Events API callbacks, and
+python -m fakes.github_webhooks the GitHub user's events to /github/webhook
+as signed webhook deliveries.
+"""
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from fastapi.responses import JSONResponse
+
+
+def _env(name, default, cast=int):
+    return cast(os.getenv(name, default))
+
+
+@dataclass
+class FakeConfig:
+    """Knobs for the stand-in servers, read from FAKE_* environment variables"""
+
+    seed: int = field(default_factory=lambda: _env("FAKE_SEED", 42))
+    days: int = field(default_factory=lambda: _env("FAKE_DAYS", 90))
+
+    # Data volumes
+    slack_user_id: str = field(default_factory=lambda: os.getenv("FAKE_SLACK_USER", "U00000001"))
+    slack_channels: int = field(default_factory=lambda: _env("FAKE_SLACK_CHANNELS", 20))
+    slack_messages_per_channel: int = field(
+        default_factory=lambda: _env("FAKE_SLACK_MESSAGES_PER_CHANNEL", 500)
+    )
+    slack_thread_ratio: float = field(
+        default_factory=lambda: _env("FAKE_SLACK_THREAD_RATIO", 0.1, float)
+    )
+    slack_own_ratio: float = field(
+        default_factory=lambda: _env("FAKE_SLACK_OWN_RATIO", 0.3, float)
+    )
+    github_events: int = field(default_factory=lambda: _env("FAKE_GITHUB_EVENTS", 300))
+    github_repos: int = field(default_factory=lambda: _env("FAKE_GITHUB_REPOS", 8))
+    calendar_events: int = field(default_factory=lambda: _env("FAKE_CALENDAR_EVENTS", 400))
+
+    # Pagination
+    slack_page_size: int = field(default_factory=lambda: _env("FAKE_SLACK_PAGE_SIZE", 200))
+    github_page_size: int = field(default_factory=lambda: _env("FAKE_GITHUB_PAGE_SIZE", 30))
+    calendar_page_size: int = field(
+        default_factory=lambda: _env("FAKE_CALENDAR_PAGE_SIZE", 250)
+    )
+
+    # Latency in milliseconds: mean, jitter (std dev) and a slow-tail probability
+    latency_ms: float = field(default_factory=lambda: _env("FAKE_LATENCY_MS", 50, float))
+    jitter_ms: float = field(default_factory=lambda: _env("FAKE_JITTER_MS", 20, float))
+    llm_latency_ms: float = field(
+        default_factory=lambda: _env("FAKE_LLM_LATENCY_MS", 1500, float)
+    )
+    slow_ratio: float = field(default_factory=lambda: _env("FAKE_SLOW_RATIO", 0.02, float))
+    slow_factor: float = field(default_factory=lambda: _env("FAKE_SLOW_FACTOR", 10, float))
+
+    # Rate limiting per provider, 0 disables it
+    rate_limit_per_second: float = field(
+        default_factory=lambda: _env("FAKE_RATE_LIMIT_PER_SECOND", 0, float)
+    )
+    rate_limit_burst: int = field(default_factory=lambda: _env("FAKE_RATE_LIMIT_BURST", 50))
+
+
+class Upstream:
+    """Shared latency simulation and token-bucket rate limiting for one provider"""
+
+    def __init__(self, config: FakeConfig, latency_ms: float | None = None):
+        self.config = config
+        self.latency_ms = config.latency_ms if latency_ms is None else latency_ms
+        self.random = random.Random(config.seed)
+        self.tokens = float(config.rate_limit_burst)
+        self.refilled_at = time.monotonic()
+        self.calls = 0
+        self.throttled = 0
+
+    def _take_token(self) -> bool:
+        rate = self.config.rate_limit_per_second
+        if rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(
+            self.config.rate_limit_burst, self.tokens + (now - self.refilled_at) * rate
+        )
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def delay(self):
+        latency = max(self.random.gauss(self.latency_ms, self.config.jitter_ms), 0)
+        if self.random.random() < self.config.slow_ratio:
+            latency *= self.config.slow_factor
+        await asyncio.sleep(latency / 1000)
+
+    async def admit(self, limited_body: dict):
+        """Simulate latency; return a 429 response if the caller is rate limited"""
+        self.calls += 1
+        await self.delay()
+        if not self._take_token():
+            self.throttled += 1
+            retry_after = max(int(1 / self.config.rate_limit_per_second), 1)
+            return JSONResponse(
+                limited_body, status_code=429, headers={"Retry-After": str(retry_after)}
+            )
+        return None
@@ -0,0 +1,283 @@
+"""Deterministic synthetic upstream payloads.
+
+Every generator is seeded, so the same arguments always produce the same data.
+They return payloads in the exact shape the real APIs return, which lets the
+stand-in servers and the benchmarks share them."""
+
+import random
+import zlib
+from datetime import datetime, timedelta, timezone
+
+PHRASES = [
+    "Thanks, that looks great!",
+    "Can you take a look at the PR when you get a chance?",
+    "The build is broken again on main",
+    "Deploying the hotfix now",
+    "Sounds good to me",
+    "I'm blocked on the API review, any update?",
+    "Great work on the release everyone :tada:",
+    "Not sure this is the right approach",
+    "Let's sync tomorrow morning",
+    "The incident is resolved, writing the postmortem",
+    "ugh, flaky tests again",
+    "Really appreciate the quick turnaround",
+    "Is anyone else seeing errors in staging?",
+    "Merged, thanks for the review :+1:",
+    "Running late, will join in 5",
+]
+
+EVENT_TYPES = [
+    ("PushEvent", 45),
+    ("PullRequestEvent", 15),
+    ("PullRequestReviewEvent", 12),
+    ("IssueCommentEvent", 10),
+    ("PullRequestReviewCommentEvent", 8),
+    ("IssuesEvent", 5),
+    ("CreateEvent", 3),
+    ("CommitCommentEvent", 2),
+]
+
+MEETING_TITLES = [
+    "Daily standup",
+    "Sprint planning",
+    "1:1",
+    "Design review",
+    "Customer call",
+    "Retro",
+    "Architecture sync",
+    "Hiring interview",
+    "All hands",
+    "Incident review",
+]
+
+LANGUAGES = ["Python", "TypeScript", "Go", "Rust", "SQL", "Shell", "CSS", "HTML"]
+
+
+def _rng(seed: int, *parts) -> random.Random:
+    key = ":".join(str(p) for p in parts).encode()
+    return random.Random(seed * 1_000_003 + zlib.crc32(key))
+
+
+def _random_ts(rng: random.Random, now: float, days: int) -> float:
+    return now - rng.random() * days * 86400
+
+
+def slack_channels(count: int, seed: int = 42) -> list[dict]:
+    """Conversations as returned by users.conversations"""
+    rng = _rng(seed, "channels")
+    channels = []
+    for i in range(count):
+        kind = rng.choices(["public", "private", "im", "mpim"], [6, 2, 3, 1])[0]
+        channel = {
+            "id": f"C{i:08d}" if kind != "im" else f"D{i:08d}",
+            "created": 1600000000 + i,
+            "is_archived": False,
+            "is_channel": kind == "public",
+            "is_group": kind == "private",
+            "is_im": kind == "im",
+            "is_mpim": kind == "mpim",
+            "is_private": kind != "public",
+        }
+        if kind == "im":
+            channel["user"] = f"U{rng.randint(2, 999):08d}"
+        else:
+            channel["name"] = f"{kind}-channel-{i}"
+        channels.append(channel)
+    return channels
+
+
+def slack_messages(
+    channel_id: str,
+    count: int,
+    user_id: str,
+    days: int = 90,
+    now: float | None = None,
+    seed: int = 42,
+    thread_ratio: float = 0.1,
+    own_ratio: float = 0.3,
+):
+    """History for one channel, newest first as conversations.history returns
+    it, plus thread replies keyed by thread_ts (oldest first, parent included)"""
+    rng = _rng(seed, "messages", channel_id)
+    now = now or datetime.now(timezone.utc).timestamp()
+    stamps = sorted((_random_ts(rng, now, days) for _ in range(count)), reverse=True)
+
+    messages, replies = [], {}
+    for ts in stamps:
+        author = user_id if rng.random() < own_ratio else f"U{rng.randint(2, 999):08d}"
+        message = {
+            "type": "message",
+            "user": author,
+            "text": rng.choice(PHRASES),
+            "ts": f"{ts:.6f}",
+        }
+        if rng.random() < thread_ratio:
+            reply_count = rng.randint(1, 12)
+            message["thread_ts"] = message["ts"]
+            message["reply_count"] = reply_count
+            thread = [message]
+            reply_ts = ts
+            for _ in range(reply_count):
+                reply_ts += rng.randint(30, 7200)
+                thread.append(
+                    {
+                        "type": "message",
+                        "user": user_id
+                        if rng.random() < own_ratio
+                        else f"U{rng.randint(2, 999):08d}",
+                        "text": rng.choice(PHRASES),
+                        "ts": f"{reply_ts:.6f}",
+                        "thread_ts": message["ts"],
+                        "parent_user_id": author,
+                    }
+                )
+            replies[message["ts"]] = thread
+        messages.append(message)
+    return messages, replies
+
+
+def slack_user(user_id: str) -> dict:
+    """User object as returned by users.info"""
+    name = f"Test User {user_id[-4:]}"
+    return {
+        "id": user_id,
+        "name": name.lower().replace(" ", "."),
+        "real_name": name,
+        "tz": "Asia/Kolkata",
+        "profile": {
+            "real_name": name,
+            "display_name": name.split()[-1],
+            "first_name": "Test",
+            "email": f"{user_id.lower()}@example.com",
+            "title": "Engineer",
+            "status_text": "",
+            "status_emoji": "",
+        },
+    }
+
+
+def github_repos(count: int, owner: str = "acme", seed: int = 42) -> list[str]:
+    return [f"{owner}/service-{i}" for i in range(count)]
+
+
+def github_events(
+    count: int,
+    username: str,
+    repos: list[str],
+    days: int = 90,
+    now: float | None = None,
+    seed: int = 42,
+    api_url: str = "https://api.github.com",
+) -> list[dict]:
+    """Events as returned by /users/{username}/events, newest first"""
+    rng = _rng(seed, "events", username)
+    now = now or datetime.now(timezone.utc).timestamp()
+    types, weights = zip(*EVENT_TYPES)
+    events = []
+    for i, ts in enumerate(
+        sorted((_random_ts(rng, now, days) for _ in range(count)), reverse=True)
+    ):
+        event_type = rng.choices(types, weights)[0]
+        repo = rng.choice(repos)
+        payload = {}
+        if event_type == "PushEvent":
+            payload["commits"] = [
+                {
+                    "sha": f"{rng.getrandbits(160):040x}",
+                    "message": rng.choice(PHRASES),
+                    "url": f"{api_url}/repos/{repo}/commits/{rng.getrandbits(160):040x}",
+                }
+                for _ in range(rng.randint(1, 5))
+            ]
+        elif event_type == "PullRequestEvent":
+            payload = {
+                "action": rng.choice(["opened", "closed", "reopened"]),
+                "pull_request": {"title": rng.choice(PHRASES), "number": i},
+            }
+        elif event_type == "IssuesEvent":
+            payload = {
+                "action": rng.choice(["opened", "closed"]),
+                "issue": {"title": rng.choice(PHRASES), "number": i},
+            }
+        elif event_type in ("IssueCommentEvent", "PullRequestReviewCommentEvent"):
+            payload = {"action": "created", "comment": {"body": rng.choice(PHRASES)}}
+        elif event_type == "PullRequestReviewEvent":
+            payload = {"action": "created", "review": {"state": "approved"}}
+        events.append(
+            {
+                "id": str(10**10 + i),
+                "type": event_type,
+                "actor": {"login": username},
+                "repo": {"name": repo},
+                "payload": payload,
+                "created_at": datetime.fromtimestamp(ts, timezone.utc).strftime(
+                    "%Y-%m-%dT%H:%M:%SZ"
+                ),
+            }
+        )
+    return events
+
+
+def github_languages(repo: str, seed: int = 42) -> dict:
+    rng = _rng(seed, "languages", repo)
+    return {
+        language: rng.randint(1_000, 500_000)
+        for language in rng.sample(LANGUAGES, rng.randint(1, 4))
+    }
+
+
+def github_commit(repo: str, sha: str, seed: int = 42) -> dict:
+    rng = _rng(seed, "commit", sha)
+    return {
+        "sha": sha,
+        "commit": {"message": rng.choice(PHRASES)},
+        "files": [
+            {
+                "filename": f"src/module_{rng.randint(1, 50)}.py",
+                "patch": "\n".join(
+                    f"+    value_{j} = compute({j})" for j in range(rng.randint(3, 40))
+                ),
+            }
+            for _ in range(rng.randint(1, 4))
+        ],
+    }
+
+
+def calendar_events(
+    count: int,
+    days: int = 90,
+    now: float | None = None,
+    seed: int = 42,
+    domain: str = "example.com",
+) -> list[dict]:
+    """Events as returned by events.list(singleEvents=True, orderBy=startTime)"""
+    rng = _rng(seed, "calendar")
+    now = now or datetime.now(timezone.utc).timestamp()
+    events = []
+    for i in range(count):
+        # Meetings start on the quarter hour, mostly in working hours (UTC)
+        day = datetime.fromtimestamp(_random_ts(rng, now, days), timezone.utc).date()
+        hour = min(max(int(rng.gauss(8, 3)), 0), 23)
+        start = datetime(day.year, day.month, day.day, hour, 15 * rng.randint(0, 3), tzinfo=timezone.utc)
+        end = start + timedelta(minutes=rng.choice([15, 25, 30, 45, 50, 60, 90]))
+        title = rng.choice(MEETING_TITLES)
+        attendees = [
+            {"email": f"person{rng.randint(1, 200)}@{domain if rng.random() < 0.85 else 'partner.com'}"}
+            for _ in range(1 if title == "1:1" else rng.randint(2, 12))
+        ]
+        event = {
+            "id": f"evt{i:08d}",
+            "status": "confirmed",
+            "summary": title,
+            "description": f"Agenda for {title.lower()}: " + " ".join(rng.sample(PHRASES, 3)),
+            "start": {"dateTime": start.isoformat().replace("+00:00", "Z")},
+            "end": {"dateTime": end.isoformat().replace("+00:00", "Z")},
+            "organizer": {"email": f"organizer@{domain}"},
+            "attendees": attendees,
+            "updated": start.isoformat().replace("+00:00", "Z"),
+        }
+        if title in ("Daily standup", "1:1", "Retro"):
+            event["recurringEventId"] = f"rec-{title.lower().replace(' ', '-')}"
+        events.append(event)
+    events.sort(key=lambda e: e["start"]["dateTime"])
+    return events
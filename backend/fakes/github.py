@@ -0,0 +1,83 @@
+import time
+import zlib
+from fastapi import FastAPI, Request, Response
+from .config import FakeConfig, Upstream
+from . import data
+
+# The real events API stops at 300 events (10 pages of 30)
+EVENTS_CAP = 300
+
+
+def create_app(config: FakeConfig | None = None) -> FastAPI:
+    """GitHub REST API stand-in for events, repositories, languages and commits"""
+    config = config or FakeConfig()
+    upstream = Upstream(config)
+    app = FastAPI(title="Fake GitHub API")
+    app.state.upstream = upstream
+
+    now = time.time()
+    repos = data.github_repos(config.github_repos, seed=config.seed)
+    events_cache = {}
+    rate_limited = {"message": "API rate limit exceeded"}
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        limited = await upstream.admit(rate_limited)
+        if limited is not None:
+            return limited
+        return await call_next(request)
+
+    @app.get("/user")
+    async def user():
+        return {"id": 1000001, "login": "fake-user", "name": "Fake User"}
+
+    @app.get("/user/orgs")
+    async def user_orgs():
+        # The owner of the stand-in repositories
+        return [{"id": 2000001, "login": repos[0].split("/")[0] if repos else "acme"}]
+
+    @app.get("/users/{username}/events")
+    async def user_events(
+        username: str, request: Request, response: Response, page: int = 1, per_page: int = 30
+    ):
+        if username not in events_cache:
+            events_cache[username] = data.github_events(
+                min(config.github_events, EVENTS_CAP),
+                username,
+                repos,
+                days=config.days,
+                now=now,
+                seed=config.seed,
+                api_url=str(request.base_url).rstrip("/"),
+            )
+        events = events_cache[username]
+        per_page = min(per_page, 100, config.github_page_size)
+        start = (page - 1) * per_page
+        if start + per_page < len(events):
+            next_url = request.url.include_query_params(page=page + 1, per_page=per_page)
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return events[start : start + per_page]
+
+    @app.get("/repos/{owner}/{repo}")
+    async def repository(owner: str, repo: str):
+        full_name = f"{owner}/{repo}"
+        return {
+            "full_name": full_name,
+            "name": repo,
+            "owner": {"login": owner},
+            "private": zlib.crc32(full_name.encode()) % 5 == 0,
+        }
+
+    @app.get("/repos/{owner}/{repo}/languages")
+    async def languages(owner: str, repo: str):
+        return data.github_languages(f"{owner}/{repo}", seed=config.seed)
+
+    @app.get("/repos/{owner}/{repo}/commits/{sha}")
+    async def commit(owner: str, repo: str, sha: str):
+        return data.github_commit(f"{owner}/{repo}", sha, seed=config.seed)
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": upstream.calls, "throttled": upstream.throttled}
+
+    return app
@@ -0,0 +1,116 @@
+"""Replays the stand-in GitHub user's events to a backend's /github/webhook
+as signed webhook deliveries, oldest first, the way repository hooks on the
+stand-in "acme" repositories would have sent them:
+
+    GITHUB_WEBHOOK_SECRET=... python -m fakes.github_webhooks --url http://localhost:8000
+
+Use the same FAKE_* settings as the running stand-ins so the replayed
+deliveries match what /users/{username}/events returns.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+from datetime import datetime
+import httpx
+from .config import FakeConfig
+from . import data
+
+# Events API type -> webhook event name; other types have no hook here
+WEBHOOK_EVENTS = {
+    "PushEvent": "push",
+    "PullRequestEvent": "pull_request",
+    "PullRequestReviewEvent": "pull_request_review",
+    "IssuesEvent": "issues",
+}
+
+
+def signed_headers(secret: str, event: str, delivery_id: str, body: bytes) -> dict:
+    """X-Hub-Signature-256 and the other delivery headers for body"""
+    return {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": event,
+        "X-GitHub-Delivery": delivery_id,
+        "X-Hub-Signature-256": "sha256="
+        + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest(),
+    }
+
+
+def deliveries(config: FakeConfig, username: str) -> list:
+    """(event, delivery id, payload) for each of the user's events a hook
+    would send, oldest first"""
+    events = data.github_events(
+        min(config.github_events, 300),
+        username,
+        data.github_repos(config.github_repos, seed=config.seed),
+        days=config.days,
+        seed=config.seed,
+    )
+    result = []
+    for event in reversed(events):
+        name = WEBHOOK_EVENTS.get(event["type"])
+        if name is None:
+            continue
+        owner, _ = event["repo"]["name"].split("/")
+        payload = {
+            "repository": {"full_name": event["repo"]["name"], "owner": {"login": owner}},
+            "sender": {"login": username},
+        }
+        at = event["created_at"]
+        if name == "push":
+            payload["commits"] = event["payload"]["commits"]
+            payload["repository"]["pushed_at"] = int(
+                datetime.fromisoformat(at.replace("Z", "+00:00")).timestamp()
+            )
+        elif name == "pull_request":
+            payload["action"] = event["payload"]["action"]
+            payload["pull_request"] = dict(event["payload"]["pull_request"], updated_at=at)
+        elif name == "issues":
+            payload["action"] = event["payload"]["action"]
+            payload["issue"] = dict(event["payload"]["issue"], updated_at=at)
+        else:
+            payload["action"] = "submitted"
+            payload["review"] = dict(event["payload"]["review"], submitted_at=at)
+        result.append((name, f"fake-{event['id']}", payload))
+    return result
+
+
+def replay(url: str, secret: str, items: list) -> dict:
+    """POST each delivery signed; returns {status code: count}"""
+    statuses = {}
+    with httpx.Client(base_url=url.rstrip("/"), timeout=10) as client:
+        for event, delivery_id, payload in items:
+            body = json.dumps(payload).encode()
+            response = client.post(
+                "/github/webhook",
+                content=body,
+                headers=signed_headers(secret, event, delivery_id, body),
+            )
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stand-in GitHub events as webhook deliveries")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--user", default="fake-user", help="GitHub login of the connected user")
+    parser.add_argument("--org", default="acme", help="Owner of the stand-in repositories")
+    parser.add_argument("--secret", default=os.getenv("GITHUB_WEBHOOK_SECRET"))
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("--secret or GITHUB_WEBHOOK_SECRET is required")
+
+    # Hooks ping when created, which starts the streams
+    pings = [
+        ("ping", f"fake-ping-{owner}", {"zen": "Keep it logically awesome.", "organization": {"login": owner}})
+        for owner in (args.org, args.user)
+    ]
+    print("ping:", replay(args.url, args.secret, pings))
+    items = deliveries(FakeConfig(), args.user)
+    print(f"Replaying {len(items)} deliveries...")
+    print("responses:", replay(args.url, args.secret, items))
+
+
+if __name__ == "__main__":
+    main()
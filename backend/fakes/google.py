@@ -0,0 +1,103 @@
+import time
+from datetime import datetime
+from fastapi import FastAPI, Request, Response
+from .config import FakeConfig, Upstream
+from . import data
+
+
+def _parse_time(value: str | None, default: float) -> float:
+    if not value:
+        return default
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def create_app(config: FakeConfig | None = None) -> FastAPI:
+    """Google Calendar v3 and OAuth stand-in"""
+    config = config or FakeConfig()
+    upstream = Upstream(config)
+    app = FastAPI(title="Fake Google APIs")
+    app.state.upstream = upstream
+
+    now = time.time()
+    events = data.calendar_events(
+        config.calendar_events, days=config.days, now=now, seed=config.seed
+    )
+    rate_limited = {
+        "error": {"code": 429, "message": "Rate Limit Exceeded", "status": "RESOURCE_EXHAUSTED"}
+    }
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        limited = await upstream.admit(rate_limited)
+        if limited is not None:
+            return limited
+        return await call_next(request)
+
+    @app.post("/token")
+    async def token():
+        return {
+            "access_token": "ya29.fake-access-token",
+            "expires_in": 3599,
+            "token_type": "Bearer",
+            "scope": "https://www.googleapis.com/auth/calendar.readonly",
+        }
+
+    @app.get("/oauth2/v2/userinfo")
+    async def userinfo():
+        return {"id": "100000001", "email": "fake.user@example.com", "verified_email": True}
+
+    @app.get("/calendar/v3/calendars/{calendar_id}/events")
+    async def list_events(
+        calendar_id: str,
+        timeMin: str | None = None,
+        timeMax: str | None = None,
+        maxResults: int = 250,
+        pageToken: str | None = None,
+        syncToken: str | None = None,
+    ):
+        if syncToken:
+            # The stand-in calendar never changes
+            return {"kind": "calendar#events", "items": [], "nextSyncToken": syncToken}
+        start = _parse_time(timeMin, 0)
+        end = _parse_time(timeMax, now + 86400 * 365)
+        in_range = [
+            e
+            for e in events
+            if start <= _parse_time(e["start"]["dateTime"], 0) < end
+        ]
+        page_size = min(maxResults, config.calendar_page_size)
+        offset = int(pageToken or 0)
+        result = {
+            "kind": "calendar#events",
+            "summary": calendar_id,
+            "timeZone": "UTC",
+            "items": in_range[offset : offset + page_size],
+        }
+        if offset + page_size < len(in_range):
+            result["nextPageToken"] = str(offset + page_size)
+        else:
+            result["nextSyncToken"] = f"sync-{int(now)}"
+        return result
+
+    @app.post("/calendar/v3/calendars/{calendar_id}/events/watch")
+    async def watch_events(calendar_id: str, request: Request):
+        channel = await request.json()
+        ttl = int(channel.get("params", {}).get("ttl", 604800))
+        return {
+            "kind": "api#channel",
+            "id": channel["id"],
+            "resourceId": f"fake-resource-{calendar_id}",
+            "resourceUri": f"{request.base_url}calendar/v3/calendars/{calendar_id}/events",
+            "token": channel.get("token"),
+            "expiration": str(int((time.time() + ttl) * 1000)),
+        }
+
+    @app.post("/calendar/v3/channels/stop")
+    async def stop_channel():
+        return Response(status_code=204)
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": upstream.calls, "throttled": upstream.throttled}
+
+    return app
@@ -0,0 +1,114 @@
+import json
+import time
+from fastapi import FastAPI, Request
+from .config import FakeConfig, Upstream
+
+SENTIMENT_REPLY = {
+    "overall_sentiment": "positive",
+    "tone_descriptors": ["collaborative", "focused", "friendly"],
+    "confidence_score": 0.8,
+}
+
+# One object carrying the keys of every structured analysis the backend asks
+# for, so any JSON-parsing call site finds what it needs
+ANALYSIS_REPLY = {
+    "risk_score": 0.4,
+    "productivity_score": 0.7,
+    "key_insights": ["Meetings cluster on Tuesdays", "Few after-hours events"],
+    "schedule_pattern": "Mostly mornings",
+    "time_management_insights": ["Protect afternoons for focus work"],
+    "recommendations": ["Batch 1:1s on one day"],
+    "schedule_insights": ["Back-to-back meetings on Mondays"],
+    "optimization_suggestions": ["Shorten recurring syncs to 25 minutes"],
+    "greeting": "Hi there! 👋",
+    "key_patterns": ["Communication Peak: 40% of messages around 11:00 AM"],
+    "working_well": ["Quick review turnaround"],
+    "opportunity_areas": ["Fewer late-evening messages"],
+    "weekly_goal": {"title": "Your goals for next week:", "steps": ["Log off by 6:00 PM"]},
+    "sign_off": "Your Work Diary is here to help you thrive! 🌟",
+    "commit_quality": {"score": "7", "strengths": ["Clear"], "improvements": ["Scope"]},
+    "code_quality": {"score": "7", "strengths": ["Tests"], "improvements": ["Docs"]},
+    "best_practices": {"followed": ["Small PRs"], "suggested": ["Linting"]},
+    "summary": "Solid, consistent contributions.",
+}
+
+
+def _reply_for(prompt: str) -> str:
+    if "sentiment" in prompt.lower() and "overall_sentiment" in prompt:
+        return json.dumps(SENTIMENT_REPLY)
+    return json.dumps(ANALYSIS_REPLY)
+
+
+def _prompt_text(messages: list) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts.extend(block.get("text", "") for block in content)
+        else:
+            parts.append(content or "")
+    return "\n".join(parts)
+
+
+def create_app(config: FakeConfig | None = None) -> FastAPI:
+    """Anthropic Messages and OpenAI Chat Completions stand-in"""
+    config = config or FakeConfig()
+    upstream = Upstream(config, latency_ms=config.llm_latency_ms)
+    app = FastAPI(title="Fake LLM APIs")
+    app.state.upstream = upstream
+
+    @app.post("/anthropic/v1/messages")
+    async def anthropic_messages(request: Request):
+        body = await request.json()
+        limited = await upstream.admit(
+            {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited"}}
+        )
+        if limited is not None:
+            return limited
+        prompt = _prompt_text(body.get("messages", [])) + (body.get("system") or "")
+        text = _reply_for(prompt)
+        return {
+            "id": f"msg_fake_{upstream.calls}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4},
+        }
+
+    @app.post("/openai/v1/chat/completions")
+    async def openai_chat_completions(request: Request):
+        body = await request.json()
+        limited = await upstream.admit(
+            {"error": {"type": "rate_limit_exceeded", "message": "Rate limited"}}
+        )
+        if limited is not None:
+            return limited
+        prompt = _prompt_text(body.get("messages", []))
+        text = _reply_for(prompt)
+        return {
+            "id": f"chatcmpl-fake-{upstream.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": (len(prompt) + len(text)) // 4,
+            },
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": upstream.calls, "throttled": upstream.throttled}
+
+    return app
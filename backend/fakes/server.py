@@ -0,0 +1,60 @@
+import argparse
+import uvicorn
+from fastapi import FastAPI
+from .config import FakeConfig
+from . import github, google, llm, slack
+
+
+def create_app(config: FakeConfig | None = None) -> FastAPI:
+    """All stand-ins behind one ASGI app, split by path prefix"""
+    config = config or FakeConfig()
+    app = FastAPI(title="Work Diary upstream stand-ins")
+    apps = {
+        "slack": slack.create_app(config),
+        "github": github.create_app(config),
+        "google": google.create_app(config),
+        "llm": llm.create_app(config),
+    }
+
+    @app.get("/_stats")
+    async def stats():
+        return {
+            name: {"calls": sub.state.upstream.calls, "throttled": sub.state.upstream.throttled}
+            for name, sub in apps.items()
+        }
+
+    app.mount("/slack", apps["slack"])
+    app.mount("/github", apps["github"])
+    app.mount("/google", apps["google"])
+    # The LLM app serves /anthropic/... and /openai/... itself
+    app.mount("/", apps["llm"])
+    return app
+
+
+def env_for(base_url: str) -> dict:
+    """Backend environment variables pointing every upstream at base_url"""
+    base_url = base_url.rstrip("/")
+    return {
+        "SLACK_API_URL": f"{base_url}/slack/api/",
+        "GITHUB_API_URL": f"{base_url}/github",
+        "GOOGLE_CALENDAR_API_URL": f"{base_url}/google/calendar/v3/",
+        "GOOGLE_TOKEN_URI": f"{base_url}/google/token",
+        "GOOGLE_USERINFO_URL": f"{base_url}/google/oauth2/v2/userinfo",
+        "ANTHROPIC_BASE_URL": f"{base_url}/anthropic",
+        "OPENAI_BASE_URL": f"{base_url}/openai/v1",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the upstream stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    for key, value in env_for(f"http://{args.host}:{args.port}").items():
+        print(f"{key}={value}")
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
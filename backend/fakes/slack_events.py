@@ -0,0 +1,114 @@
+"""Replays the stand-in workspace's Slack history to a backend's /slack/events
+as signed Events API callbacks, oldest first, the way Slack would have
+pushed them:
+
+    SLACK_SIGNING_SECRET=... python -m fakes.slack_events --url http://localhost:8000
+
+Use the same FAKE_* settings as the running stand-ins so the replayed events
+match what conversations.history would return.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+import httpx
+from .config import FakeConfig
+from . import data
+
+
+def signed_headers(secret: str, body: bytes, timestamp: int | None = None) -> dict:
+    """X-Slack-Signature and timestamp headers for body"""
+    timestamp = str(int(timestamp or time.time()))
+    base = b"v0:" + timestamp.encode() + b":" + body
+    signature = "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+    return {
+        "Content-Type": "application/json",
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": signature,
+    }
+
+
+def channel_type(channel: dict) -> str:
+    if channel["is_im"]:
+        return "im"
+    if channel["is_mpim"]:
+        return "mpim"
+    return "group" if channel["is_private"] else "channel"
+
+
+def message_events(config: FakeConfig, team_id: str, now: float | None = None) -> list:
+    """event_callback payloads for every message and thread reply of the
+    stand-in workspace, oldest first"""
+    now = now or time.time()
+    payloads = []
+    for channel in data.slack_channels(config.slack_channels, config.seed):
+        messages, replies = data.slack_messages(
+            channel["id"],
+            config.slack_messages_per_channel,
+            config.slack_user_id,
+            days=config.days,
+            now=now,
+            seed=config.seed,
+            thread_ratio=config.slack_thread_ratio,
+            own_ratio=config.slack_own_ratio,
+        )
+        # Thread parents are in both; the replies lists hold them first
+        thread_replies = [reply for thread in replies.values() for reply in thread[1:]]
+        for message in messages + thread_replies:
+            event = {
+                "type": "message",
+                "channel": channel["id"],
+                "channel_type": channel_type(channel),
+                "user": message["user"],
+                "text": message["text"],
+                "ts": message["ts"],
+                "event_ts": message["ts"],
+            }
+            # As on Slack, a parent is sent before its replies exist, so
+            # without thread_ts; only the replies point at it
+            if message.get("thread_ts", message["ts"]) != message["ts"]:
+                event["thread_ts"] = message["thread_ts"]
+            payloads.append(
+                {
+                    "type": "event_callback",
+                    "team_id": team_id,
+                    "event_id": f"Ev{channel['id']}{message['ts'].replace('.', '')}",
+                    "event_time": int(float(message["ts"])),
+                    "event": event,
+                }
+            )
+    payloads.sort(key=lambda payload: float(payload["event"]["ts"]))
+    return payloads
+
+
+def replay(url: str, secret: str, payloads: list) -> dict:
+    """POST each payload signed; returns {status code: count}"""
+    statuses = {}
+    with httpx.Client(base_url=url.rstrip("/"), timeout=10) as client:
+        for payload in payloads:
+            body = json.dumps(payload).encode()
+            response = client.post("/slack/events", content=body, headers=signed_headers(secret, body))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stand-in Slack history as Events API callbacks")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--team", default="T00000001", help="Team id of the connected users")
+    parser.add_argument("--secret", default=os.getenv("SLACK_SIGNING_SECRET"))
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("--secret or SLACK_SIGNING_SECRET is required")
+
+    challenge = {"type": "url_verification", "challenge": "fake-challenge"}
+    print("url_verification:", replay(args.url, args.secret, [challenge]))
+    payloads = message_events(FakeConfig(), args.team)
+    print(f"Replaying {len(payloads)} events...")
+    print("responses:", replay(args.url, args.secret, payloads))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""End-to-end load test for one app worker.
+
+Starts the upstream stand-ins (fakes.server) and a single app.main worker
+with an event-loop lag probe (loadtest.worker), signs up synthetic users
+against a local Postgres and replays weighted dashboard traffic:
+
+    DB=postgresql://localhost/workdiary python -m loadtest.run --users 50 --duration 120
+
+Prints throughput, p50/p95/p99 latency, error rates and the event-loop lag
+seen while each route was in flight. Synthetic users (loadtest-N@example.com)
+are removed afterwards unless --keep-users is given.
+"""
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import time
+import uvicorn
+from app.main import app
+
+# Interval between event-loop lag probes, in seconds
+PROBE_INTERVAL = 0.05
+
+lag_samples = []
+
+
+async def probe_event_loop_lag():
+    """Record (wall time, lag) whenever the loop wakes us later than asked"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lag = max(0.0, loop.time() - expected)
+        lag_samples.append((time.time(), lag))
+
+
+@app.on_event("startup")
+async def start_lag_probe():
+    app.state.lag_probe = asyncio.create_task(probe_event_loop_lag())
+
+
+@app.get("/_loadtest/lag", include_in_schema=False)
+async def get_lag_samples(since: float = 0.0):
+    return [sample for sample in lag_samples if sample[0] >= since]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one app worker with a lag probe")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+from cryptography.fernet import Fernet
+
+# app.security reads the key at import; services that decrypt tokens import it
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
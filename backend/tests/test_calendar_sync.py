@@ -0,0 +1,34 @@
+import asyncio
+from app.services import calendar_sync
+
+
+class FakeDB:
+    """calendar_channels with one channel, ch1 of user 1"""
+
+    async def fetchrow(self, query, *args):
+        if args[0] == "ch1":
+            return {"user_id": 1, "token": "channel-token"}
+        return None
+
+
+def notify(channel_id, token, resource_state="exists"):
+    return asyncio.run(
+        calendar_sync.handle_notification(FakeDB(), channel_id, token, resource_state)
+    )
+
+
+def test_notifications_need_the_channel_token(monkeypatch):
+    synced = []
+    monkeypatch.setattr(calendar_sync, "request_sync", synced.append)
+
+    assert notify("ch1", "wrong") == "invalid"
+    assert notify("ch1", None) == "invalid"
+    assert notify("ch1", "") == "invalid"
+    # Replaced channels keep notifying until they are stopped
+    assert notify("ch0", "channel-token") == "ignored"
+    assert synced == []
+
+    assert notify("ch1", "channel-token", "sync") == "sync"
+    assert synced == []
+    assert notify("ch1", "channel-token") == "changed"
+    assert synced == [1]
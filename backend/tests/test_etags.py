@@ -0,0 +1,70 @@
+import asyncio
+from fastapi import Response
+from starlette.requests import Request
+from app import etags
+from app.services.timebuckets import work_schedule
+
+
+class FakeDB:
+    """activity_versions of one user and source"""
+
+    def __init__(self):
+        self.version = None
+
+    async def execute(self, query, *args):
+        self.version = (self.version or 0) + 1
+
+    async def fetchval(self, query, *args):
+        return self.version
+
+
+def request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_weak_comparison():
+    etag = 'W/"abc"'
+    assert etags._matches('W/"abc"', etag)
+    assert etags._matches('"abc"', etag)
+    assert etags._matches('W/"old", W/"abc"', etag)
+    assert etags._matches("*", etag)
+    assert not etags._matches('W/"old"', etag)
+    assert not etags._matches('W/"abcd"', etag)
+
+
+def test_conditional_response():
+    etag = 'W/"abc"'
+    response = Response()
+    assert etags.conditional_response(request(), response, etag, "test") is None
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"].startswith("private, max-age=")
+
+    not_modified = etags.conditional_response(request('W/"abc"'), Response(), etag, "test")
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert etags.conditional_response(request('W/"old"'), Response(), etag, "test") is None
+
+
+def test_payload_response_hashes_the_body():
+    first = etags.payload_response(request(), {"total": 1}, "test")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etags.payload_response(request(etag), {"total": 1}, "test").status_code == 304
+    assert etags.payload_response(request(etag), {"total": 2}, "test").status_code == 200
+
+
+def test_version_bumps_change_the_activity_etag():
+    db, schedule = FakeDB(), work_schedule("Europe/Berlin")
+
+    def etag(**params):
+        return asyncio.run(etags.activity_etag(db, 1, "slack", 7, schedule, **params))
+
+    before = etag()
+    assert etag() == before
+    asyncio.run(etags.bump_activity_version(db, 1, "slack"))
+    after = etag()
+    assert after != before
+    assert etag(slack_user_id="U2") != after
+    assert asyncio.run(etags.activity_etag(db, 1, "github", 7, schedule)) != after
+    assert asyncio.run(etags.activity_etag(db, 1, "slack", 30, schedule)) != after
@@ -0,0 +1,26 @@
+import hashlib
+import hmac
+from app.services import github_events
+
+SECRET = "github-webhook-secret"
+
+
+def signature(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_signature_verification(monkeypatch):
+    monkeypatch.setattr(github_events, "GITHUB_WEBHOOK_SECRET", SECRET)
+    body = b'{"zen": "Keep it logically awesome."}'
+    assert github_events.verify_signature(body, signature(body))
+    assert not github_events.verify_signature(body + b" ", signature(body))
+    assert not github_events.verify_signature(body, signature(body, "other"))
+    # The SHA-1 X-Hub-Signature format is not accepted in place of SHA-256
+    sha1 = "sha1=" + hmac.new(SECRET.encode(), body, hashlib.sha1).hexdigest()
+    assert not github_events.verify_signature(body, sha1)
+    assert not github_events.verify_signature(body, None)
+
+
+def test_signature_verification_needs_a_secret(monkeypatch):
+    monkeypatch.setattr(github_events, "GITHUB_WEBHOOK_SECRET", None)
+    assert not github_events.verify_signature(b"{}", signature(b"{}"))
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from app import llm
+
+
+def fake_call(behaviour: dict, calls: list):
+    """_call answering per model: (seconds, text) or an exception to raise"""
+
+    async def call(provider, model, prompt_text, system, max_tokens, temperature, json_mode):
+        calls.append(model)
+        outcome = behaviour[model]
+        if isinstance(outcome, Exception):
+            raise outcome
+        seconds, text = outcome
+        await asyncio.sleep(seconds)
+        return llm.LLMResult(text, provider, model, 10, 5, seconds)
+
+    return call
+
+
+def complete(monkeypatch, behaviour: dict, deadline: float = 5.0):
+    calls = []
+    monkeypatch.setenv("LLM_MODELS_BALANCED", ",".join(f"test:{model}" for model in behaviour))
+    monkeypatch.setattr(llm, "_call", fake_call(behaviour, calls))
+    monkeypatch.setattr(llm, "DEFAULT_HEDGE_AFTER", 0.05)
+    result = asyncio.run(llm.complete("sentiment", "prompt", deadline=deadline))
+    return result, calls
+
+
+def test_failures_fall_back_to_the_next_model(monkeypatch):
+    result, calls = complete(
+        monkeypatch, {"fallback-a": RuntimeError("overloaded"), "fallback-b": (0, "ok")}
+    )
+    assert result.model == "fallback-b"
+    assert calls == ["fallback-a", "fallback-b"]
+
+
+def test_slow_primary_is_hedged(monkeypatch):
+    result, calls = complete(monkeypatch, {"hedge-a": (2, "late"), "hedge-b": (0, "fast")})
+    assert result.text == "fast"
+    assert calls == ["hedge-a", "hedge-b"]
+
+
+def test_primary_answering_in_time_is_not_hedged(monkeypatch):
+    result, calls = complete(monkeypatch, {"quick-a": (0, "ok"), "quick-b": (0, "unused")})
+    assert result.model == "quick-a"
+    assert calls == ["quick-a"]
+
+
+def test_all_models_failing(monkeypatch):
+    with pytest.raises(llm.LLMError, match="All models failed"):
+        complete(monkeypatch, {"fail-a": RuntimeError("a"), "fail-b": RuntimeError("b")})
+
+
+def test_deadline(monkeypatch):
+    with pytest.raises(llm.LLMError, match="deadline"):
+        complete(monkeypatch, {"slow-a": (2, "a"), "slow-b": (2, "b")}, deadline=0.2)
+
+
+@pytest.mark.parametrize("text", [None, "", "no json here"])
+def test_parse_json_rejects_missing_or_malformed_output(text):
+    with pytest.raises(ValueError):
+        llm.parse_json(text)
+
+
+def test_parse_json_tolerates_fences_and_prose():
+    assert llm.parse_json('Sure:\n```json\n{"score": 1}\n```') == {"score": 1}
@@ -0,0 +1,65 @@
+from app.records import MessageRecords
+from app.services.responses import find_responses
+
+USER = "UME"
+
+
+def message(ts: float, user: str, text: str = "", thread_ts: float | None = None) -> dict:
+    msg = {"type": "message", "ts": f"{ts:.6f}", "user": user, "text": text}
+    if thread_ts is not None:
+        msg["thread_ts"] = f"{thread_ts:.6f}"
+    return msg
+
+
+def responses(history: list, replies: dict | None = None, conv: dict | None = None) -> dict:
+    records = MessageRecords(USER)
+    # Newest first, as conversations.history returns them
+    records.add_conversation(conv or {"id": "C1", "name": "general"}, history[::-1], replies)
+    return {name: column.tolist() for name, column in find_responses(records).items()}
+
+
+def test_thread_parent_is_answered_once():
+    parent = message(1000, "UA", f"<@{USER}> can you look?", thread_ts=1000)
+    history = [
+        message(100, "UA", f"<@{USER}> hi"),
+        message(200, USER, "hey"),
+        parent,
+        message(1300, USER, "unrelated"),
+    ]
+    thread = [parent, message(1100, USER, "on it", thread_ts=1000)]
+
+    result = responses(history, {parent["ts"]: thread})
+
+    assert result["received"] == [100.0, 1000.0]
+    assert result["thread"] == [False, True]
+
+
+def test_direct_messages_and_thread_participation():
+    dm = {"id": "D1", "is_im": True}
+    result = responses(
+        [message(100, "UA", "ping"), message(160, "UA", "again"), message(400, USER, "pong")],
+        conv=dm,
+    )
+    # The earliest unanswered message counts
+    assert result["received"] == [100.0]
+    assert result["minutes"] == [5.0]
+    assert result["direct"] == [True]
+
+    parent = message(1000, "UA", "question", thread_ts=1000)
+    thread = [
+        parent,
+        message(1060, "UB", "before the user joined", thread_ts=1000),
+        message(1120, USER, "first reply", thread_ts=1000),
+        message(1180, "UB", "after", thread_ts=1000),
+        message(1300, USER, "second reply", thread_ts=1000),
+    ]
+    result = responses([parent], {parent["ts"]: thread})
+    assert result["received"] == [1180.0]
+    assert result["minutes"] == [2.0]
+
+
+def test_replies_after_a_day_do_not_count():
+    result = responses(
+        [message(0, "UA", f"<@{USER}> hi"), message(86401, USER, "sorry, late")]
+    )
+    assert result["received"] == []
@@ -0,0 +1,41 @@
+import numpy as np
+from app.sketches import TDigest
+
+QUANTILES = [0.01, 0.1, 0.5, 0.9, 0.99, 0.999]
+
+
+def rank_errors(digest: TDigest, values: np.ndarray) -> np.ndarray:
+    """How far, in rank, each estimated quantile is from the true one"""
+    ordered = np.sort(values)
+    estimates = digest.quantile(QUANTILES)
+    return np.abs(np.searchsorted(ordered, estimates) / len(ordered) - QUANTILES)
+
+
+def test_merged_digests_stay_accurate():
+    values = np.random.default_rng(7).lognormal(3, 1, 100_000)
+    parts = [TDigest.of(part) for part in np.array_split(values, 40)]
+
+    merged = TDigest.merged(parts)
+    assert merged.count == len(values)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+    assert len(merged) <= merged.compression
+    assert rank_errors(merged, values).max() < 0.002
+
+    # Stored digests merged straight from their bytes agree
+    from_bytes = TDigest.merged_bytes(part.to_bytes() for part in parts)
+    np.testing.assert_allclose(from_bytes.quantile(QUANTILES), merged.quantile(QUANTILES))
+
+
+def test_small_samples_are_exact():
+    values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0]
+    digest = TDigest.of(values)
+    np.testing.assert_allclose(digest.quantile(QUANTILES), np.quantile(values, QUANTILES))
+    assert digest.mean() == np.mean(values)
+
+
+def test_serialization_round_trip():
+    digest = TDigest.of(np.arange(1000.0))
+    restored = TDigest.from_bytes(digest.to_bytes())
+    np.testing.assert_array_equal(restored.means, digest.means)
+    np.testing.assert_array_equal(restored.weights, digest.weights)
+    assert (restored.min, restored.max) == (0.0, 999.0)
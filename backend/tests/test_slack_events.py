@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from app.services import slack_events
+
+SECRET = "slack-signing-secret"
+
+
+class FakeDB:
+    """The activity_ingest rows and activity_versions bumps ingest_event
+    touches, for one connected user U1 (users.id 1)"""
+
+    def __init__(self):
+        self.rows = {}
+        self.bumps = []
+
+    async def execute(self, query, *args):
+        if "activity_versions" in query:
+            self.bumps.append(args[0])
+
+    async def fetch(self, query, *args):
+        if "FROM users" in query:
+            return [{"id": 1, "slack_user_id": "U1"}] if "U1" in args[1] else []
+        key = (args[1], args[2])
+        if query.strip().startswith("DELETE"):
+            row = self.rows.pop(key, None)
+            return [row] if row else []
+        if query.strip().startswith("UPDATE") and key in self.rows:
+            self.rows[key]["text"] = args[3]
+            return [self.rows[key]]
+        return []
+
+    async def fetchval(self, query, *args):
+        # The INSERT: args are team, event id, type, subtype, channel,
+        # channel type, actor, ts, thread_ts, text, time
+        key = (args[4], args[7])
+        if key in self.rows:
+            return None
+        self.rows[key] = {"actor": args[6], "text": args[9]}
+        return len(self.rows)
+
+
+def ingest(db, event, event_id="Ev1"):
+    payload = {"type": "event_callback", "team_id": "T1", "event_id": event_id, "event": event}
+    return asyncio.run(slack_events.ingest_event(db, payload))
+
+
+def test_edits_and_deletions_invalidate_the_author():
+    db = FakeDB()
+    message = {"type": "message", "channel": "C1", "user": "U1", "text": "hi", "ts": "100.000001"}
+    assert ingest(db, message) == "message"
+    assert ingest(db, message) == "duplicate"
+    assert db.bumps == [1]
+
+    edit = {
+        "type": "message",
+        "subtype": "message_changed",
+        "channel": "C1",
+        "message": {"ts": "100.000001", "text": "hello"},
+        "previous_message": {"ts": "100.000001", "text": "hi"},
+    }
+    assert ingest(db, edit, "Ev2") == "edited"
+    assert db.bumps == [1, 1]
+
+    deletion = {"type": "message", "subtype": "message_deleted", "channel": "C1", "deleted_ts": "100.000001"}
+    assert ingest(db, deletion, "Ev3") == "deleted"
+    assert db.bumps == [1, 1, 1]
+    assert ingest(db, deletion, "Ev4") == "deleted"
+    assert db.bumps == [1, 1, 1]
+
+
+def test_mentions_invalidate_the_mentioned_user():
+    db = FakeDB()
+    message = {"type": "message", "channel": "C1", "user": "U9", "text": "<@U1> ?", "ts": "100.000001"}
+    ingest(db, message)
+    assert db.bumps == [1]
+    deletion = {"type": "message", "subtype": "message_deleted", "channel": "C1", "deleted_ts": "100.000001"}
+    ingest(db, deletion, "Ev2")
+    assert db.bumps == [1, 1]
+
+
+def signature(body: bytes, timestamp: str, secret: str = SECRET) -> str:
+    base = b"v0:" + timestamp.encode() + b":" + body
+    return "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+
+
+def test_signature_verification(monkeypatch):
+    monkeypatch.setattr(slack_events, "SLACK_SIGNING_SECRET", SECRET)
+    body = b'{"type": "event_callback"}'
+    now = str(int(time.time()))
+    assert slack_events.verify_signature(body, now, signature(body, now))
+    assert not slack_events.verify_signature(body + b" ", now, signature(body, now))
+    assert not slack_events.verify_signature(body, now, signature(body, now, "other"))
+    assert not slack_events.verify_signature(body, now, None)
+
+    # Replays older than five minutes are rejected even when signed
+    stale = str(int(time.time()) - 600)
+    assert not slack_events.verify_signature(body, stale, signature(body, stale))
+
+
+def test_signature_verification_needs_a_secret(monkeypatch):
+    monkeypatch.setattr(slack_events, "SLACK_SIGNING_SECRET", None)
+    now = str(int(time.time()))
+    assert not slack_events.verify_signature(b"{}", now, signature(b"{}", now))
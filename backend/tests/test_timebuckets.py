@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+import numpy as np
+from app.services.timebuckets import bucket_times, work_schedule
+
+
+def utc(*fields) -> float:
+    return datetime(*fields, tzinfo=timezone.utc).timestamp()
+
+
+def test_dst_transitions():
+    schedule = work_schedule("America/New_York")
+    buckets = bucket_times(
+        [
+            utc(2024, 3, 10, 6, 30),  # 01:30 EST
+            utc(2024, 3, 10, 7, 30),  # 03:30 EDT, an hour later
+            utc(2024, 11, 3, 5, 30),  # 01:30 EDT
+            utc(2024, 11, 3, 6, 30),  # 01:30 EST, the repeated hour
+            utc(2024, 11, 3, 4, 30),  # 00:30 EDT
+            utc(2024, 3, 10, 4, 30),  # 23:30 EST, still March 9th
+        ],
+        schedule,
+    )
+    assert buckets["hour"].tolist() == [1, 3, 1, 1, 0, 23]
+    days = buckets["day"]
+    assert days[0] == days[1] and days[2] == days[3] == days[4]
+    assert days[5] == days[0] - 1
+    assert buckets["weekday"].tolist() == [6, 6, 6, 6, 6, 5]
+
+
+def test_buckets_match_zoneinfo():
+    schedule = work_schedule("Europe/London", 9, 17)
+    zone = schedule["timezone"]
+    timestamps = np.random.default_rng(3).uniform(utc(2023, 1, 1), utc(2025, 1, 1), 2000)
+    buckets = bucket_times(timestamps, schedule)
+
+    local = [datetime.fromtimestamp(ts, zone) for ts in timestamps]
+    epoch = datetime(1970, 1, 1).date()
+    assert buckets["hour"].tolist() == [dt.hour for dt in local]
+    assert buckets["weekday"].tolist() == [dt.weekday() for dt in local]
+    assert buckets["day"].tolist() == [(dt.date() - epoch).days for dt in local]
+    assert buckets["work_hours"].tolist() == [9 <= dt.hour < 17 for dt in local]
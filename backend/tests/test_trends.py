@@ -0,0 +1,22 @@
+import numpy as np
+from app.services.trends import lttb
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(1000.0)
+    y = np.sin(x / 50)
+    y[437] = 10.0
+    y[812] = -10.0
+
+    picked = lttb(x, y, 50)
+    assert len(picked) == 50
+    assert picked[0] == 0 and picked[-1] == 999
+    assert np.all(np.diff(picked) > 0)
+    assert 437 in picked and 812 in picked
+
+
+def test_lttb_leaves_short_series_alone():
+    x = np.arange(10.0)
+    assert lttb(x, x, 10).tolist() == list(range(10))
+    assert lttb(x, x, 20).tolist() == list(range(10))
+    assert lttb(x, x, 2).tolist() == list(range(10))
@@ -1,4 +1,15 @@
--- Drop existing tables first
+-- Drop existing views and tables first
+DROP MATERIALIZED VIEW IF EXISTS member_stats;
+DROP TABLE IF EXISTS slack_directory;
+DROP TABLE IF EXISTS calendar_events;
+DROP TABLE IF EXISTS calendar_channels;
+DROP TABLE IF EXISTS activity_ingest;
+DROP TABLE IF EXISTS ingest_streams;
+DROP TABLE IF EXISTS ingest_channels;
+DROP TABLE IF EXISTS github_event_owners;
+DROP TABLE IF EXISTS activity_sketches;
+DROP TABLE IF EXISTS activity_rollups;
+DROP TABLE IF EXISTS activity_versions;
 DROP TABLE IF EXISTS burnout_scores;
 DROP TABLE IF EXISTS activity_logs;
 DROP TABLE IF EXISTS slack_activity;
@@ -26,7 +37,11 @@ CREATE TABLE IF NOT EXISTS users (
     -- Google Calendar fields
     google_refresh_token BYTEA,  -- Encrypted Google refresh token
     google_calendar_connected BOOLEAN DEFAULT FALSE,
-    google_calendar_id TEXT      -- Primary calendar ID
+    google_calendar_id TEXT,     -- Primary calendar ID
+    -- Activity bucketing; NULL falls back to the server defaults
+    timezone TEXT,               -- IANA name, e.g. 'Asia/Kolkata'
+    work_start_hour SMALLINT CHECK (work_start_hour BETWEEN 0 AND 23),
+    work_end_hour SMALLINT CHECK (work_end_hour BETWEEN 1 AND 24)
 );
 
 -- Slack OAuth States
@@ -47,13 +62,18 @@ CREATE TABLE IF NOT EXISTS activity_logs (
     timestamp TIMESTAMP DEFAULT NOW()
 );
 
--- Burnout Risk Scores
+-- Burnout Risk Scores: one row each time an analysis changes a user's
+-- score inputs; components holds the raw inputs per component name
 CREATE TABLE IF NOT EXISTS burnout_scores (
     id SERIAL PRIMARY KEY,
     user_id INTEGER REFERENCES users(id),
     risk_score FLOAT CHECK (risk_score BETWEEN 0 AND 1),
+    components JSONB NOT NULL DEFAULT '{}',
+    inputs_hash TEXT,            -- sha256 of the rounded components
     generated_at TIMESTAMP DEFAULT NOW()
 );
+CREATE INDEX IF NOT EXISTS burnout_scores_user_time
+    ON burnout_scores (user_id, generated_at DESC);
 
 -- Slack Activity Metrics
 CREATE TABLE IF NOT EXISTS slack_activity (
@@ -63,4 +83,183 @@ CREATE TABLE IF NOT EXISTS slack_activity (
     reaction_time_avg FLOAT,  -- Seconds between message and reaction
     after_hours_messages INTEGER,
     timestamp TIMESTAMP DEFAULT NOW()
-);
\ No newline at end of file
+);
+
+-- Activity Versions: bumped whenever a user's data for a source changes
+-- (connect, disconnect, ingested events); the activity endpoints derive
+-- their ETags from it
+CREATE TABLE IF NOT EXISTS activity_versions (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    source VARCHAR(20) NOT NULL,  -- 'slack', 'github', 'calendar'
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, source)
+);
+
+-- Activity Rollups: daily values per metric ('slack.messages',
+-- 'calendar.meetings', 'github.events', ...) upserted by the analyses; the
+-- trend endpoint aggregates them by day, week or month
+CREATE TABLE IF NOT EXISTS activity_rollups (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    day DATE NOT NULL,           -- in the user's timezone
+    value DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, metric, day)
+);
+
+-- Activity Sketches: one t-digest per user, metric ('slack.response_minutes',
+-- 'slack.thread_length', 'calendar.meeting_minutes') and day, written by the
+-- analyses. Quantiles over any range, or across a team, merge the stored
+-- digests (app/sketches.py has the byte format).
+CREATE TABLE IF NOT EXISTS activity_sketches (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    day DATE NOT NULL,           -- in the user's timezone
+    digest BYTEA NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, metric, day)
+);
+
+-- Member Stats: one row per active user in a Slack team or GitHub org with
+-- their latest burnout components and recent rollups. Team and org views
+-- aggregate it instead of fanning out to every member's upstream data. The
+-- backend refreshes it CONCURRENTLY (hence the unique index) once stale.
+CREATE MATERIALIZED VIEW IF NOT EXISTS member_stats AS
+WITH latest AS (
+    SELECT DISTINCT ON (user_id) user_id, risk_score, components
+    FROM burnout_scores
+    ORDER BY user_id, generated_at DESC
+), recent AS (
+    SELECT
+        user_id,
+        avg(value) FILTER (WHERE metric = 'slack.messages') AS messages_per_day,
+        sum(value) FILTER (WHERE metric = 'github.reviews') * 7
+            / NULLIF(count(*) FILTER (WHERE metric = 'github.reviews'), 0) AS reviews_per_week
+    FROM activity_rollups
+    WHERE day > CURRENT_DATE - 28
+    GROUP BY user_id
+)
+SELECT
+    u.id AS user_id,
+    u.slack_team_id,
+    u.github_org_name,
+    latest.risk_score,
+    (latest.components ->> 'slack.after_hours_ratio')::float8 AS after_hours_ratio,
+    (latest.components ->> 'slack.weekend_ratio')::float8 AS weekend_ratio,
+    (latest.components ->> 'calendar.meeting_hours_per_day')::float8 AS meeting_hours_per_day,
+    (latest.components ->> 'calendar.back_to_back_ratio')::float8 AS back_to_back_ratio,
+    recent.messages_per_day,
+    recent.reviews_per_week,
+    (latest.components ->> 'github.commits_per_day')::float8 AS commits_per_day,
+    NOW() AS refreshed_at
+FROM users u
+LEFT JOIN latest ON latest.user_id = u.id
+LEFT JOIN recent ON recent.user_id = u.id
+WHERE u.disabled IS NOT TRUE
+    AND (u.slack_team_id IS NOT NULL OR u.github_org_name IS NOT NULL);
+
+CREATE UNIQUE INDEX IF NOT EXISTS member_stats_user ON member_stats (user_id);
+CREATE INDEX IF NOT EXISTS member_stats_slack_team ON member_stats (slack_team_id);
+CREATE INDEX IF NOT EXISTS member_stats_github_org ON member_stats (github_org_name);
+
+-- Activity Ingest: events pushed by upstream webhooks (Slack Events API,
+-- GitHub webhooks), one row per event. workspace is the Slack team id or the
+-- GitHub account owning the repository; actor the upstream user id or login.
+-- For Slack messages thread_ts is the thread, for reactions the message
+-- reacted to, and ts keeps Slack's fixed-width string form. GitHub rows use
+-- the Events API type names, channel for the repository and payload for the
+-- Events API payload fields the aggregations read.
+CREATE TABLE IF NOT EXISTS activity_ingest (
+    id BIGSERIAL PRIMARY KEY,
+    source VARCHAR(20) NOT NULL,    -- 'slack', 'github'
+    workspace TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    event_type VARCHAR(50) NOT NULL,
+    subtype VARCHAR(50),
+    channel TEXT,
+    channel_type VARCHAR(20),
+    actor TEXT,
+    ts TEXT,
+    thread_ts TEXT,
+    text TEXT,
+    payload JSONB,
+    occurred_at TIMESTAMP,
+    received_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE (source, event_id)
+);
+CREATE INDEX IF NOT EXISTS activity_ingest_channel_ts
+    ON activity_ingest (source, workspace, channel, ts);
+CREATE INDEX IF NOT EXISTS activity_ingest_actor_time
+    ON activity_ingest (source, lower(actor), occurred_at);
+
+-- Ingest Streams: since when a workspace's events have been arriving without
+-- a gap; reads older than streaming_since still go to the upstream API
+CREATE TABLE IF NOT EXISTS ingest_streams (
+    source VARCHAR(20) NOT NULL,
+    workspace TEXT NOT NULL,
+    streaming_since TIMESTAMP DEFAULT NOW(),
+    last_event_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (source, workspace)
+);
+
+-- Ingest Channels: since when each Slack channel's events have been arriving.
+-- Slack only delivers events of channels the app or an authorizing user is
+-- in, so a channel counts as covered from its first event on and any other
+-- channel is still read from conversations.history
+CREATE TABLE IF NOT EXISTS ingest_channels (
+    source VARCHAR(20) NOT NULL,
+    workspace TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    streaming_since TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (source, workspace, channel)
+);
+
+-- GitHub Event Owners: the repository owners in each user's last poll of
+-- /users/{username}/events. While hooks cover all of them, GitHub activity
+-- is revalidated against activity_versions without polling.
+CREATE TABLE IF NOT EXISTS github_event_owners (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    owners TEXT[] NOT NULL,
+    polled_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Calendar Channels: the Google Calendar events.watch channel of each user's
+-- primary calendar and the syncToken of the mirror below. A channel is
+-- replaced before it expires; notifications for any other channel id are
+-- ignored.
+CREATE TABLE IF NOT EXISTS calendar_channels (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    channel_id TEXT UNIQUE NOT NULL,
+    resource_id TEXT,
+    token TEXT NOT NULL,        -- echoed in X-Goog-Channel-Token
+    expires_at TIMESTAMP NOT NULL,
+    sync_token TEXT,            -- NULL until the first full sync finished
+    mirrored_until TIMESTAMP,   -- end of the last full sync's listing
+    synced_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Calendar Events: mirror of each watched primary calendar (single events,
+-- recurring ones expanded), kept current by syncToken delta fetches
+CREATE TABLE IF NOT EXISTS calendar_events (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    event_id TEXT NOT NULL,
+    start_at TIMESTAMP NOT NULL,
+    end_at TIMESTAMP NOT NULL,
+    event JSONB NOT NULL,       -- as events.list returns it
+    PRIMARY KEY (user_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS calendar_events_user_start
+    ON calendar_events (user_id, start_at);
+
+-- Slack Directory: each Slack user's conversations (id, type flags, name) and
+-- profile as last listed, reused until SLACK_DIRECTORY_TTL or until a
+-- member_joined_channel / member_left_channel / user_change event
+CREATE TABLE IF NOT EXISTS slack_directory (
+    slack_user_id TEXT PRIMARY KEY,
+    conversations JSONB,
+    conversations_fetched_at TIMESTAMP,
+    profile JSONB,
+    profile_fetched_at TIMESTAMP
+);